@@ -0,0 +1,132 @@
+"""
+Startup benchmark of hid_board.py and hid_mouse.py.
+
+Each command is run in a new interpreter, like the notification hooks
+do, and reports:
+- start: from the spawn to the benchmark child code running
+- import: importing the tool module
+- first write: from the spawn to the first report sent to the device
+- total: from the spawn to the process exit
+
+The first write needs a device, n/a is reported otherwise.
+
+    bench_startup.py [--runs N]
+"""
+import argparse
+import importlib
+import importlib.abc
+import importlib.machinery
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+COMMANDS = [
+    ('hid_board', ['--help']),
+    ('hid_board', ['--on']),
+    ('hid_board', ['--get']),
+    ('hid_board', ['--set', '0', '255', '255']),
+    ('hid_board', ['--rgb', '0xFF0000']),
+    ('hid_mouse', ['--help']),
+    ('hid_mouse', ['off']),
+    ('hid_mouse', ['single', '0xFF0000', '4']),
+    ('hid_mouse', ['--config']),
+]
+
+
+class _HidWatcher(importlib.abc.MetaPathFinder):
+    """
+    Wraps the hid.Device, and hid_transport.HidrawDevice, writes when
+    their module is imported, without importing it earlier than the tool
+    does.
+    """
+    DEVICE_CLASSES = {'hid': 'Device', 'hid_transport': 'HidrawDevice'}
+
+    def __init__(self, spawn_time: float, results: dict):
+        self.spawn_time = spawn_time
+        self.results = results
+
+    def find_spec(self, fullname, path, target=None):
+        if fullname not in self.DEVICE_CLASSES:
+            return None
+        spec = importlib.machinery.PathFinder.find_spec(fullname, path)
+        if spec is None:
+            return None
+        exec_module = spec.loader.exec_module
+
+        def wrapped_exec_module(module):
+            exec_module(module)
+            for method in ('write', 'send_feature_report'):
+                self.__wrap(getattr(module, self.DEVICE_CLASSES[fullname]), method)
+        spec.loader.exec_module = wrapped_exec_module
+        return spec
+
+    def __wrap(self, cls, method):
+        original = getattr(cls, method)
+
+        def first_write(device, *args, **kwargs):
+            self.results.setdefault('first_write', time.time() - self.spawn_time)
+            return original(device, *args, **kwargs)
+        setattr(cls, method, first_write)
+
+
+def run_child(spawn_time: float, module_name: str, argv: list[str]) -> None:
+    results = {'start': time.time() - spawn_time}
+    sys.meta_path.insert(0, _HidWatcher(spawn_time, results))
+    start = time.perf_counter()
+    module = importlib.import_module(module_name)
+    results['import'] = time.perf_counter() - start
+    sys.argv = [f'{module_name}.py'] + argv
+    stdout = sys.stdout
+    try:
+        with open(os.devnull, 'w') as sys.stdout:
+            module.main(argv)
+    except SystemExit:
+        pass
+    except ImportError:
+        pass  # No hid package, the first write is n/a
+    finally:
+        sys.stdout = stdout
+    print(json.dumps(results))
+
+
+def run_command(module_name: str, argv: list[str]) -> dict:
+    spawn_time = time.time()
+    output = subprocess.run(
+        [sys.executable, __file__, '--child', repr(spawn_time), module_name] + argv,
+        capture_output=True, text=True, check=True).stdout
+    results = json.loads(output.splitlines()[-1])
+    results['total'] = time.time() - spawn_time
+    return results
+
+
+def _ms(values: list[float]) -> str:
+    if not values:
+        return 'n/a'
+    return f'{statistics.median(values) * 1000:.1f}'
+
+
+def main() -> None:
+    if len(sys.argv) > 1 and sys.argv[1] == '--child':
+        run_child(float(sys.argv[2]), sys.argv[3], sys.argv[4:])
+        return
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', help='Runs per command', type=int, default=10)
+    args = parser.parse_args()
+
+    print(f'{"command":40} {"start":>8} {"import":>8} {"1st write":>10} {"total":>8}  (median ms)')
+    for module_name, argv in COMMANDS:
+        runs = [run_command(module_name, argv) for _ in range(args.runs)]
+        columns = [
+            [run[key] for run in runs if key in run]
+            for key in ('start', 'import', 'first_write', 'total')
+        ]
+        name = f'{module_name}.py {" ".join(argv)}'
+        print(f'{name:40} {_ms(columns[0]):>8} {_ms(columns[1]):>8} {_ms(columns[2]):>10} {_ms(columns[3]):>8}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,241 @@
+"""
+Benchmark suite of the tools, end to end on the emulated devices of
+hid_fake, without any hardware.
+
+Measures, as the median of --runs runs:
+- startup: the CLIs run in a new interpreter, see bench_startup
+- discovery: the enumerate and the opening of a cached path
+- encode/decode: the NIC reports, HSV conversions and Model O records
+- command: the hid_board.py and hid_mouse.py commands, run in process
+
+The fake devices answer after --latency milliseconds per call. The
+discovery cache, shadow configurations and LED state snapshot are in a
+temporary directory, the real ones are untouched.
+
+Each run is appended to the results file. With a baseline stored, by
+--save-baseline, a benchmark slower than it by more than --threshold
+is reported and the exit status is 1.
+
+    bench_suite.py [--runs N] [--latency MS] [--threshold FRACTION] [--save-baseline]
+"""
+import argparse
+import contextlib
+import importlib
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from unittest import mock
+
+import bench_startup
+
+_CACHE_DIR = os.path.join(
+    os.environ.get('XDG_CACHE_HOME', os.path.join(os.path.expanduser('~'), '.cache')),
+    'qmk_tools')
+BASELINE_PATH = os.path.join(_CACHE_DIR, 'bench_baseline.json')
+RESULTS_PATH = os.path.join(_CACHE_DIR, 'bench_results.jsonl')
+
+# Differences below this many seconds are noise, never regressions
+NOISE_FLOOR = 0.00005
+# Calls per run of the encode/decode benchmarks, too fast to time alone
+REPEAT = 1000
+
+
+def _tools():
+    """
+    The tool modules, imported once the fake environment is set.
+    """
+    return tuple(importlib.import_module(name) for name in (
+        'hid_board', 'hid_colour', 'hid_discovery', 'hid_dumps', 'hid_fake', 'hid_glorious', 'hid_mouse'))
+
+
+def _main(module, argv: list[str]) -> None:
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        module.main(argv)
+
+
+def startup_benchmarks() -> list[tuple[str, object]]:
+    return [
+        (f'startup {module_name}.py {" ".join(argv)}',
+         lambda module_name=module_name, argv=argv: bench_startup.run_command(module_name, argv))
+        for module_name, argv in (
+            ('hid_board', ['--help']),
+            ('hid_board', ['--get']),
+            ('hid_mouse', ['--help']),
+            ('hid_mouse', ['--config', '--refresh']),
+        )
+    ]
+
+
+def discovery_benchmarks() -> list[tuple[str, object]]:
+    hid_board, _, hid_discovery, _, _, hid_glorious, _ = _tools()
+
+    def cached_open():
+        hid_discovery.open_device('mouse', {'model_O': hid_glorious.model_O_ids}).close()
+    return [
+        ('discovery enumerate', lambda: hid_discovery.find_device('keyboard', hid_board.keyboards_hid_ids)),
+        ('discovery cached open', cached_open),
+    ]
+
+
+def codec_benchmarks() -> list[tuple[str, object]]:
+    hid_board, hid_colour, _, hid_dumps, hid_fake, hid_glorious, _ = _tools()
+    colours = [(index * 0x010305) & 0xFFFFFF for index in range(REPEAT)]
+    config = bytearray(hid_fake.MODEL_O_CONFIG)
+    record = hid_glorious.GloriousModelORecord.over(config)
+    dump = memoryview(hid_fake.MODEL_O_CONFIG)
+
+    def rgb_to_hsv():
+        for rgb in colours:
+            hid_colour.rgb_to_hsv(rgb >> 16, rgb >> 8 & 0xFF, rgb & 0xFF)
+
+    def nic_reports():
+        for rgb in colours:
+            hid_board.pad_report(b'NIC' + hid_board.HNC_SET + hid_board.rgb_to_hsv(rgb))
+
+    def encode_record():
+        for index in range(REPEAT):
+            record.effect = hid_glorious.GloriousEffect.CONSTANT_RGB
+            record.constant_rgbs = colours[index:index + 6] if index + 6 <= REPEAT else colours[:6]
+
+    def decode_record():
+        for _ in range(REPEAT):
+            record.decode()
+
+    def decode_dumps():
+        for _ in range(REPEAT):
+            hid_dumps.decode_row(dump)
+    return [
+        (f'encode rgb_to_hsv x{REPEAT}', rgb_to_hsv),
+        (f'encode NIC set report x{REPEAT}', nic_reports),
+        (f'encode Model O record x{REPEAT}', encode_record),
+        (f'decode Model O record x{REPEAT}', decode_record),
+        (f'decode dump row x{REPEAT}', decode_dumps),
+    ]
+
+
+def command_benchmarks() -> list[tuple[str, object]]:
+    hid_board, _, _, _, _, _, hid_mouse = _tools()
+    colours = iter(range(1, 1 << 24))
+    return [
+        ('command hid_board.py --set 0 255 255', lambda: _main(hid_board, ['--set', '0', '255', '255'])),
+        ('command hid_board.py --get', lambda: _main(hid_board, ['--get'])),
+        ('command hid_board.py --batch off set=0,255,255 on',
+         lambda: _main(hid_board, ['--batch', 'off', 'set=0,255,255', 'on'])),
+        # A new colour each run, always written
+        ('command hid_mouse.py single RGB', lambda: _main(hid_mouse, ['single', hex(next(colours))])),
+        ('command hid_mouse.py --config', lambda: _main(hid_mouse, ['--config'])),
+        ('command hid_mouse.py --config --refresh', lambda: _main(hid_mouse, ['--config', '--refresh'])),
+    ]
+
+
+def measure(benchmark, runs: int) -> float:
+    """
+    Median seconds of benchmark, after a warm up run.
+    """
+    benchmark()
+    durations = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        benchmark()
+        durations.append(time.perf_counter() - start)
+    return statistics.median(durations)
+
+
+@contextlib.contextmanager
+def fake_environment(directory: str, latency: float):
+    """
+    The environment of the fake devices and directory, restored after.
+    """
+    with mock.patch.dict(os.environ, {
+        'HID_TRANSPORT': 'fake',
+        'HID_FAKE_LATENCY': str(latency),
+        'XDG_CACHE_HOME': os.path.join(directory, 'cache'),
+        'XDG_CONFIG_HOME': os.path.join(directory, 'config'),
+        'XDG_RUNTIME_DIR': os.path.join(directory, 'runtime'),
+    }):
+        yield
+
+
+def run_suite(runs: int, latency: float) -> dict[str, float]:
+    """
+    Median seconds of each benchmark, on fake devices answering after
+    latency milliseconds.
+    """
+    with tempfile.TemporaryDirectory(prefix='qmk_bench_') as directory, fake_environment(directory, latency):
+        results = {}
+        for benchmarks in (startup_benchmarks, discovery_benchmarks, codec_benchmarks, command_benchmarks):
+            for name, benchmark in benchmarks():
+                results[name] = measure(benchmark, runs)
+        return results
+
+
+def regressions(results: dict[str, float], baseline: dict[str, float], threshold: float) -> list[str]:
+    """
+    Names of the benchmarks slower than baseline by more than threshold.
+    """
+    return [
+        name for name, seconds in results.items()
+        if name in baseline and seconds - baseline[name] > max(threshold * baseline[name], NOISE_FLOOR)
+    ]
+
+
+def load_baseline(path: str) -> dict | None:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def store(path: str, entry: dict, append: bool) -> None:
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'a' if append else 'w') as f:
+        f.write(json.dumps(entry) + ('\n' if append else ''))
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', help='Runs per benchmark', type=int, default=10)
+    parser.add_argument('--latency', help='Fake devices latency per call, ms', type=float, default=1.0)
+    parser.add_argument('--threshold', help='Slowdown against the baseline failing the run, 0.25 for 25%%',
+                        type=float, default=0.25)
+    parser.add_argument('--baseline', help='Baseline JSON file', default=BASELINE_PATH)
+    parser.add_argument('--results', help='JSON Lines file the results are appended to', default=RESULTS_PATH)
+    parser.add_argument('--save-baseline', help='Stores this run as the baseline', action='store_true')
+    args = parser.parse_args(argv)
+
+    baseline = load_baseline(args.baseline)
+    results = run_suite(args.runs, args.latency)
+    entry = {'time': time.time(), 'latency': args.latency, 'runs': args.runs, 'results': results}
+    try:
+        store(args.results, entry, append=True)
+        if args.save_baseline:
+            store(args.baseline, entry, append=False)
+    except OSError as err:
+        print(f'Error: {err}')
+
+    reference = {}
+    if baseline is not None and not args.save_baseline:
+        if baseline.get('latency') != args.latency:
+            print(f'Baseline measured with a {baseline.get("latency")} ms latency, not compared')
+        else:
+            reference = baseline.get('results', {})
+    slower = regressions(results, reference, args.threshold)
+    print(f'{"benchmark":56} {"median ms":>10} {"baseline":>10} {"change":>8}')
+    for name, seconds in results.items():
+        line = f'{name:56} {seconds * 1000:10.3f}'
+        if name in reference and reference[name]:
+            line += f' {reference[name] * 1000:10.3f} {(seconds / reference[name] - 1) * 100:+7.1f}%'
+            if name in slower:
+                line += '  REGRESSION'
+        print(line)
+    if slower:
+        print(f'{len(slower)} regressions over {args.threshold * 100:g}%')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
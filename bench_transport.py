@@ -0,0 +1,100 @@
+"""
+Benchmark of the hidapi and hidraw transports, see hid_transport.
+
+For each known keyboard and mouse present, times the operations of the
+tools with both transports:
+- keyboard: a NIC --get, the report written and its reply read
+- mouse: the version request feature report and the 520 bytes
+  configuration read, like hid_mouse.py does before any change
+
+hidraw is n/a for the paths not under /dev/hidraw, on other systems or
+hidapi backends. Nothing is changed on the devices.
+
+    bench_transport.py [--runs N]
+"""
+import argparse
+import os
+import statistics
+import time
+
+import hid_board
+import hid_discovery
+import hid_transport
+
+
+def _nic_get(h) -> None:
+    h.write(hid_board.pad_report(b'NIC' + hid_board.HNC_GET))
+    h.read(64, 200)
+
+
+def _version_request(h) -> None:
+    h.send_feature_report(b'\x05\x11\x00\x00\x00\x00')
+
+
+def _read_config(h) -> None:
+    h.get_feature_report(0x04, 520)
+
+
+OPERATIONS = {
+    'keyboard': [('NIC get', _nic_get)],
+    'mouse': [('version request', _version_request), ('config read', _read_config)],
+}
+
+
+def run_operation(path: bytes, transport: str, operation, runs: int) -> list[float]:
+    """
+    Durations of runs calls of operation, on the device opened once.
+    """
+    h = hid_transport.open_path(path, transport)
+    try:
+        operation(h)  # Warm up
+        durations = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            operation(h)
+            durations.append(time.perf_counter() - start)
+        return durations
+    finally:
+        h.close()
+
+
+def _us(durations: list[float] | None, quantile: int) -> str:
+    if not durations:
+        return 'n/a'
+    if quantile == 50:
+        return f'{statistics.median(durations) * 1e6:.0f}'
+    return f'{statistics.quantiles(durations, n=100)[quantile - 1] * 1e6:.0f}'
+
+
+def main() -> None:
+    import hid
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', help='Calls per operation and transport', type=int, default=200)
+    args = parser.parse_args()
+
+    from hid_glorious import model_O_ids
+    devices = [
+        ('keyboard', entry) for entry in hid_discovery.find_all_devices(hid_board.keyboards_hid_ids)
+    ] + [
+        ('mouse', entry) for entry in hid_discovery.find_all_devices({'model_O': model_O_ids})
+    ]
+    if not devices:
+        print('Device not present')
+        return
+
+    print(f'{"device":24} {"operation":16} {"transport":9} {"median":>8} {"p95":>8}  (us)')
+    for group, entry in devices:
+        path = os.fsencode(entry['path'])
+        for name, operation in OPERATIONS[group]:
+            for transport in ('hidapi', 'hidraw'):
+                durations = None
+                if transport == 'hidapi' or path.startswith(hid_transport.HIDRAW_PREFIX):
+                    try:
+                        durations = run_operation(path, transport, operation, args.runs)
+                    except hid.HIDException as err:
+                        print(f'Error: {entry["name"]} {transport} {err}')
+                print(f'{entry["name"]:24} {name:16} {transport:9} {_us(durations, 50):>8} {_us(durations, 95):>8}')
+
+
+if __name__ == '__main__':
+    main()
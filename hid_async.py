@@ -0,0 +1,171 @@
+"""
+asyncio API for the keyboard and mouse LED control.
+
+The blocking HID calls run on a bounded thread pool executor, shared by
+default. Each device serializes its own calls with an asyncio.Lock, a
+slow device doesn't stall the event loop or the other devices.
+
+    async with AsyncKeyboard() as keyboard, AsyncMouse() as mouse:
+        await keyboard.set_hsv(0, 255, 255)
+        await mouse.modify(lambda record: setattr(record, 'single_rgb', 0xFF0000))
+"""
+import asyncio
+import concurrent.futures
+
+import hid_board
+import hid_mouse
+import hid_shadow
+
+_executor = None
+
+
+def default_executor() -> concurrent.futures.ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = concurrent.futures.ThreadPoolExecutor(max_workers=4, thread_name_prefix='hid_async')
+    return _executor
+
+
+class _AsyncDevice:
+    """
+    The functions called get the opened device, or the session made
+    from it once per open with session.
+    """
+    def __init__(self, open_device, executor: concurrent.futures.Executor | None = None, session=None):
+        self._executor = executor or default_executor()
+        self.__open_device = open_device
+        self.__session = session
+        self.__device = None
+        self.__target = None
+        self.__lock = asyncio.Lock()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    def __close(self) -> None:
+        if self.__device is not None:
+            device, self.__device = self.__device, None
+            self.__target = None
+            device.close()
+
+    def __call_blocking(self, function, *args):
+        import hid_transport
+        # One retry, the device may have been unplugged since opened.
+        for attempt in range(2):
+            if self.__device is None:
+                self.__device = self.__open_device()
+                if self.__device is None:
+                    raise hid_transport.DeviceNotPresent()
+                self.__target = self.__device if self.__session is None else self.__session(self.__device)
+            try:
+                return function(self.__target, *args)
+            except hid_transport.device_errors():
+                self.__close()
+                if attempt:
+                    raise
+
+    async def _call(self, function, *args):
+        """
+        Runs function(device or session, *args) on the executor, one at a
+        time for this device.
+        """
+        async with self.__lock:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, self.__call_blocking, function, *args)
+
+    async def close(self) -> None:
+        async with self.__lock:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(self._executor, self.__close)
+
+
+def _keyboard_session(h):
+    from hid_session import KeyboardSession
+    return KeyboardSession(h)
+
+
+def _keyboard_call(session, method: str, *args):
+    return getattr(session, method)(*args)
+
+
+class AsyncKeyboard(_AsyncDevice):
+    """
+    QMK NIC protocol keyboard, the first one found, through one
+    KeyboardSession per open.
+    """
+    def __init__(self, executor: concurrent.futures.Executor | None = None):
+        super().__init__(hid_board.open_device, executor, _keyboard_session)
+
+    async def on(self) -> None:
+        await self._call(_keyboard_call, 'on')
+
+    async def off(self) -> None:
+        await self._call(_keyboard_call, 'off')
+
+    async def set_hsv(self, hue: int, saturation: int, value: int) -> None:
+        await self._call(_keyboard_call, 'set_hsv', hue, saturation, value)
+
+    async def get_hsv(self) -> tuple[int, int, int] | None:
+        """
+        None without reply.
+        """
+        return await self._call(_keyboard_call, 'get_hsv')
+
+    async def save(self) -> None:
+        await self._call(_keyboard_call, 'save')
+
+    async def batch(self, *commands: str) -> tuple[int, int, int] | None:
+        """
+        Commands like hid_board.py --batch, "set=0,255,255" "save".
+        Returns the HSV values of the last get, None without.
+        """
+        return await self._call(_keyboard_call, 'batch', [hid_board.batch_command(command) for command in commands])
+
+
+def _read_record(h, key: str | None, refresh: bool):
+    from hid_glorious import GloriousModelORecord
+    return GloriousModelORecord(hid_mouse.load_config(h, key, refresh))
+
+
+def _write_record(h, key: str | None, record) -> bool:
+    config = hid_shadow.load(key)
+    if config is None:
+        config = bytes(len(record.record))  # Unknown, always written
+    return hid_mouse.write_config(h, key, record.record, config) is not config
+
+
+def _modify_record(h, key: str | None, change):
+    from hid_glorious import GloriousModelORecord
+    config = hid_mouse.load_config(h, key)
+    record = GloriousModelORecord(config)
+    change(record)
+    hid_mouse.write_config(h, key, record.record, config)
+    return record
+
+
+class AsyncMouse(_AsyncDevice):
+    """
+    Glorious Model O, its GloriousModelORecord read, modify and write.
+    The shadow configuration is used like hid_mouse.py does.
+    """
+    def __init__(self, executor: concurrent.futures.Executor | None = None):
+        super().__init__(hid_mouse.open_device, executor)
+
+    async def read_record(self, refresh: bool = False):
+        return await self._call(_read_record, hid_mouse.shadow_key(), refresh)
+
+    async def write_record(self, record) -> bool:
+        """
+        False when the record was already the mouse configuration.
+        """
+        return await self._call(_write_record, hid_mouse.shadow_key(), record)
+
+    async def modify(self, change):
+        """
+        Reads the record, calls change(record) and writes it back, all
+        without another call on this mouse in between.
+        """
+        return await self._call(_modify_record, hid_mouse.shadow_key(), change)
@@ -10,15 +10,32 @@ Header, 3 bytes : b'NIC'
 Command, 1 byte
 Arguments, 0-n bytes
 
-This code used the hid package, using the hidapi library.
+Firmware advertising it in its HNC_CAPS reply, b'CAP' and the flags
+after the HSV bytes, takes several commands in one HNC_BATCH report:
+Header, 3 bytes : b'NIC'
+HNC_BATCH, 1 byte
+Count, 1 byte
+Commands with their arguments, count times
+The single reply has the HSV values after the batch, then b'BAT' and
+the count of commands run.
+With other firmware, the commands are sent one report each.
+
+This code used the hid package, using the hidapi library. It is only
+imported when the device is opened, keeping --help and the argument
+errors fast.
 
 On macOS, hidapi is available through brew.
 """
 import argparse
-import colorsys
+import concurrent.futures
 import functools
+import math
+import os
+import time
 
-import hid
+import hid_discovery
+import hid_settle
+import hid_timing
 
 
 class KeyboardIds:
@@ -35,6 +52,16 @@ HNC_OFF = b'\x02'
 HNC_SET = b'\x03'
 HNC_GET = b'\x04'
 HNC_SAVE = b'\x05'
+HNC_CAPS = b'\x06'
+HNC_BATCH = b'\x07'
+
+# HNC_CAPS reply flags
+CAPS_BATCH = 0x01
+
+REPORT_SIZE = 64
+# Reply waits in milliseconds, learned in between, see read_reply
+REPLY_TIMEOUT = 200
+REPLY_FLOOR = 10
 
 keyboards_hid_ids = {
     # GMMK Pro rev1 ANSI
@@ -71,65 +98,375 @@ keyboards_hid_ids = {
         ),
 }
 
-device_path = None
-
-parser = argparse.ArgumentParser()
-group_args = parser.add_mutually_exclusive_group(required=True)
-group_args.add_argument('--on', help='Enable led notification', action='store_true')
-group_args.add_argument('--off', help='Disable led notification', action='store_true')
-group_args.add_argument('--get', help='Get current HSV values', action='store_true')
-group_args.add_argument('--set', help='Set the HSV values', type=functools.partial(int, base=0), nargs=3)
-group_args.add_argument('--rgb', help='Set the HSV values', type=functools.partial(int, base=0), nargs=1)
-group_args.add_argument('--save', help='Save current HSV values', action='store_true')
-args = parser.parse_args()
-
-# Find the device to talk to
-for keys in keyboards_hid_ids.values():
-    devices = hid.enumerate(keys.vid, keys.pid)
-    if not len(devices):
-        # print('Device not present')
-        continue
-    for device in devices:
-        # print(device)
-        if (
-            device['vendor_id'] == keys.vid
-            and device['product_id'] == keys.pid
-            and device['usage'] == keys.usage_id
-            and device['usage_page'] == keys.usage_page
-        ):
-            device_path = device['path']
-            break
-    if device_path is not None:
-        break
-if device_path is None:
-    print('Device not present')
-    exit(0)
-
-try:
-    with hid.Device(path=device_path) as h:
-        msg = b'NIC'
-        if args.set is not None:
-            msg += HNC_SET + bytes(args.set)
-        elif args.rgb is not None:
-            raw_value = args.rgb[0]
-            v = colorsys.rgb_to_hsv(
-                ((raw_value >> 16) & 0xFF) / 0xFF,
-                ((raw_value >> 8) & 0xFF) / 0xFF,
-                (raw_value & 0xFF) / 0xFF)
-            msg += HNC_SET + bytes([int(v[0] * 0xFF), int(v[1] * 0xFF), int(v[2] * 0xFF)])
-        elif args.on:
-            msg += HNC_ON
-        elif args.off:
-            msg += HNC_OFF
-        elif args.get:
-            msg += HNC_GET
-        elif args.save:
-            msg += HNC_SAVE
-
-        h.write(bytes(msg + b'\x00' * (64 - len(msg))))
-        reply = h.read(64, 200)
-        if args.get:
-            print(f'HSV : {reply[4]:02X} {reply[5]:02X} {reply[6]:02X}')
-        # print(f'reply: {reply.hex(sep=" ")}')
-except hid.HIDException as err:
-    print(f'Error: {err}')
+
+class _Parser(argparse.ArgumentParser):
+    """
+    Rejects --all with --stream or --session, these read stdin on one
+    opened keyboard.
+    """
+    def parse_known_args(self, args=None, namespace=None):
+        args, extras = super().parse_known_args(args, namespace)
+        if args.all and (args.stream is not None or args.session):
+            other = '--session' if args.session else '--stream'
+            self.error(f'argument --all: not allowed with argument {other}')
+        return args, extras
+
+
+def create_parser() -> argparse.ArgumentParser:
+    parser = _Parser()
+    group_args = parser.add_mutually_exclusive_group(required=True)
+    group_args.add_argument('--on', help='Enable led notification', action='store_true')
+    group_args.add_argument('--off', help='Disable led notification', action='store_true')
+    group_args.add_argument('--get', help='Get current HSV values', action='store_true')
+    group_args.add_argument('--set', help='Set the HSV values, 0-255', type=byte_value, nargs=3)
+    group_args.add_argument('--rgb', help='Set the HSV values', type=functools.partial(int, base=0), nargs=1)
+    group_args.add_argument('--save', help='Save current HSV values', action='store_true')
+    group_args.add_argument('--batch', help='Send the commands, like "set=0,255,255 save" or "off rgb=0xFF0000 on", '
+                            'in one report when supported', type=batch_command, nargs='+', metavar='CMD')
+    group_args.add_argument('--stream', help='Send the HSV ("H S V") or RGB ("0xRRGGBB") frames read, one per line, '
+                            'from stdin or the given file/pipe', nargs='?', const='-', metavar='FILE')
+    group_args.add_argument('--session', help='Run the commands read from stdin, one per line like "--set 0 255 255", '
+                            'pipelined on one opened device', action='store_true')
+    parser.add_argument('--in-flight', help='Commands waiting for a reply with --session', type=positive_int,
+                        default=4)
+    parser.add_argument('--fps', help='Maximum frame rate with --stream', type=positive_float, default=30.0)
+    parser.add_argument('--all', help='Send to every keyboard present, in parallel', action='store_true')
+    hid_timing.add_arguments(parser)
+    return parser
+
+
+def open_device():
+    """
+    Opens the first known keyboard found, None if none is present.
+    """
+    return hid_discovery.open_device('keyboard', keyboards_hid_ids)
+
+
+def rgb_to_hsv(raw_value: int) -> bytes:
+    """
+    0xRRGGBB to the 3 HSV bytes of HNC_SET, see hid_colour.
+    """
+    import hid_colour
+    return hid_colour.hsv_bytes(raw_value)
+
+
+def pad_report(msg: bytes) -> bytes:
+    return bytes(msg + b'\x00' * (REPORT_SIZE - len(msg)))
+
+
+def batch_command(text: str) -> bytes:
+    """
+    Command byte and arguments of a --batch command: on, off, get, save,
+    set=H,S,V or rgb=0xRRGGBB.
+    """
+    name, _, value = text.partition('=')
+    commands = {'on': HNC_ON, 'off': HNC_OFF, 'get': HNC_GET, 'save': HNC_SAVE}
+    try:
+        if name in commands and not value:
+            return commands[name]
+        if name == 'set':
+            hsv = [int(part, 0) for part in value.split(',')]
+            if len(hsv) == 3:
+                return HNC_SET + bytes(hsv)
+        elif name == 'rgb':
+            return HNC_SET + rgb_to_hsv(int(value, 0))
+    except ValueError:
+        pass
+    raise argparse.ArgumentTypeError(f'invalid command: {text!r}')
+
+
+def positive_float(text: str) -> float:
+    """
+    argparse type of the rates and durations, above 0.
+    """
+    try:
+        value = float(text)
+    except ValueError:
+        value = math.nan
+    if not value > 0 or math.isinf(value):
+        raise argparse.ArgumentTypeError(f'must be a positive number: {text!r}')
+    return value
+
+
+def byte_value(text: str) -> int:
+    """
+    argparse type of the HSV values, 0 to 255.
+    """
+    try:
+        value = int(text, 0)
+    except ValueError:
+        value = -1
+    if not 0 <= value <= 0xFF:
+        raise argparse.ArgumentTypeError(f'must be 0-255: {text!r}')
+    return value
+
+
+def positive_int(text: str) -> int:
+    """
+    argparse type of the counts, 1 or more.
+    """
+    try:
+        value = int(text, 0)
+    except ValueError:
+        value = 0
+    if value < 1:
+        raise argparse.ArgumentTypeError(f'must be 1 or more: {text!r}')
+    return value
+
+
+def query_caps(h) -> int:
+    """
+    HNC_CAPS flags of the firmware, 0 when it doesn't know the command.
+    """
+    h.write(pad_report(b'NIC' + HNC_CAPS))
+    reply = h.read(REPORT_SIZE, 200)
+    if reply[:4] == b'NIC' + HNC_CAPS and reply[7:10] == b'CAP':
+        return reply[10]
+    return 0
+
+
+def device_caps(h, key: str | None) -> int:
+    """
+    query_caps, cached per device serial or path.
+    """
+    caps = hid_discovery.load_cache().get('nic_caps', {})
+    if key and key in caps:
+        return caps[key]
+    value = query_caps(h)
+    if key:
+        with hid_discovery.updating_cache() as cache:
+            cache.setdefault('nic_caps', {})[key] = value
+    return value
+
+
+def build_message(args: argparse.Namespace) -> bytes:
+    """
+    Full 64 bytes report for the command selected in args.
+    """
+    msg = b'NIC'
+    if args.set is not None:
+        msg += HNC_SET + bytes(args.set)
+    elif args.rgb is not None:
+        msg += HNC_SET + rgb_to_hsv(args.rgb[0])
+    elif args.on:
+        msg += HNC_ON
+    elif args.off:
+        msg += HNC_OFF
+    elif args.get:
+        msg += HNC_GET
+    elif args.save:
+        msg += HNC_SAVE
+    return pad_report(msg)
+
+
+def forget_caps(key: str | None) -> None:
+    if key:
+        with hid_discovery.updating_cache() as cache:
+            cache.get('nic_caps', {}).pop(key, None)
+
+
+def run_batch(h, commands: list[bytes], key: str | None = None) -> list[str]:
+    """
+    Sends the commands in HNC_BATCH reports when the device supports
+    them, one report per command otherwise. Returns the lines to print.
+    """
+    from hid_session import KeyboardSession
+    hsv = KeyboardSession(h, key).batch(commands)
+    return _hsv_lines(hsv) if HNC_GET in (command[:1] for command in commands) else []
+
+
+def _hsv_lines(hsv: tuple[int, int, int] | None) -> list[str]:
+    if hsv is None:
+        return ['Error: no reply']
+    return [f'HSV : {hsv[0]:02X} {hsv[1]:02X} {hsv[2]:02X}']
+
+
+def _caps_key() -> str | None:
+    entry = hid_discovery.cached_entry('keyboard')
+    return None if entry is None else entry.get('serial') or entry['path']
+
+
+def read_reply(h, key: str | None, command: bytes, needed: bool = False) -> bytes:
+    """
+    Waits for the reply to command, no longer than a few times the usual
+    reply delay of key, see hid_settle. When needed, like for a --get,
+    up to REPLY_TIMEOUT milliseconds in any case. The late replies of
+    the previous commands are dropped. b'' without reply.
+    """
+    settle_key = f'keyboard/{key}'
+    timeout = REPLY_TIMEOUT / 1000
+    if not needed:
+        timeout = hid_settle.deadline(settle_key, timeout, REPLY_FLOOR / 1000)
+    start = time.perf_counter()
+    while (remaining := timeout - (time.perf_counter() - start)) > 0:
+        reply = h.read(REPORT_SIZE, max(round(remaining * 1000), 1))
+        if reply[3:4] == command:
+            hid_settle.observe(settle_key, time.perf_counter() - start)
+            return reply
+    return b''
+
+
+def run_command(h, args: argparse.Namespace, key: str | None = None) -> list[str]:
+    """
+    Sends the command to an opened device, returns the lines to print.
+    key identifies the device for the capabilities cache, the cached
+    keyboard when None.
+    """
+    from hid_session import KeyboardSession
+    if args.batch is not None:
+        return run_batch(h, args.batch, key)
+    hsv = KeyboardSession(h, key).run(args)
+    return _hsv_lines(hsv) if args.get else []
+
+
+class BroadcastResult:
+    def __init__(self, name: str, path: str, lines: list[str], error: str | None, latency: float):
+        self.name = name
+        self.path = path
+        self.lines = lines
+        self.error = error
+        self.latency = latency  # Seconds, open + write + reply wait
+
+
+def _send_to(entry: dict, args: argparse.Namespace, opened: dict) -> BroadcastResult:
+    import hid_transport
+    start = time.perf_counter()
+    lines = []
+    error = None
+    key = entry.get('serial') or entry['path']
+    try:
+        if entry['path'] in opened:
+            h, lock = opened[entry['path']]
+            with lock:
+                lines = run_command(h, args, key)
+        else:
+            with hid_discovery.open_path(os.fsencode(entry['path']), entry['name']) as h:
+                lines = run_command(h, args, key)
+    except hid_transport.device_errors() as err:
+        error = str(err)
+    return BroadcastResult(entry['name'], entry['path'], lines, error, time.perf_counter() - start)
+
+
+def broadcast(args: argparse.Namespace, max_workers: int | None = None,
+              opened: dict | None = None) -> list[BroadcastResult]:
+    """
+    Sends the command to every known keyboard present. Each device write
+    and reply wait runs in its own worker, the whole takes about the
+    time of the slowest device.
+
+    opened maps the path of keyboards already opened to their (device,
+    lock), used under the lock instead of a second handle, which would
+    leave its replies on the first one.
+    """
+    entries = hid_discovery.find_all_devices(keyboards_hid_ids)
+    if not entries:
+        return []
+    opened = opened or {}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers or len(entries)) as pool:
+        return list(pool.map(_send_to, entries, [args] * len(entries), [opened] * len(entries)))
+
+
+def run_session(h, lines, max_in_flight: int) -> list[str]:
+    """
+    Runs command lines through a NicPipeline, only --get waits for its
+    reply. Returns the lines to print.
+    """
+    import shlex
+
+    import hid_pipeline
+    parser = create_parser()
+    output = []
+    with hid_pipeline.NicPipeline(h, max_in_flight=max_in_flight) as pipeline:
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                args = parser.parse_args(shlex.split(line))
+            except SystemExit:
+                continue  # argparse already reported it
+            if args.stream is not None or args.session:
+                continue
+            if args.batch is not None:
+                # The pipeline already avoids the reply waits
+                for command in args.batch:
+                    future = pipeline.submit(pad_report(b'NIC' + command))
+                    if command == HNC_GET:
+                        try:
+                            output.append('HSV : {:02X} {:02X} {:02X}'.format(*future.result()[4:7]))
+                        except TimeoutError as err:
+                            output.append(f'Error: {err}')
+            elif args.get:
+                try:
+                    output.append('HSV : {:02X} {:02X} {:02X}'.format(*pipeline.get_hsv()))
+                except TimeoutError as err:
+                    output.append(f'Error: {err}')
+            else:
+                pipeline.submit(build_message(args))
+    if pipeline.timeouts:
+        output.append(f'{pipeline.timeouts} command(s) without reply')
+    return output
+
+
+def format_broadcast(results: list[BroadcastResult]) -> list[str]:
+    if not results:
+        return ['Device not present']
+    lines = []
+    for result in results:
+        status = 'ok' if result.error is None else f'Error: {result.error}'
+        lines.append(f'{result.name} ({result.path}): {status}, {result.latency * 1000:.1f} ms')
+        lines.extend(f'\t{line}' for line in result.lines)
+    return lines
+
+
+def run(args: argparse.Namespace) -> list[str]:
+    """
+    Runs the hid_board.py command of args, returns the lines to print.
+    Raises hid_transport.DeviceNotPresent without keyboard, or the
+    device errors, see hid_transport.device_errors. With --all, a
+    DeviceError when any keyboard failed.
+    """
+    import hid_transport
+    if args.all:
+        results = broadcast(args)
+        if not results:
+            raise hid_transport.DeviceNotPresent()
+        failed = [f'{result.name} ({result.path}): {result.error}' for result in results if result.error is not None]
+        if failed:
+            raise hid_transport.DeviceError(', '.join(failed))
+        return format_broadcast(results)
+
+    # Find the device to talk to
+    h = open_device()
+    if h is None:
+        raise hid_transport.DeviceNotPresent()
+    with h:
+        if args.stream is not None:
+            import hid_stream
+            return hid_stream.run_stream(h, args.stream, args.fps)
+        if args.session:
+            import sys
+            return run_session(h, sys.stdin, args.in_flight)
+        return run_command(h, args)
+
+
+def _run(args: argparse.Namespace) -> list[str]:
+    import hid_transport
+    if args.all:
+        return format_broadcast(broadcast(args))
+    try:
+        return run(args)
+    except hid_transport.DeviceNotPresent as err:
+        return [str(err)]
+    except hid_transport.device_errors() as err:
+        return [f'Error: {err}']
+
+
+def main(argv: list[str] | None = None) -> None:
+    args = create_parser().parse_args(argv)
+    for line in _run(args):
+        print(line)
+    hid_timing.report(args)
+
+
+if __name__ == '__main__':
+    main()
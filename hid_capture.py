@@ -0,0 +1,316 @@
+"""
+HID traffic capture and timed replay.
+
+RecordingDevice wraps a hid.Device and logs every write, read,
+send_feature_report and get_feature_report call, with its start time
+and duration, to a compact binary log. ReplayDevice plays such a log
+back, with the recorded timing, accelerated, or without any wait, its
+errors raised as hid_transport.DeviceError.
+
+Both tools use them through hid_discovery when these are set:
+    HID_CAPTURE=file.cap        Appends the traffic to file.cap
+    HID_REPLAY=file.cap         Replays file.cap instead of the devices
+    HID_REPLAY_SPEED=10         Replays 10 times faster, 0 for no waits
+
+Log format, little endian:
+    Header : b'QMKHIDC3'
+    Record : op (B), session (Q), start (d), duration (d), arg (i),
+             length (I) followed by length bytes of payload
+The payload is the data written, or returned. arg is the read timeout
+or the feature report id, -1 when not applicable. Each opened device
+is a session, with a random id, starting with an OPEN record having its
+path, a NUL and its model name as payload. When the call raised, ERROR
+is added to op and the payload is the error message. Each record is a
+single write under an flock, the processes capturing to the same log
+don't mix their records.
+
+The b'QMKHIDC2' logs, with an I session, and the b'QMKHIDC1' ones, with
+a B session and the path alone in the OPEN payload, are still replayed,
+the sessions of the latter taken for any model.
+
+    hid_capture.py dump file.cap
+"""
+import argparse
+import contextlib
+import fcntl
+import os
+import struct
+import threading
+import time
+
+import hid_transport
+
+MAGIC = b'QMKHIDC3'
+RECORD = struct.Struct('<BQddiI')
+# Record layout of each log version
+_RECORDS = {b'QMKHIDC1': struct.Struct('<BBddiI'), b'QMKHIDC2': struct.Struct('<BIddiI'), MAGIC: RECORD}
+
+OPEN = 0
+WRITE = 1
+READ = 2
+SEND_FEATURE = 3
+GET_FEATURE = 4
+CLOSE = 5
+ERROR = 0x80
+
+OP_NAMES = {
+    OPEN: 'open',
+    WRITE: 'write',
+    READ: 'read',
+    SEND_FEATURE: 'send_feature_report',
+    GET_FEATURE: 'get_feature_report',
+    CLOSE: 'close',
+}
+
+# One file object per log path, shared by the devices of the process.
+_logs = {}
+_logs_lock = threading.Lock()
+
+
+class _CaptureLog:
+    def __init__(self, path: str):
+        self.lock = threading.Lock()
+        self.fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT | os.O_CLOEXEC, 0o644)
+        try:
+            with self.__locked():
+                if os.fstat(self.fd).st_size == 0:
+                    os.write(self.fd, MAGIC)
+                else:
+                    with open(path, 'rb') as f:
+                        if f.read(len(MAGIC)) != MAGIC:
+                            raise ValueError(f'{path} is not a capture log of this version')
+        except (OSError, ValueError):
+            os.close(self.fd)
+            raise
+
+    @contextlib.contextmanager
+    def __locked(self):
+        # Against the other processes appending to the log
+        fcntl.flock(self.fd, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+
+    def write(self, op: int, session: int, start: float, duration: float, arg: int, payload: bytes) -> None:
+        record = RECORD.pack(op, session, start, duration, arg, len(payload)) + payload
+        with self.lock, self.__locked():
+            os.write(self.fd, record)
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+def _capture_log(path: str) -> _CaptureLog:
+    with _logs_lock:
+        if path not in _logs:
+            _logs[path] = _CaptureLog(path)
+        return _logs[path]
+
+
+def read_log(path: str):
+    """
+    Yields the (op, session, start, duration, arg, payload) records.
+    """
+    with open(path, 'rb') as f:
+        record = _RECORDS.get(f.read(len(MAGIC)))
+        if record is None:
+            raise ValueError(f'{path} is not a capture log')
+        while header := f.read(record.size):
+            op, session, start, duration, arg, length = record.unpack(header)
+            yield op, session, start, duration, arg, f.read(length)
+
+
+def open_payload(path: bytes, model: str) -> bytes:
+    return bytes(path) + b'\0' + model.encode()
+
+
+def parse_open(payload: bytes) -> tuple[bytes, str | None]:
+    """
+    (device path, model) of an OPEN payload, model None when not recorded.
+    """
+    path, separator, model = payload.partition(b'\0')
+    return path, model.decode(errors='replace') if separator else None
+
+
+def _matches(model: str | None, models) -> bool:
+    return models is None or model is None or model in models
+
+
+# Sessions already replayed, each is replayed once per process.
+_replayed = set()
+
+
+def _take_session(path: str, session: int, start: float) -> bool:
+    with _logs_lock:
+        if (path, session, start) in _replayed:
+            return False
+        _replayed.add((path, session, start))
+        return True
+
+
+def sessions(path: str, models=None) -> list[tuple[bytes, str | None]]:
+    """
+    (device path, model) of each session of a log, only of models when
+    given.
+    """
+    opens = [parse_open(payload) for op, _, _, _, _, payload in read_log(path) if op == OPEN]
+    return [(device_path, model) for device_path, model in opens if _matches(model, models)]
+
+
+class RecordingDevice:
+    """
+    hid.Device wrapper logging all the traffic.
+    """
+    def __init__(self, device, log_path: str, device_path: bytes = b'', model: str = 'unknown'):
+        self.__device = device
+        self.__log = _capture_log(log_path)
+        # Unique among the processes capturing to the same log
+        self.__session = int.from_bytes(os.urandom(8), 'little')
+        self.__log.write(OPEN, self.__session, time.time(), 0.0, -1, open_payload(device_path, model))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __getattr__(self, name):
+        # serial, product... not recorded
+        return getattr(self.__device, name)
+
+    def __call(self, op: int, arg: int, sent: bytes | None, method, *args):
+        start = time.time()
+        counter = time.perf_counter()
+        try:
+            result = method(*args)
+        except Exception as err:
+            self.__log.write(op | ERROR, self.__session, start, time.perf_counter() - counter, arg, str(err).encode())
+            raise
+        duration = time.perf_counter() - counter
+        self.__log.write(op, self.__session, start, duration, arg, bytes(sent if sent is not None else result))
+        return result
+
+    def write(self, data):
+        return self.__call(WRITE, -1, data, self.__device.write, data)
+
+    def read(self, size, timeout=None):
+        return self.__call(READ, -1 if timeout is None else timeout, None, self.__device.read, size, timeout)
+
+    def send_feature_report(self, data):
+        return self.__call(SEND_FEATURE, -1, data, self.__device.send_feature_report, data)
+
+    def get_feature_report(self, report_id, size):
+        return self.__call(GET_FEATURE, report_id, None, self.__device.get_feature_report, report_id, size)
+
+    def close(self):
+        self.__log.write(CLOSE, self.__session, time.time(), 0.0, -1, b'')
+        self.__device.close()
+
+
+class ReplayDevice:
+    """
+    Plays back one session of a capture log as a hid.Device.
+
+    The first session not replayed yet, for device_path and of one of
+    models if given, is used. The calls are expected in the recorded
+    order. Each returns
+    when it did in the recording, relative to the open, divided by
+    speed; 0 for no wait at all. Written data differing from the
+    recording is counted in mismatches, or raises with strict.
+    """
+    def __init__(self, log_path: str, device_path: bytes | None = None, speed: float = 1.0, strict: bool = False,
+                 models=None):
+        self.__error = hid_transport.DeviceError
+        self.__speed = speed
+        self.__strict = strict
+        self.mismatches = 0
+        self.__records = []
+        self.__origin = None
+        self.model = None
+        session = None
+        for record in read_log(log_path):
+            op = record[0] & ~ERROR
+            if op == OPEN:
+                path, model = parse_open(record[5])
+                if (
+                    session is None
+                    and (device_path is None or path == device_path)
+                    and _matches(model, models)
+                    and _take_session(log_path, record[1], record[2])
+                ):
+                    session = record[1]
+                    self.path = path
+                    self.model = model
+                    self.__origin = record[2]
+            elif op != CLOSE and record[1] == session and session is not None:
+                self.__records.append(record)
+        if session is None:
+            raise self.__error(f'No session to replay in {log_path}')
+        self.__start = time.perf_counter()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __next(self, op: int, sent: bytes | None):
+        if not self.__records:
+            raise self.__error('Replay exhausted')
+        record_op, _, start, duration, _, payload = self.__records.pop(0)
+        if record_op & ~ERROR != op:
+            raise self.__error(f'Replay expected {OP_NAMES[record_op & ~ERROR]}, got {OP_NAMES[op]}')
+        if self.__speed > 0:
+            # Wait for the recorded end of the call
+            delay = (start - self.__origin + duration) / self.__speed - (time.perf_counter() - self.__start)
+            if delay > 0:
+                time.sleep(delay)
+        if record_op & ERROR:
+            raise self.__error(payload.decode(errors='replace'))
+        if sent is not None and bytes(sent) != payload:
+            self.mismatches += 1
+            if self.__strict:
+                raise self.__error(f'Replay mismatch on {OP_NAMES[op]}')
+        return payload
+
+    def write(self, data):
+        self.__next(WRITE, data)
+        return len(data)
+
+    def read(self, size, timeout=None):
+        return self.__next(READ, None)[:size]
+
+    def send_feature_report(self, data):
+        self.__next(SEND_FEATURE, data)
+        return len(data)
+
+    def get_feature_report(self, report_id, size):
+        return self.__next(GET_FEATURE, None)[:size]
+
+    def close(self):
+        pass
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    subparser = parser.add_subparsers(dest='cmd', required=True)
+    sub = subparser.add_parser('dump', help='Prints the records of a log')
+    sub.add_argument('log', help='Capture log')
+    args = parser.parse_args()
+
+    origins = {}
+    for op, session, start, duration, arg, payload in read_log(args.log):
+        origin = origins.setdefault(session, start)
+        name = OP_NAMES[op & ~ERROR] + (' ERROR' if op & ERROR else '')
+        if op == OPEN:
+            path, model = parse_open(payload)
+            detail = f'{path.decode(errors="replace")} {model or ""}'
+        else:
+            detail = payload.decode(errors='replace') if op & ERROR else payload[:16].hex(' ')
+        print(f'{session:16x} {(start - origin) * 1000:10.3f} ms {duration * 1000:8.3f} ms '
+              f'{name:22} {arg:5} {len(payload):4}  {detail}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""
+Thin client for hid_daemon.py.
+
+Takes the same arguments as hid_board.py or hid_mouse.py, prefixed by
+the target:
+    hid_client.py board --set 0 255 255
+    hid_client.py mouse single 0xFF0000 4
+
+Each call is one round trip on the daemon's Unix socket, set
+QMK_TOOLS_SOCKET to use another socket than the default one.
+
+--priority N and --ttl SECONDS, before the target, send the LED state
+change to the daemon scheduler:
+    hid_client.py --priority 10 --ttl 30 board --set 0 255 255
+"""
+import json
+import os
+import socket
+import sys
+import tempfile
+
+
+def default_socket_path() -> str:
+    if 'QMK_TOOLS_SOCKET' in os.environ:
+        return os.environ['QMK_TOOLS_SOCKET']
+    return os.path.join(os.environ.get('XDG_RUNTIME_DIR', tempfile.gettempdir()), 'qmk_tools.sock')
+
+
+def send(target: str, argv: list[str], socket_path: str | None = None,
+         priority: int | None = None, ttl: float | None = None) -> list[str]:
+    """
+    Sends one command to the daemon, returns the lines to print.
+    """
+    request = {'target': target, 'argv': argv}
+    if priority is not None:
+        request['priority'] = priority
+    if ttl is not None:
+        request['ttl'] = ttl
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+        s.connect(socket_path or default_socket_path())
+        s.sendall(json.dumps(request).encode() + b'\n')
+        with s.makefile('rb') as reply:
+            return json.loads(reply.readline())['output']
+
+
+def main(argv: list[str] | None = None) -> None:
+    argv = sys.argv[1:] if argv is None else list(argv)
+    options = {}
+    try:
+        while argv and argv[0] in ('--priority', '--ttl'):
+            option = argv.pop(0)[2:]
+            options[option] = int(argv.pop(0), 0) if option == 'priority' else float(argv.pop(0))
+    except (IndexError, ValueError):
+        argv = []
+    if not argv or argv[0] not in ('board', 'mouse'):
+        print(f'usage: {sys.argv[0]} [--priority N] [--ttl SECONDS] {{board,mouse}} ...')
+        sys.exit(2)
+    try:
+        for line in send(argv[0], argv[1:], **options):
+            print(line)
+    except (ConnectionError, FileNotFoundError) as err:
+        print(f'Error: daemon not reachable ({err})')
+
+
+if __name__ == '__main__':
+    main()
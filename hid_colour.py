@@ -0,0 +1,72 @@
+"""
+Integer RGB to HSV conversion, with QMK's 0-255 scales.
+
+The hue circle is 6 sectors of 43 like QMK's hsv_to_rgb, red at 0,
+green at 85 and blue at 171. All the values are rounded to the nearest
+integer, without any float.
+
+The batch functions convert whole frame sequences, 0xRRGGBB values, at
+once: hsv_frames into packed HSV triplets, set_reports into the 64
+bytes HNC_SET reports ready to be written.
+"""
+from collections.abc import Iterable
+
+REPORT_SIZE = 64
+SET_HEADER = b'NIC\x03'  # hid_board HNC_SET
+
+
+def rgb_to_hsv(red: int, green: int, blue: int) -> tuple[int, int, int]:
+    """
+    0-255 RGB to 0-255 HSV.
+    """
+    high = max(red, green, blue)
+    delta = high - min(red, green, blue)
+    if delta == 0:
+        return 0, 0, high
+    saturation = (510 * delta + high) // (2 * high)
+    # floor(43 * x / delta + 0.5), x being negative in the red sector
+    if high == red:
+        hue = (86 * (green - blue) + delta) // (2 * delta)
+    elif high == green:
+        hue = 85 + (86 * (blue - red) + delta) // (2 * delta)
+    else:
+        hue = 171 + (86 * (red - green) + delta) // (2 * delta)
+    return hue & 0xFF, saturation, high
+
+
+def hsv_bytes(raw_value: int) -> bytes:
+    """
+    0xRRGGBB to the 3 HSV bytes of HNC_SET.
+    """
+    return bytes(rgb_to_hsv((raw_value >> 16) & 0xFF, (raw_value >> 8) & 0xFF, raw_value & 0xFF))
+
+
+def hsv_frames(rgbs: Iterable[int]) -> bytes:
+    """
+    Packed HSV triplets of the 0xRRGGBB frames.
+    """
+    # Animations repeat their colours, each one is converted once.
+    converted = {}
+    frames = bytearray()
+    for raw_value in rgbs:
+        hsv = converted.get(raw_value)
+        if hsv is None:
+            hsv = converted[raw_value] = hsv_bytes(raw_value)
+        frames += hsv
+    return bytes(frames)
+
+
+def set_reports(rgbs: Iterable[int]) -> bytearray:
+    """
+    The HNC_SET reports of the 0xRRGGBB frames, one after the other,
+    REPORT_SIZE bytes each.
+    """
+    frames = hsv_frames(rgbs)
+    count = len(frames) // 3
+    reports = bytearray(count * REPORT_SIZE)
+    header = len(SET_HEADER)
+    for index in range(len(SET_HEADER)):
+        reports[index::REPORT_SIZE] = SET_HEADER[index:index + 1] * count
+    for index in range(3):
+        reports[header + index::REPORT_SIZE] = frames[index::3]
+    return reports
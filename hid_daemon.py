@@ -0,0 +1,364 @@
+"""
+Little daemon keeping the keyboard and mouse HID handles open.
+
+Running hid_board.py or hid_mouse.py for every notification means
+importing hid, enumerating and opening the device each time. The
+daemon does that once and then waits for commands on a local Unix
+socket, hid_client.py being the matching thin client.
+
+The protocol is one JSON line each way:
+Request : {"target": "board" or "mouse", "argv": [...]}
+Reply   : {"output": [lines to print]}
+
+The argv is the same as the one given to hid_board.py/hid_mouse.py.
+The request can also have a "priority" (integer) and a "ttl" in seconds,
+the LED state changes are then coalesced and rate limited by
+hid_scheduler, the reply is sent without waiting for the device. The
+state changes without them are the base states, shown again when the
+notifications expire, and only applied then while one is shown. Before
+the first notification, the state shown is read from the device.
+
+On Linux, hid_registry follows the hidraw hotplug events: an unplugged
+device is closed right away, and reopened as soon as it is back.
+
+The devices are opened through hid_transport, the hid package, using
+the hidapi library, is only needed for its hidapi transport.
+"""
+import argparse
+import contextlib
+import io
+import json
+import math
+import os
+import signal
+import socketserver
+import sys
+import threading
+
+import hid_board
+import hid_discovery
+import hid_mouse
+import hid_registry
+import hid_scheduler
+import hid_snapshot
+import hid_timing
+import hid_transport
+from hid_client import default_socket_path
+
+# argparse prints help and errors, redirecting them is process wide.
+_parse_lock = threading.Lock()
+
+
+class DeviceHandle:
+    """
+    HID device opened on first use and kept open, reopened after errors.
+    """
+    def __init__(self, name: str, cli, group: str, ids_by_name: dict):
+        self.name = name
+        self.cli = cli
+        self.group = group
+        self.keys = {hid_discovery.device_key(ids) for ids in ids_by_name.values()}
+        # Reentrant, held from the scheduling decision to the write
+        self.lock = threading.RLock()
+        self.parser = cli.create_parser()
+        self.parser.prog = f'hid_client.py {name}'
+        self.scheduler = None
+        self.path = None
+        self.__device = None
+
+    def open(self):
+        if self.__device is None:
+            self.__device = self.cli.open_device()
+            entry = hid_discovery.cached_entry(self.group)
+            if self.__device is not None and entry is not None:
+                self.path = os.fsencode(entry['path'])
+        return self.__device
+
+    def close(self) -> None:
+        if self.__device is not None:
+            try:
+                self.__device.close()
+            except hid_transport.device_errors():
+                pass
+            self.__device = None
+            self.path = None
+
+    def hotplug(self, action: str, entry: dict) -> None:
+        """
+        hid_registry listener, closes the device when unplugged and
+        opens it again when back.
+        """
+        key = (entry['vendor_id'], entry['product_id'], entry['usage_page'], entry['usage'])
+        with self.lock:
+            if action == 'remove' and entry['path'] == self.path:
+                self.close()
+            elif action == 'add' and key in self.keys and self.__device is None:
+                try:
+                    self.open()
+                except hid_transport.device_errors() as err:
+                    # udev may not have set the permissions yet, next event
+                    print(f'{self.name}: {err}')
+
+    def run(self, argv: list[str], priority: int | None = None, ttl: float | None = None) -> list[str]:
+        """
+        Runs a command line on the device, returns the lines to print.
+        With a priority or ttl, the LED state changes go through the
+        scheduler instead, see hid_scheduler.
+        """
+        args, lines = self.parse(argv)
+        if args is None:
+            return lines
+        channel = self.channel(args)
+        if channel is not None and self.scheduler is not None:
+            if priority is not None or ttl is not None:
+                with self.lock:
+                    if self.scheduler.needs_base(self.name, channel):
+                        base = self.current_state(channel)
+                        if base is not None:
+                            self.scheduler.set_base(self.name, channel, base)
+                self.scheduler.submit(self.name, channel, tuple(argv), priority or 0, ttl)
+                return []
+            with self.lock:
+                if not self.scheduler.set_base(self.name, channel, tuple(argv)):
+                    return []  # Applied when the notifications expire
+                lines = self.run_args(args)
+        else:
+            lines = self.run_args(args)
+        if args.timings:
+            # Since the daemon start, or its last export
+            lines += hid_timing.breakdown()
+        return lines
+
+    def parse(self, argv: list[str]) -> tuple[argparse.Namespace | None, list[str]]:
+        """
+        The parsed arguments, or None and the argparse messages.
+        """
+        output = io.StringIO()
+        with _parse_lock, contextlib.redirect_stdout(output), contextlib.redirect_stderr(output):
+            try:
+                return self.parser.parse_args(argv), []
+            except SystemExit:
+                return None, output.getvalue().splitlines()
+
+    def apply(self, argv: list[str]) -> list[str]:
+        """
+        Runs a state of the scheduler on the device.
+        """
+        args, lines = self.parse(argv)
+        return lines if args is None else self.run_args(args)
+
+    def current_state(self, channel: str) -> tuple | None:
+        """
+        Command line of the state shown on channel, None when unknown.
+        Called with the lock held.
+        """
+        return None
+
+    def run_args(self, args: argparse.Namespace) -> list[str]:
+        with self.lock:
+            # One retry, the device may have been unplugged since opened.
+            for attempt in range(2):
+                try:
+                    h = self.open()
+                    if h is None:
+                        return ['Device not present']
+                    return self.run_on(h, args)
+                except hid_transport.device_errors() as err:
+                    self.close()
+                    if attempt:
+                        return [f'Error: {err}']
+        return []
+
+    def run_on(self, h, args: argparse.Namespace) -> list[str]:
+        return self.cli.run_command(h, args)
+
+    def channel(self, args: argparse.Namespace) -> str | None:
+        """
+        Scheduler channel of a LED state change, None for the others.
+        """
+        return None
+
+
+class BoardHandle(DeviceHandle):
+    def __init__(self):
+        super().__init__('board', hid_board, 'keyboard', hid_board.keyboards_hid_ids)
+
+    def run_args(self, args: argparse.Namespace) -> list[str]:
+        if args.stream is not None or args.session:
+            return ['Error: --stream/--session read stdin, use hid_board.py']
+        if args.all:
+            return self.run_all(args)
+        return super().run_args(args)
+
+    def run_all(self, args: argparse.Namespace) -> list[str]:
+        """
+        Every keyboard, the held one through its handle and lock, the
+        others opened for the command.
+        """
+        with self.lock:
+            try:
+                h = self.open()
+            except hid_transport.device_errors():
+                self.close()
+                h = None
+            path = None if h is None or self.path is None else os.fsdecode(self.path)
+        opened = {} if path is None else {path: (h, self.lock)}
+        results = hid_board.broadcast(args, opened=opened)
+        if any(result.path == path and result.error is not None for result in results):
+            with self.lock:
+                self.close()  # Reopened on next use
+        return hid_board.format_broadcast(results)
+
+    def current_state(self, channel: str) -> tuple | None:
+        if channel == 'power':
+            # Not in the NIC replies, last published by the tools
+            snapshot = hid_snapshot.read()
+            if snapshot is None or snapshot.enabled is None:
+                return None
+            return ('--on',) if snapshot.enabled else ('--off',)
+        from hid_session import KeyboardSession
+        try:
+            h = self.open()
+            hsv = None if h is None else KeyboardSession(h).get_hsv()
+        except hid_transport.device_errors():
+            self.close()
+            return None
+        return None if hsv is None else ('--set', *(str(value) for value in hsv))
+
+    def channel(self, args: argparse.Namespace) -> str | None:
+        if args.all:
+            return None
+        if args.on or args.off:
+            return 'power'
+        if args.set is not None or args.rgb is not None:
+            return 'colour'
+        return None
+
+
+class MouseHandle(DeviceHandle):
+    def __init__(self):
+        from hid_glorious import model_O_ids
+        super().__init__('mouse', hid_mouse, 'mouse', {'model_O': model_O_ids})
+
+    def run_args(self, args: argparse.Namespace) -> list[str]:
+        # Nothing to send, the device isn't needed.
+        lines = hid_mouse.run_from_shadow(args, hid_mouse.shadow_key())
+        if lines is not None:
+            return lines
+        return super().run_args(args)
+
+    def run_on(self, h, args: argparse.Namespace) -> list[str]:
+        return hid_mouse.run_command(h, args, hid_mouse.shadow_key())
+
+    def current_state(self, channel: str) -> tuple | None:
+        from hid_glorious import GloriousModelORecord
+        try:
+            h = self.open()
+            if h is None:
+                return None
+            config = hid_mouse.load_config(h, hid_mouse.shadow_key())
+        except hid_transport.device_errors():
+            self.close()
+            return None
+        argv = hid_mouse.effect_argv(GloriousModelORecord(config))
+        return None if argv is None else tuple(argv)
+
+    def channel(self, args: argparse.Namespace) -> str | None:
+        if args.cmd is None or args.config or args.raw_config:
+            return None
+        return 'effect'
+
+
+def scheduling(request: dict) -> tuple[int | None, float | None]:
+    """
+    (priority, ttl) of a request, raises ValueError for invalid ones.
+    """
+    priority = request.get('priority')
+    ttl = request.get('ttl')
+    if priority is not None and (not isinstance(priority, int) or isinstance(priority, bool)):
+        raise ValueError('priority must be an integer')
+    if ttl is not None and (
+        not isinstance(ttl, (int, float)) or isinstance(ttl, bool) or not math.isfinite(ttl) or ttl <= 0
+    ):
+        raise ValueError('ttl must be a positive number of seconds')
+    return priority, ttl
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        try:
+            request = json.loads(self.rfile.readline())
+            handle = self.server.handles[request['target']]
+            output = handle.run([str(arg) for arg in request['argv']], *scheduling(request))
+        except (ValueError, KeyError, TypeError) as err:
+            output = [f'Error: bad request {err}']
+        self.wfile.write(json.dumps({'output': output}).encode() + b'\n')
+        if self.server.timings_export:
+            try:
+                hid_timing.export(self.server.timings_export)
+            except OSError:
+                pass
+
+
+class LedDaemon(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, timings_export: str | None = None):
+        self.timings_export = timings_export
+        self.handles = {
+            'board': BoardHandle(),
+            'mouse': MouseHandle(),
+        }
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        super().__init__(socket_path, _RequestHandler)
+        os.chmod(socket_path, 0o600)
+        # The mouse read-modify-write and its settle wait take up to 100 ms more.
+        self.scheduler = hid_scheduler.NotificationScheduler(
+            lambda device, state: self.handles[device].apply(list(state)),
+            min_intervals={'board': 0.05, 'mouse': 0.25})
+        for handle in self.handles.values():
+            handle.scheduler = self.scheduler
+
+    def server_close(self):
+        super().server_close()
+        self.scheduler.close()
+        for handle in self.handles.values():
+            handle.close()
+        if os.path.exists(self.server_address):
+            os.unlink(self.server_address)
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--socket', help='Unix socket path', default=default_socket_path())
+    parser.add_argument('--timings-export', help='Accumulates the HID timings in a JSON or Prometheus (.prom) file, '
+                        'see hid_timing', metavar='PATH')
+    args = parser.parse_args(argv)
+
+    # Stopped by a service manager, still cleanup the socket.
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
+    with LedDaemon(args.socket, args.timings_export) as server:
+        registry = hid_registry.start_registry()
+        if registry is not None:
+            for handle in server.handles.values():
+                registry.add_listener(handle.hotplug)
+        # Open the devices now, the first notification shouldn't pay for it.
+        for handle in server.handles.values():
+            with handle.lock:
+                try:
+                    handle.open()
+                except hid_transport.device_errors() as err:
+                    print(f'{handle.name}: {err}')
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if registry is not None:
+                registry.stop()
+
+
+if __name__ == '__main__':
+    main()
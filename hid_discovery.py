@@ -0,0 +1,234 @@
+"""
+Device discovery shared by the keyboard and mouse tools.
+
+hid.enumerate is called once for all the devices and the result indexed
+by (vid, pid, usage_page, usage), instead of one enumerate per known
+device followed by a linear search.
+
+The resolved paths are kept in a small cache file. A cached path is used
+as long as it still opens and is the same device, enumeration only
+happens when it isn't. The identity of a /dev/hidraw path, vid, pid,
+usages and serial, is read from its sysfs node without enumerating.
+A long running process can set a hid_registry instead, kept up to date
+by the hotplug events, and never enumerate again. With
+HID_TRANSPORT=fake, the emulated devices of hid_fake are found instead,
+with HID_TRANSPORT=hidraw the sysfs hidraw nodes, without hidapi.
+
+This code used the hid package, using the hidapi library, imported on
+first use only.
+"""
+import contextlib
+import json
+import os
+import threading
+
+import hid_timing
+
+CACHE_PATH = os.path.join(
+    os.environ.get('XDG_CACHE_HOME', os.path.join(os.path.expanduser('~'), '.cache')),
+    'qmk_tools',
+    'devices.json')
+
+
+# hid_registry.HidrawRegistry replacing hid.enumerate, if any
+_registry = None
+
+
+def set_registry(registry) -> None:
+    global _registry
+    _registry = registry
+
+
+def device_key(ids) -> tuple[int, int, int, int]:
+    """
+    Index key for KeyboardIds/MouseIds.
+    """
+    return ids.vid, ids.pid, ids.usage_page, ids.usage_id
+
+
+def enumerate_index() -> dict[tuple[int, int, int, int], list[dict]]:
+    """
+    All the HID devices, from a single enumerate, indexed by device_key.
+    """
+    if _registry is not None:
+        return _registry.index()
+    index = {}
+    with hid_timing.timed('all', 'enumerate'):
+        if os.environ.get('HID_TRANSPORT') == 'fake':
+            import hid_fake
+            devices = hid_fake.devices()
+        elif os.environ.get('HID_TRANSPORT') == 'hidraw':
+            import hid_registry
+            devices = hid_registry.read_nodes(hid_registry.SYSFS_HIDRAW)
+        else:
+            import hid
+            devices = hid.enumerate()
+    for device in devices:
+        key = (device['vendor_id'], device['product_id'], device['usage_page'], device['usage'])
+        index.setdefault(key, []).append(device)
+    return index
+
+
+def load_cache() -> dict:
+    try:
+        with open(CACHE_PATH) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_cache(cache: dict) -> None:
+    try:
+        os.makedirs(os.path.dirname(CACHE_PATH), exist_ok=True)
+        tmp_path = f'{CACHE_PATH}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(cache, f, indent=1)
+        os.replace(tmp_path, CACHE_PATH)
+    except OSError:
+        pass  # Only a cache
+
+
+_cache_lock = threading.Lock()
+
+
+@contextlib.contextmanager
+def updating_cache():
+    """
+    The cache to change, saved at the end. The threads of the process
+    don't lose each other's changes.
+    """
+    with _cache_lock:
+        cache = load_cache()
+        yield cache
+        save_cache(cache)
+
+
+def cached_entry(group: str) -> dict | None:
+    """
+    Cached {'name', 'path', 'serial'} of a device group, if any.
+    """
+    return load_cache().get(group)
+
+
+def find_device(group: str, ids_by_name: dict) -> dict | None:
+    """
+    Enumerates and returns the first device matching ids_by_name, in the
+    dict order, as a cache entry. The cache is updated.
+    """
+    index = enumerate_index()
+    for name, ids in ids_by_name.items():
+        devices = index.get(device_key(ids))
+        if devices:
+            entry = {
+                'name': name,
+                'path': os.fsdecode(devices[0]['path']),
+                'serial': devices[0].get('serial_number'),
+            }
+            with updating_cache() as cache:
+                cache[group] = entry
+            return entry
+    return None
+
+
+def find_all_devices(ids_by_name: dict) -> list[dict]:
+    """
+    Every device matching ids_by_name, from a single enumerate, as
+    {'name', 'path', 'serial'} entries. Not cached, a new device must
+    be seen.
+    """
+    if os.environ.get('HID_REPLAY'):
+        import hid_capture
+        return [
+            {'name': model or 'replay', 'path': os.fsdecode(path), 'serial': None}
+            for path, model in hid_capture.sessions(os.environ['HID_REPLAY'], ids_by_name)
+        ]
+    index = enumerate_index()
+    return [
+        {
+            'name': name,
+            'path': os.fsdecode(device['path']),
+            'serial': device.get('serial_number'),
+        }
+        for name, ids in ids_by_name.items()
+        for device in index.get(device_key(ids), [])
+    ]
+
+
+def open_path(path: bytes | None, model: str = 'unknown', models=None):
+    """
+    Opens a device path with the HID_TRANSPORT selected, see
+    hid_transport, timing its operations under model, see hid_timing.
+    The traffic is recorded with HID_CAPTURE set, see hid_capture. With
+    HID_REPLAY set, the recorded session of path, or the next one of
+    models for None, is replayed instead.
+    """
+    with hid_timing.timed(model, 'open'):
+        if os.environ.get('HID_REPLAY'):
+            import hid_capture
+            device = hid_capture.ReplayDevice(
+                os.environ['HID_REPLAY'], path, speed=float(os.environ.get('HID_REPLAY_SPEED', 1)), models=models)
+        else:
+            import hid_transport
+            device = hid_transport.open_path(path)
+            if os.environ.get('HID_CAPTURE'):
+                import hid_capture
+                device = hid_capture.RecordingDevice(device, os.environ['HID_CAPTURE'], path, model)
+    return hid_timing.TimedDevice(device, model)
+
+
+def _path_devices(path: bytes) -> list[dict] | None:
+    """
+    hid.enumerate like entries of the device at path, without
+    enumerating. None when they can't be known for path.
+    """
+    if os.environ.get('HID_TRANSPORT') == 'fake':
+        import hid_fake
+        return [device for device in hid_fake.devices() if device['path'] == path]
+    if path.startswith(b'/dev/hidraw'):
+        import hid_registry
+        return hid_registry.read_node(os.path.basename(os.fsdecode(path)), hid_registry.SYSFS_HIDRAW)
+    return None
+
+
+def cached_path_matches(entry: dict, ids) -> bool:
+    """
+    Whether the cached path of entry is still its device: the ids, and
+    the serial when cached. A path of another device after a replug,
+    or gone, doesn't. The paths of unknown identity are trusted.
+    """
+    devices = _path_devices(os.fsencode(entry['path']))
+    if devices is None:
+        return True
+    return any(
+        (device['vendor_id'], device['product_id'], device['usage_page'], device['usage']) == device_key(ids)
+        and (not entry.get('serial') or device.get('serial_number') == entry['serial'])
+        for device in devices
+    )
+
+
+def open_device(group: str, ids_by_name: dict):
+    """
+    Opens the device of a group, like 'keyboard' or 'mouse', from the
+    cached path when it is still the device and opens, enumerating
+    otherwise.
+    None if no device is present.
+    """
+    if os.environ.get('HID_REPLAY'):
+        # The next session of one of the models of the group
+        return open_path(None, group, ids_by_name)
+
+    import hid_transport
+    entry = cached_entry(group)
+    if (
+        entry is not None
+        and entry['name'] in ids_by_name
+        and cached_path_matches(entry, ids_by_name[entry['name']])
+    ):
+        try:
+            return open_path(os.fsencode(entry['path']), entry['name'])
+        except hid_transport.device_errors():
+            pass  # Unplugged or moved, look for it again
+    entry = find_device(group, ids_by_name)
+    if entry is None:
+        return None
+    return open_path(os.fsencode(entry['path']), entry['name'])
@@ -0,0 +1,197 @@
+"""
+Bulk decoder of Glorious Model O configuration dumps.
+
+Reads hid_mouse.py --raw_config outputs, 16 hex bytes per line, from
+files or stdin, one line at a time. Each 520 bytes run of hex lines is
+a dump, decoded with GloriousModelORecord into one CSV or JSON Lines
+row, see glorious_model_o_config.txt for the fields. Any other line
+ends a dump, a shorter run is reported as truncated.
+
+The summary printed on stderr has the anomalies, against the 04 11
+report header and the 00 read marker, and the field values outside of
+their enumeration, then the values seen in the unknown 0x68-0x73
+region, with their counts.
+
+    hid_dumps.py [--format csv|jsonl] [--top N] [FILE ...]
+"""
+import argparse
+import collections
+import csv
+import json
+import sys
+from enum import IntEnum
+
+from hid_glorious import CONFIG_SIZE, MARKER_OFFSET, FieldPacking, GloriousEffect, GloriousModelORecord
+
+HEADER_SIZE = 0x0D
+REPORT_HEADER = b'\x04\x11'
+UNKNOWN_START = 0x68
+UNKNOWN_END = 0x74
+EFFECT_OFFSET = GloriousModelORecord.effect.offset
+
+_EFFECTS = frozenset(GloriousEffect)
+_ENUM_FIELDS = [
+    (name, field) for name, field in GloriousModelORecord.fields().items()
+    if field.packing == FieldPacking.BYTE and field.kind is not None
+]
+_VALUES = {field.kind: frozenset(field.kind) for _, field in _ENUM_FIELDS}
+
+
+class DumpReader:
+    """
+    Yields (source, line number, dump) for each complete dump, dump
+    being a memoryview of a buffer reused for the next one.
+    """
+    def __init__(self):
+        self.truncated = 0
+        self.invalid_lines = 0
+        self.__buffer = bytearray(CONFIG_SIZE)
+        self.__view = memoryview(self.__buffer)
+
+    def read(self, source: str, lines):
+        size = 0
+        start = 0
+        for number, line in enumerate(lines, 1):
+            try:
+                data = bytes.fromhex(line)
+            except ValueError:
+                data = None
+                self.invalid_lines += line.strip() != ''
+            if not data:
+                if size:
+                    self.truncated += 1
+                    size = 0
+                continue
+            if not size:
+                start = number
+            while data:
+                chunk = data[:CONFIG_SIZE - size]
+                self.__view[size:size + len(chunk)] = chunk
+                size += len(chunk)
+                if size == CONFIG_SIZE:
+                    yield source, start, self.__view
+                    size = 0
+                    start = number if len(data) > len(chunk) else number + 1
+                data = data[len(chunk):]
+        if size:
+            self.truncated += 1
+
+
+def _column(field, value):
+    if field.packing == FieldPacking.RBG:
+        return f'{value:06X}'
+    if field.packing == FieldPacking.RBGS:
+        return [f'{rgb:06X}' for rgb in value]
+    if isinstance(value, IntEnum):
+        return value.name
+    return value
+
+
+def decode_row(dump: memoryview) -> dict:
+    """
+    Output row of a dump, the fields as text friendly values.
+    """
+    record = GloriousModelORecord.over(dump)
+    fields = GloriousModelORecord.fields()
+    row = {'header': dump[:HEADER_SIZE].hex(' ')}
+    for name, value in record.decode().items():
+        row[name] = _column(fields[name], value)
+    try:
+        row['effect'] = GloriousEffect(row['effect']).name
+    except ValueError:
+        pass  # Unknown effect, kept as a number
+    row['unknown_68_73'] = dump[UNKNOWN_START:UNKNOWN_END].hex(' ')
+    return row
+
+
+def header_anomalies(dump: memoryview) -> list[str]:
+    anomalies = []
+    if dump[:len(REPORT_HEADER)] != REPORT_HEADER:
+        anomalies.append(f'report header {dump[:len(REPORT_HEADER)].hex(" ")}')
+    if dump[MARKER_OFFSET] != 0x00:
+        anomalies.append(f'marker {dump[MARKER_OFFSET]:02x}')
+    return anomalies
+
+
+def field_anomalies(dump: memoryview) -> list[str]:
+    """
+    The effect and enumerated fields with a value of none of their names.
+    """
+    anomalies = []
+    if dump[EFFECT_OFFSET] not in _EFFECTS:
+        anomalies.append(f'effect {dump[EFFECT_OFFSET]:02x}')
+    for name, field in _ENUM_FIELDS:
+        if dump[field.offset] not in _VALUES[field.kind]:
+            anomalies.append(f'{name} {dump[field.offset]:02x}')
+    return anomalies
+
+
+class Summary:
+    def __init__(self):
+        self.dumps = 0
+        self.anomalies = collections.Counter()
+        self.headers = collections.Counter()
+        self.unknown = collections.Counter()
+
+    def add(self, dump: memoryview) -> None:
+        self.dumps += 1
+        self.headers[dump[:HEADER_SIZE].hex(' ')] += 1
+        self.unknown[dump[UNKNOWN_START:UNKNOWN_END].hex(' ')] += 1
+        self.anomalies.update(header_anomalies(dump))
+        self.anomalies.update(field_anomalies(dump))
+
+    def lines(self, reader: DumpReader, top: int) -> list[str]:
+        lines = [
+            f'{self.dumps} dumps, {reader.truncated} truncated, {reader.invalid_lines} other lines',
+            'Anomalies:',
+        ]
+        lines += [f'\t{count:8} {anomaly}' for anomaly, count in self.anomalies.most_common()] or ['\tnone']
+        lines.append(f'Headers (0x00-0x0C), {len(self.headers)} distinct:')
+        lines += [f'\t{count:8} {header}' for header, count in self.headers.most_common(top)]
+        lines.append(f'Unknown region (0x68-0x73), {len(self.unknown)} distinct:')
+        lines += [f'\t{count:8} {values}' for values, count in self.unknown.most_common(top)]
+        return lines
+
+
+def _sources(paths: list[str]):
+    for path in paths:
+        if path == '-':
+            yield '-', sys.stdin
+        else:
+            with open(path) as f:
+                yield path, f
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('files', help='Dump files, stdin when none or -', nargs='*', default=['-'])
+    parser.add_argument('--format', help='Output format', choices=['csv', 'jsonl'], default='csv')
+    parser.add_argument('--top', help='Most common values in the summary', type=int, default=10)
+    args = parser.parse_args(argv)
+
+    reader = DumpReader()
+    summary = Summary()
+    columns = ['source', 'line', 'header', *GloriousModelORecord.fields(), 'unknown_68_73']
+    writer = None
+    if args.format == 'csv':
+        writer = csv.DictWriter(sys.stdout, columns)
+        writer.writeheader()
+    try:
+        for path, lines in _sources(args.files):
+            for source, line, dump in reader.read(path, lines):
+                summary.add(dump)
+                row = {'source': source, 'line': line, **decode_row(dump)}
+                if writer is None:
+                    print(json.dumps(row))
+                else:
+                    writer.writerow({
+                        name: ' '.join(value) if isinstance(value, list) else value for name, value in row.items()
+                    })
+    except OSError as err:
+        print(f'Error: {err}', file=sys.stderr)
+    for line in summary.lines(reader, args.top):
+        print(line, file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,218 @@
+"""
+In-process emulated devices, for the benchmarks and trying the tools
+without the hardware.
+
+FakeNicBoard implements the NIC protocol of hid_board.py, batches
+included: each report written gets its reply, the command echoed and
+the HSV values in the bytes 4-6. FakeModelO serves the 520 bytes
+configuration report of glorious_model_o_config.txt, read with the 00
+marker, and takes the written ones, with the 7B marker.
+
+Both have the hid.Device methods used by the tools, each call taking
+latency seconds, like the USB round trip of the real devices. Their
+state is kept per path for the process, a device opened again is as
+left.
+
+The tools use them with HID_TRANSPORT=fake, see hid_transport,
+HID_FAKE_LATENCY setting the latency in milliseconds (default 0). The
+hid package isn't needed then, the errors are hid_transport.DeviceError.
+"""
+import os
+import time
+
+import hid_board
+import hid_transport
+from hid_glorious import CONFIG_SIZE, MARKER_OFFSET, WRITE_MARKER, model_O_ids
+
+KEYBOARD_PATH = b'fake:keyboard'
+MOUSE_PATH = b'fake:model_O'
+
+# The configuration dump of glorious_model_o_config.txt
+MODEL_O_CONFIG = bytes.fromhex(
+    '04 11 00 00 00 00 00 00 64 06 04 34 f0 03 07 0f 1f 31 63 00 00 00 00 00 00 00 00 00 00 ff ff 00 '
+    '00 00 ff ff 00 00 00 ff 00 ff 00 ff ff ff ff 00 00 00 00 00 00 01 41 00 40 ff 00 00 42 07 ff 00 '
+    '00 00 ff 00 00 00 ff 00 ff ff ff ff 00 ff 00 ff ff ff ff 42 42 00 ff 00 00 00 ff 00 00 00 ff ff '
+    'ff 00 00 ff ff ff ff ff fa 00 ff ff 00 00 ff 00 00 ff 00 00 42 ff 00 00 00 ff 00 02 42 02 ff 00 '
+    '00 01 00').ljust(CONFIG_SIZE, b'\x00')
+CONFIG_REPORT_ID = 0x04
+
+# Arguments length of each NIC command
+_ARGUMENTS = {
+    hid_board.HNC_ON[0]: 0,
+    hid_board.HNC_OFF[0]: 0,
+    hid_board.HNC_SET[0]: 3,
+    hid_board.HNC_GET[0]: 0,
+    hid_board.HNC_SAVE[0]: 0,
+}
+
+
+def latency() -> float:
+    return float(os.environ.get('HID_FAKE_LATENCY', 0)) / 1000
+
+
+class _FakeDevice:
+    accepts_buffers = True
+
+    def __init__(self, path: bytes, latency: float):
+        self.path = path
+        self.latency = latency
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _wait(self) -> None:
+        if self.latency:
+            time.sleep(self.latency)
+
+    def write(self, data) -> int:
+        self._wait()
+        return len(data)
+
+    def read(self, size: int, timeout: int | None = None) -> bytes:
+        """
+        Nothing to read, waits the timeout.
+        """
+        if timeout:
+            time.sleep(timeout / 1000)
+        return b''
+
+    def send_feature_report(self, data) -> int:
+        self._wait()
+        return len(data)
+
+    def get_feature_report(self, report_id: int, size: int) -> bytes:
+        self._wait()
+        return bytes([report_id]) + bytes(size - 1)
+
+    def close(self) -> None:
+        pass
+
+
+class FakeNicBoard(_FakeDevice):
+    """
+    Keyboard with the NIC firmware, CAPS_BATCH supported with batch.
+    """
+    def __init__(self, path: bytes = KEYBOARD_PATH, latency: float = 0.0, batch: bool = True):
+        super().__init__(path, latency)
+        self.batch = batch
+        self.enabled = True
+        self.hsv = bytearray(b'\x00\xFF\xFF')
+        self.saved = bytes(self.hsv)
+        self.replies = []
+
+    def __run(self, report, offset: int) -> int:
+        """
+        Runs the command at offset, returns the offset after it.
+        """
+        command = report[offset]
+        if command == hid_board.HNC_ON[0]:
+            self.enabled = True
+        elif command == hid_board.HNC_OFF[0]:
+            self.enabled = False
+        elif command == hid_board.HNC_SET[0]:
+            self.hsv[:] = report[offset + 1:offset + 4]
+        elif command == hid_board.HNC_SAVE[0]:
+            self.saved = bytes(self.hsv)
+        return offset + 1 + _ARGUMENTS.get(command, 0)
+
+    def write(self, data) -> int:
+        self._wait()
+        report = bytes(data)
+        if report[:3] != b'NIC' or len(report) < 4:
+            return len(data)
+        command = report[3]
+        reply = bytearray(hid_board.REPORT_SIZE)
+        reply[:4] = report[:4]
+        if command == hid_board.HNC_CAPS[0]:
+            reply[7:11] = b'CAP' + bytes([hid_board.CAPS_BATCH if self.batch else 0])
+        elif command == hid_board.HNC_BATCH[0] and self.batch:
+            offset = 5
+            for _ in range(report[4]):
+                offset = self.__run(report, offset)
+            reply[7:11] = b'BAT' + report[4:5]
+        elif command in _ARGUMENTS:
+            self.__run(report, 3)
+        else:
+            return len(data)  # Unknown command, no reply
+        reply[4:7] = self.hsv
+        self.replies.append(bytes(reply))
+        return len(data)
+
+    def read(self, size: int, timeout: int | None = None) -> bytes:
+        if not self.replies:
+            return super().read(size, timeout)
+        return self.replies.pop(0)[:size]
+
+
+class FakeModelO(_FakeDevice):
+    """
+    Glorious Model O configuration interface.
+    """
+    def __init__(self, path: bytes = MOUSE_PATH, latency: float = 0.0, config: bytes = MODEL_O_CONFIG):
+        super().__init__(path, latency)
+        self.config = bytearray(config)
+        self.writes = 0
+
+    def send_feature_report(self, data) -> int:
+        self._wait()
+        if len(data) == len(self.config) and data[MARKER_OFFSET] == WRITE_MARKER:
+            self.config[:] = data
+            self.config[MARKER_OFFSET] = 0x00
+            self.writes += 1
+        return len(data)
+
+    def get_feature_report(self, report_id: int, size: int) -> bytes:
+        self._wait()
+        if report_id != CONFIG_REPORT_ID:
+            return super().get_feature_report(report_id, size)
+        return bytes(self.config[:size])
+
+
+# Path -> device state, created on first open
+_devices = {}
+
+
+def _ids_entry(path: bytes, ids, serial: str) -> dict:
+    return {
+        'path': path,
+        'vendor_id': ids.vid,
+        'product_id': ids.pid,
+        'usage_page': ids.usage_page,
+        'usage': ids.usage_id,
+        'serial_number': serial,
+    }
+
+
+def devices() -> list[dict]:
+    """
+    The fake devices, like hid.enumerate: the first known keyboard and
+    the Model O.
+    """
+    keyboard_ids = next(iter(hid_board.keyboards_hid_ids.values()))
+    return [
+        _ids_entry(KEYBOARD_PATH, keyboard_ids, 'fake-keyboard'),
+        _ids_entry(MOUSE_PATH, model_O_ids, 'fake-model_O'),
+    ]
+
+
+def open_path(path: bytes):
+    device = _devices.get(path)
+    if device is None:
+        if path == KEYBOARD_PATH:
+            device = FakeNicBoard(path, latency())
+        elif path == MOUSE_PATH:
+            device = FakeModelO(path, latency())
+        else:
+            raise hid_transport.DeviceError(f'Unable to open {os.fsdecode(path)}: no such fake device')
+        _devices[path] = device
+    return device
+
+
+def reset() -> None:
+    """
+    Forgets the fake devices state.
+    """
+    _devices.clear()
@@ -5,7 +5,8 @@ Maybe for others, but it's the only one I have.
 This code is far from being complete, only the set single colour
 and set effect is done. Those are the one I personally use.
 """
-import copy
+import sys
+from array import array
 from enum import IntEnum
 
 
@@ -39,295 +40,266 @@ class EffectDirection(IntEnum):
 model_O_ids = MouseIds(vid=0x258A, pid=0x0036, usage_page=0xFF00, usage_id=1)
 
 
-class GloriousModelORecord:
-    def __init__(self, bytes_data: bytes):
-        self.__raw = bytearray(copy.copy(bytes_data))
-
-    def __str__(self) -> str:
-        res = 'Glorious Model O configuration:'
-        res += f'\n\tMode({GloriousEffect(self.effect).name})'
-        res += f'\n\tGlorious({self.glorious_direction.name}, {self.glorious_speed})'
-        res += f'\n\tSingle RGB({self.single_rgb:06X}, {self.single_rgb_brightness})'
-        res += f'\n\tBreathing({[f"{rgb:06X}" for rgb in self.breath_rgbs]}, {self.breath_speed})'
-        res += f'\n\tTail({self.tail_brightness}, {self.tail_speed})'
-        res += f'\n\tSeamless Breathing({self.seamless_speed})'
-        res += f'\n\tSix RGB({[f"{rgb:06X}" for rgb in self.constant_rgbs]})'
-        res += f'\n\tRave({[f"{rgb:06X}" for rgb in self.rave_rgbs]}, {self.rave_brightness}, {self.rave_speed})'
-        res += f'\n\tRandom({self.random_speed})'
-        res += f'\n\tWave({self.wave_brightness}, {self.wave_speed})'
-        res += f'\n\tBreathing mono({self.single_breath_rgb:06X}, {self.single_breath_speed})'
-        return res
-
-    @property
-    def record(self) -> bytes:
-        return bytes(copy.copy(self.__raw))
-
-    @property
-    def effect(self):
-        return self.__raw[0x35]
-
-    @effect.setter
-    def effect(self, effect: GloriousEffect):
-        self.__raw[0x35] = effect.value
-        self.__mark_changed()
-
-    @property
-    def glorious_direction(self) -> EffectDirection:
-        """
-        Glorious effect direction of the colour change.
-        """
-        return EffectDirection(self.__raw[0x37])
-
-    @glorious_direction.setter
-    def glorious_direction(self, direction: EffectDirection):
-        """
-        Glorious effect direction of the colour change.
-        """
-        self.__raw[0x37] = direction.value
-        self.__mark_changed()
-
-    @property
-    def glorious_speed(self) -> int:
-        """
-        Value between 1 and 4.
-        """
-        return self.__raw[0x36] & 0x0F
-
-    @glorious_speed.setter
-    def glorious_speed(self, speed_1_4: int):
-        """
-        Glorious effect direction of the colour change.
-        """
-        self.__raw[0x36] = _compact_brightness_speed(4, speed_1_4)
-        self.__mark_changed()
-
-    @property
-    def single_rgb(self) -> int:
-        # RBG to RGB
-        return _rbg_to_rgb(self.__raw[0x39:0x3C])
-
-    @single_rgb.setter
-    def single_rgb(self, rgb: int):
-        # RGB to RBG
-        self.__raw[0x39:0x3C] = _rgb_to_rbg(rgb)
-        self.__mark_changed()
-
-    @property
-    def single_rgb_brightness(self) -> int:
-        return self.__raw[0x38] >> 4
-
-    @single_rgb_brightness.setter
-    def single_rgb_brightness(self, brightness_1_4: int):
-        """
-        Value between 1 and 4.
-        """
-        self.__raw[0x38] = _compact_brightness_speed(brightness_1_4, 0)
-        self.__mark_changed()
-
-    @property
-    def breath_speed(self) -> int:
-        return self.__raw[0x3C] & 0x0F
-
-    @breath_speed.setter
-    def breath_speed(self, speed_1_4: int):
-        """
-        Value between 1 and 4.
-        """
-        self.__raw[0x3C] = _compact_brightness_speed(4, speed_1_4)
-        self.__mark_changed()
-
-    @property
-    def breath_rgbs(self) -> list[int]:
-        """
-        Upto seven RGB values for breathing effect
-        """
-        count = self.__raw[0x3D]
-        values = []
-        base_addr = 0x3E
-        for _ in range(count):
-            values.append(_rbg_to_rgb(self.__raw[base_addr:base_addr + 3]))
-            base_addr += 3
-        return values
-
-    @breath_rgbs.setter
-    def breath_rgbs(self, rgbs: list[int] | tuple[int, ...]) -> None:
-        """
-        Maximum of seven values.
-        """
-        if 0 < len(rgbs) <= 7:
-            self.__raw[0x3D] = len(rgbs)
-            base_addr = 0x3E
-            for value in rgbs:
-                self.__raw[base_addr:(base_addr + 3)] = _rgb_to_rbg(value)
-                base_addr += 3
-            self.__mark_changed()
-
-    @property
-    def tail_brightness(self) -> int:
-        return self.__raw[0x53] >> 4
-
-    @tail_brightness.setter
-    def tail_brightness(self, brightness_1_4: int):
-        """
-        Value between 1 and 4.
-        """
-        self.__raw[0x53] = _compact_brightness_speed(brightness_1_4, self.tail_speed)
-        self.__mark_changed()
-
-    @property
-    def tail_speed(self) -> int:
-        return self.__raw[0x53] & 0x0F
-
-    @tail_speed.setter
-    def tail_speed(self, speed_1_4: int):
-        """
-        Value between 1 and 4.
-        """
-        self.__raw[0x53] = _compact_brightness_speed(self.tail_brightness, speed_1_4)
-        self.__mark_changed()
-
-    @property
-    def seamless_speed(self) -> int:
-        return self.__raw[0x54] & 0x0F
-
-    @seamless_speed.setter
-    def seamless_speed(self, speed_1_4: int):
-        """
-        Value between 1 and 4.
-        """
-        self.__raw[0x54] = _compact_brightness_speed(4, speed_1_4)
-        self.__mark_changed()
-
-    @property
-    def constant_rgbs(self) -> list[int]:
-        # RBG to RGB
-        values = []
-        base_addr = 0x56
-        for _ in range(6):
-            values.append(_rbg_to_rgb(self.__raw[base_addr:base_addr + 3]))
-            base_addr += 3
-        return values
-
-    @constant_rgbs.setter
-    def constant_rgbs(self, six_rgbs: list[int] | tuple[int, int, int, int, int, int]) -> None:
-        """
-        The brightness and speed don't have any effects.
-        """
-        if len(six_rgbs) == 6:
-            self.__raw[0x55] = 0  # Original value from the mouse
-            base_addr = 0x56
-            for value in six_rgbs:
-                self.__raw[base_addr:(base_addr + 3)] = _rgb_to_rbg(value)
-                base_addr += 3
-            self.__mark_changed()
-
-    @property
-    def rave_brightness(self) -> int:
-        return self.__raw[0x74] >> 4
-
-    @rave_brightness.setter
-    def rave_brightness(self, brightness_1_4: int):
-        """
-        Value between 1 and 4.
-        """
-        self.__raw[0x74] = _compact_brightness_speed(brightness_1_4, self.rave_speed)
-        self.__mark_changed()
+class FieldPacking(IntEnum):
+    BYTE = 0        # Whole byte, optionally an IntEnum
+    BRIGHTNESS = 1  # Upper nibble of a BS byte
+    SPEED = 2       # Lower nibble of a BS byte
+    RBG = 3         # One RBG triplet
+    RBGS = 4        # Consecutive RBG triplets
+
+
+CONFIG_SIZE = 520
+MARKER_OFFSET = 0x03
+WRITE_MARKER = 0x7B  # 123 for the write "command". 0 when reading.
+RGB_MAX = 0xFFFFFF
+
+
+class _Field:
+    """
+    One entry of the record layout, exposed as a GloriousModelORecord
+    property. A BYTE value not one of kind is read as its number.
+
+    Setting a value out of low-high raises ValueError.
+    For the BS nibbles, other is the value written in the other nibble,
+    None to keep the current one (limited to 1-4).
+    For RBGS, count is the number of triplets. With count_offset, the
+    number used is stored there and can be 1 to count, otherwise exactly
+    count values are needed. reset_offset is cleared when written.
+    """
+    __slots__ = ('name', 'offset', 'packing', 'low', 'high', 'other', 'kind', 'count', 'count_offset', 'reset_offset')
+
+    def __init__(self, offset: int, packing: FieldPacking, low: int = 0, high: int = 0xFF, other: int | None = None,
+                 kind=None, count: int = 1, count_offset: int | None = None, reset_offset: int | None = None):
+        self.name = None
+        self.offset = offset
+        self.packing = packing
+        self.low = low
+        self.high = high
+        self.other = other
+        self.kind = kind
+        self.count = count
+        self.count_offset = count_offset
+        self.reset_offset = reset_offset
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, record, owner=None):
+        if record is None:
+            return self
+        return self.decode(record._view)
+
+    def __set__(self, record, value):
+        self.encode(record._view, value)
+        record._view[MARKER_OFFSET] = WRITE_MARKER
 
     @property
-    def rave_speed(self) -> int:
-        return self.__raw[0x74] & 0x0F
+    def end(self) -> int:
+        if self.packing == FieldPacking.RBG:
+            return self.offset + 3
+        if self.packing == FieldPacking.RBGS:
+            return self.offset + 3 * self.count
+        return self.offset + 1
+
+    def decode(self, view: memoryview):
+        offset = self.offset
+        match self.packing:
+            case FieldPacking.BYTE:
+                if self.kind is None:
+                    return view[offset]
+                try:
+                    return self.kind(view[offset])
+                except ValueError:
+                    return view[offset]  # Not one of kind, kept as a number
+            case FieldPacking.BRIGHTNESS:
+                return view[offset] >> 4
+            case FieldPacking.SPEED:
+                return view[offset] & 0x0F
+            case FieldPacking.RBG:
+                return _rbg_to_rgb(view[offset:offset + 3])
+            case FieldPacking.RBGS:
+                count = self.count if self.count_offset is None else min(view[self.count_offset], self.count)
+                return rbg_to_rgbs(view, offset, count)
+
+    def encode(self, view: memoryview, value) -> None:
+        """
+        Writes the value, raises ValueError when it is not valid for the
+        field: out of low-high, of 0xRRGGBB, or not count values.
+        """
+        offset = self.offset
+        match self.packing:
+            case FieldPacking.BYTE:
+                number = int(value) if self.kind is None else self.kind(value).value
+                self.__check(number, self.low, self.high)
+                view[offset] = number
+            case FieldPacking.BRIGHTNESS:
+                self.__check(value, self.low, self.high)
+                speed = self.other if self.other is not None else view[offset] & 0x0F
+                view[offset] = _compact_brightness_speed(value, speed, max_brightness=self.high)
+            case FieldPacking.SPEED:
+                self.__check(value, self.low, self.high)
+                brightness = self.other if self.other is not None else view[offset] >> 4
+                view[offset] = _compact_brightness_speed(brightness, value, max_speed=self.high)
+            case FieldPacking.RBG:
+                self.__check(value, 0, RGB_MAX)
+                view[offset:offset + 3] = bytes(_rgb_to_rbg(value))
+            case FieldPacking.RBGS:
+                if self.count_offset is None:
+                    if len(value) != self.count:
+                        raise ValueError(f'{self.name}: {self.count} values needed')
+                elif not 0 < len(value) <= self.count:
+                    raise ValueError(f'{self.name}: 1 to {self.count} values needed')
+                for rgb in value:
+                    self.__check(rgb, 0, RGB_MAX)
+                if self.count_offset is not None:
+                    view[self.count_offset] = len(value)
+                if self.reset_offset is not None:
+                    view[self.reset_offset] = 0  # Original value from the mouse
+                rgbs_to_rbg(value, view, offset)
+
+    def __check(self, value: int, low: int, high: int) -> None:
+        if not low <= value <= high:
+            raise ValueError(f'{self.name}: {value} not in {low}-{high}')
 
-    @rave_speed.setter
-    def rave_speed(self, speed_1_3: int):
-        """
-        Value between 1 and 3.
-        """
-        self.__raw[0x74] = _compact_brightness_speed(self.rave_brightness, speed_1_3, max_speed=3)
-        self.__mark_changed()
-
-    @property
-    def rave_rgbs(self) -> list[int]:
-        """
-        Two RGB values
-        """
-        return [
-            _rbg_to_rgb(self.__raw[0x75:0x78]),
-            _rbg_to_rgb(self.__raw[0x78:0x7B])
-        ]
 
-    @rave_rgbs.setter
-    def rave_rgbs(self, rgbs: list[int] | tuple[int, int]) -> None:
-        """
-        Maximum of seven values.
-        """
-        if len(rgbs) == 2:
-            base_addr = 0x75
-            for value in rgbs:
-                self.__raw[base_addr:(base_addr + 3)] = _rgb_to_rbg(value)
-                base_addr += 3
-            self.__mark_changed()
+class GloriousModelORecord:
+    """
+    The 520 bytes configuration, see glorious_model_o_config.txt.
+
+    The fields are described by the layout table below, all read and
+    written in place in a single buffer.
+    """
+    __slots__ = ('_buffer', '_view')
+
+    effect = _Field(0x35, FieldPacking.BYTE, 0, 10)
+    glorious_speed = _Field(0x36, FieldPacking.SPEED, 1, 4, other=4)
+    glorious_direction = _Field(0x37, FieldPacking.BYTE, 0, 1, kind=EffectDirection)
+    single_rgb_brightness = _Field(0x38, FieldPacking.BRIGHTNESS, 1, 4, other=1)
+    single_rgb = _Field(0x39, FieldPacking.RBG)
+    breath_speed = _Field(0x3C, FieldPacking.SPEED, 1, 4, other=4)
+    breath_rgbs = _Field(0x3E, FieldPacking.RBGS, count=7, count_offset=0x3D)  # Upto seven RGB values
+    tail_brightness = _Field(0x53, FieldPacking.BRIGHTNESS, 1, 4)
+    tail_speed = _Field(0x53, FieldPacking.SPEED, 1, 4)
+    seamless_speed = _Field(0x54, FieldPacking.SPEED, 1, 4, other=4)
+    constant_rgbs = _Field(0x56, FieldPacking.RBGS, count=6, reset_offset=0x55)  # Brightness and speed have no effect
+    rave_brightness = _Field(0x74, FieldPacking.BRIGHTNESS, 1, 4)
+    rave_speed = _Field(0x74, FieldPacking.SPEED, 1, 3)
+    rave_rgbs = _Field(0x75, FieldPacking.RBGS, count=2)
+    random_speed = _Field(0x7B, FieldPacking.SPEED, 1, 3, other=1)
+    wave_brightness = _Field(0x7C, FieldPacking.BRIGHTNESS, 1, 4)
+    wave_speed = _Field(0x7C, FieldPacking.SPEED, 1, 3)
+    single_breath_speed = _Field(0x7D, FieldPacking.SPEED, 1, 4, other=1)
+    single_breath_rgb = _Field(0x7E, FieldPacking.RBG)
 
-    @property
-    def random_speed(self) -> int:
-        return self.__raw[0x7B] & 0x0F
+    def __init__(self, bytes_data: bytes):
+        self._buffer = bytearray(bytes_data)
+        self._view = memoryview(self._buffer)
 
-    @random_speed.setter
-    def random_speed(self, speed_1_3: int):
+    @classmethod
+    def over(cls, buffer: bytearray | memoryview) -> 'GloriousModelORecord':
         """
-        Value between 1 and 3.
+        Record reading and writing directly in buffer, without a copy.
         """
-        self.__raw[0x7B] = _compact_brightness_speed(0, speed_1_3, max_speed=3)
-        self.__mark_changed()
+        record = cls.__new__(cls)
+        record._buffer = buffer
+        record._view = memoryview(buffer)
+        return record
 
-    @property
-    def wave_brightness(self) -> int:
-        return self.__raw[0x7C] >> 4
+    def __str__(self) -> str:
+        f = self.decode()
+        res = 'Glorious Model O configuration:'
+        res += f'\n\tMode({_name(GloriousEffect, f["effect"])})'
+        res += f'\n\tGlorious({_name(EffectDirection, f["glorious_direction"])}, {f["glorious_speed"]})'
+        res += f'\n\tSingle RGB({f["single_rgb"]:06X}, {f["single_rgb_brightness"]})'
+        res += f'\n\tBreathing({[f"{rgb:06X}" for rgb in f["breath_rgbs"]]}, {f["breath_speed"]})'
+        res += f'\n\tTail({f["tail_brightness"]}, {f["tail_speed"]})'
+        res += f'\n\tSeamless Breathing({f["seamless_speed"]})'
+        res += f'\n\tSix RGB({[f"{rgb:06X}" for rgb in f["constant_rgbs"]]})'
+        res += f'\n\tRave({[f"{rgb:06X}" for rgb in f["rave_rgbs"]]}, {f["rave_brightness"]}, {f["rave_speed"]})'
+        res += f'\n\tRandom({f["random_speed"]})'
+        res += f'\n\tWave({f["wave_brightness"]}, {f["wave_speed"]})'
+        res += f'\n\tBreathing mono({f["single_breath_rgb"]:06X}, {f["single_breath_speed"]})'
+        return res
 
-    @wave_brightness.setter
-    def wave_brightness(self, brightness_1_4: int):
-        """
-        Value between 1 and 4.
-        """
-        self.__raw[0x7C] = _compact_brightness_speed(brightness_1_4, self.wave_speed)
-        self.__mark_changed()
+    @classmethod
+    def fields(cls) -> dict[str, _Field]:
+        return _LAYOUT
 
-    @property
-    def wave_speed(self) -> int:
-        return self.__raw[0x7C] & 0x0F
-
-    @wave_speed.setter
-    def wave_speed(self, speed_1_3: int):
+    def decode(self) -> dict:
         """
-        Value between 1 and 3.
+        All the fields, in one pass over the buffer.
         """
-        self.__raw[0x74C] = _compact_brightness_speed(self.wave_brightness, speed_1_3, max_speed=3)
-        self.__mark_changed()
+        view = self._view
+        return {name: field.decode(view) for name, field in _LAYOUT.items()}
 
     @property
-    def single_breath_speed(self) -> int:
-        return self.__raw[0x7D] & 0x0F
-
-    @single_breath_speed.setter
-    def single_breath_speed(self, speed_1_4: int):
-        """
-        Value between 1 and 4.
-        """
-        self.__raw[0x7D] = _compact_brightness_speed(0, speed_1_4)
-        self.__mark_changed()
+    def record(self) -> bytes:
+        return bytes(self._view)
 
     @property
-    def single_breath_rgb(self) -> int:
-        # RBG to RGB
-        return _rbg_to_rgb(self.__raw[0x7E:0x81])
-
-    @single_breath_rgb.setter
-    def single_breath_rgb(self, rgb: int):
-        # RGB to RBG
-        self.__raw[0x7E:0x81] = _rgb_to_rbg(rgb)
-        self.__mark_changed()
-
-    def __mark_changed(self) -> None:
-        self.__raw[0x03] = 0x7B  # 123 for the write "command". 0 when reading.
+    def view(self) -> memoryview:
+        """
+        The record without a copy, changed by the setters.
+        """
+        return self._view
+
+
+def _name(kind, value) -> str:
+    try:
+        return kind(value).name
+    except ValueError:
+        return f'0x{value:02X}'
+
+
+_LAYOUT = {name: field for name, field in vars(GloriousModelORecord).items() if isinstance(field, _Field)}
+
+
+# 32 bits unsigned array type, 'I' everywhere that matters.
+_U32 = 'I' if array('I').itemsize == 4 else 'L'
+
+
+def rgbs_to_rbg(rgbs, target: bytearray | memoryview | None = None, offset: int = 0) -> bytearray | memoryview:
+    """
+    Packs 0xRRGGBB values as the mouse RBG triplets, all at once.
+    Written in target at offset when given, returns target, otherwise
+    returns a new bytearray.
+    """
+    values = array(_U32, rgbs)
+    if sys.byteorder == 'little':
+        values.byteswap()
+    # Each value is now 00 RR GG BB
+    raw = memoryview(values).cast('B')
+    size = 3 * len(values)
+    if target is None:
+        target = bytearray(size)
+    view = memoryview(target)[offset:offset + size]
+    if len(view) != size:
+        raise ValueError('Target too small')
+    view[0::3] = raw[1::4]
+    view[1::3] = raw[3::4]
+    view[2::3] = raw[2::4]
+    return target
+
+
+def rbg_to_rgbs(data: bytes | bytearray | memoryview, offset: int = 0, count: int | None = None) -> list[int]:
+    """
+    Unpacks count RBG triplets from data at offset, all of them when
+    count is None, as 0xRRGGBB values.
+    """
+    source = memoryview(data)[offset:]
+    if count is None:
+        count = len(source) // 3
+    source = source[:3 * count]
+    if len(source) != 3 * count:
+        raise ValueError('Data too small')
+    raw = bytearray(4 * count)
+    raw[1::4] = source[0::3]
+    raw[2::4] = source[2::3]
+    raw[3::4] = source[1::3]
+    values = array(_U32, raw)
+    if sys.byteorder == 'little':
+        values.byteswap()
+    return values.tolist()
 
 
 def _rgb_to_rbg(rgb: int) -> list[int]:
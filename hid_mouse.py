@@ -7,160 +7,373 @@ commands... yet.
 Many thanks to Samuel Čavoj for doing the reverse engineering job
 and sharing it at https://rustrepo.com/repo/sammko-gloryctl-rust-utilities
 
-This code used the hid package, using the hidapi library.
+This code used the hid package, using the hidapi library, only imported
+when the device is opened.
 It also needs to run as root, until I found a better solution.
 
 On macOS, hidapi is available through brew.
 """
 import argparse
+import sys
 import time
 
-import hid
+import hid_discovery
+import hid_settle
+import hid_shadow
+import hid_snapshot
+import hid_timing
 
-from hid_glorious import (EffectDirection,
-                          GloriousEffect,
-                          GloriousModelORecord,
-                          model_O_ids)
-
-device_path = None
+# Longest wait for a configuration write to be applied, in seconds
+WRITE_SETTLE = 0.1
 
 
 def auto_int(value):
     return int(value, 0)
 
 
-parser = argparse.ArgumentParser()
-subparser = parser.add_subparsers(dest='cmd')
-subparser.add_parser('off', help='Disable led')
-sub = subparser.add_parser('glorious', help='Glorious effect')
-sub.add_argument('direction', metavar='direction', nargs='?', choices=[0, 1], type=int, help='Finger to palm (0) or palm to finger (1)')
-sub.add_argument('speed', metavar='speed', nargs='?', choices=range(1, 5), type=int, help='Animation speed (1-4)')
-sub = subparser.add_parser('single', help='Single fix colour')
-sub.add_argument('rgb', metavar='RGB', nargs='?', type=auto_int, help='RGB value in hex')
-sub.add_argument('brightness', metavar='brightness', nargs='?', choices=range(1, 5), type=int, help='Led brightness (1-4)')
-sub = subparser.add_parser('breath', help='Breathing with custom colours')
-sub.add_argument('speed', metavar='speed', nargs='?', choices=range(1, 5), type=int, help='Animation speed (1-4)')
-sub.add_argument('rgb', metavar='RGB', nargs='*', type=auto_int, help='Upto seven RGB values')
-sub = subparser.add_parser('tail', help='Random finger to palm')
-sub.add_argument('brightness', metavar='brightness', nargs='?', choices=range(1, 5), type=int, help='Led brightness (1-4)')
-sub.add_argument('speed', metavar='speed', nargs='?', choices=range(1, 5), type=int, help='Animation speed (1-4)')
-sub = subparser.add_parser('seamless', help='Seamless breathing')
-sub.add_argument('speed', metavar='speed', nargs='?', choices=range(1, 5), type=int, help='Animation speed (1-4)')
-sub = subparser.add_parser('six', help='Six fixed colours')
-sub.add_argument('rgb', metavar='RGB', nargs='*', type=auto_int, help='Six RGB values')
-sub = subparser.add_parser('rave', help='Two colours rave')
-sub.add_argument('brightness', metavar='brightness', nargs='?', choices=range(1, 5), type=int, help='Led brightness (1-4)')
-sub.add_argument('speed', metavar='speed', nargs='?', choices=range(1, 5), type=int, help='Animation speed (1-4)')
-sub.add_argument('rgb', metavar='RGB', nargs='*', type=auto_int, help='Two RGB values to switch from')
-sub = subparser.add_parser('random', help='Random changing colours on each led')
-sub.add_argument('speed', metavar='speed', nargs='?', choices=range(1, 5), type=int, help='Animation speed (1-4)')
-sub = subparser.add_parser('wave', help='Colour wave from palm to finger')
-sub.add_argument('brightness', metavar='brightness', nargs='?', choices=range(1, 5), type=int, help='Led brightness (1-4)')
-sub = subparser.add_parser('breath_mono', help='Single colour breathing')
-sub.add_argument('speed', metavar='speed', nargs='?', choices=range(1, 5), type=int, help='Animation speed (1-4)')
-sub.add_argument('rgb', metavar='RGB', nargs='?', type=auto_int, help='RGB values')
-parser.add_argument('--config', help='Prints the current configuration', action='store_true')
-parser.add_argument('--raw_config', help='Prints the current raw configuration', action='store_true')
-args = parser.parse_args()
-
-devices = hid.enumerate(model_O_ids.vid, model_O_ids.pid)
-if not len(devices):
-    print('Device not present')
-    exit(0)
-for device in devices:
-    if (
-        device['vendor_id'] == model_O_ids.vid
-        and device['product_id'] == model_O_ids.pid
-        and device['usage'] == model_O_ids.usage_id
-        and device['usage_page'] == model_O_ids.usage_page
-    ):
-        device_path = device['path']
-        break
-
-if device_path is None:
-    print('Device not present')
-    exit(0)
-
-try:
-    with hid.Device(path=device_path) as h:
-        version_req = b'\x05\x11\x00\x00\x00\x00'
-        res = h.send_feature_report(version_req)
-        config = h.get_feature_report(0x04, 520)
-        mor = GloriousModelORecord(config)
-        update = True
-        match args.cmd:
-            case 'off':
-                mor.effect = GloriousEffect.OFF
-            case 'glorious':
-                if args.direction is not None:
-                    mor.glorious_direction = EffectDirection(args.direction)
-                if args.speed is not None:
-                    mor.glorious_speed = args.speed
-                mor.effect = GloriousEffect.GLORIOUS
-            case 'single':
-                if args.rgb is not None:
-                    mor.single_rgb = args.rgb
-                if args.brightness is not None:
-                    mor.single_rgb_brightness = args.brightness
-                mor.effect = GloriousEffect.SINGLE_COLOUR
-            case 'breath':
-                if args.speed is not None:
-                    mor.breath_speed = args.speed
-                if args.rgb:
-                    mor.breath_rgbs = args.rgb[:7]
-                mor.effect = GloriousEffect.BREATHING
-            case 'tail':
-                if args.brightness is not None:
-                    mor.tail_brightness = args.brightness
-                if args.speed is not None:
-                    mor.tail_speed = args.speed
-                mor.effect = GloriousEffect.TAIL
-            case 'seamless':
-                if args.speed is not None:
-                    mor.seamless_speed = args.speed
-                mor.effect = GloriousEffect.SEAMLESS_BREATHING
-            case 'six':
-                if args.rgb and len(args.rgb) == 6:
-                    mor.constant_rgbs = args.rgb
-                mor.effect = GloriousEffect.CONSTANT_RGB
-            case 'rave':
-                if args.brightness is not None:
-                    mor.rave_brightness = args.brightness
-                if args.speed is not None:
-                    mor.rave_speed = args.speed
-                if args.rgb and len(args.rgb) == 2:
-                    mor.rave_rgbs = args.rgb
-                mor.effect = GloriousEffect.RAVE
-            case 'random':
-                if args.speed is not None:
-                    mor.random_speed = args.speed
-                mor.effect = GloriousEffect.RANDOM
-            case 'wave':
-                if args.brightness is not None:
-                    mor.wave_brightness = args.brightness
-                if args.speed is not None:
-                    mor.wave_speed = args.speed
-                mor.effect = GloriousEffect.WAVE
-            case 'breath_mono':
-                if args.speed is not None:
-                    mor.single_breath_speed = args.speed
-                if args.rgb:
-                    mor.single_breath_rgb = args.rgb
-                mor.effect = GloriousEffect.SINGLE_BREATHING
-            case _:
-                update = False
-        if update:
-            res = h.send_feature_report(mor.record)
-            time.sleep(0.1)
-        if args.config:
-            config = h.get_feature_report(0x04, 520)
-            mor = GloriousModelORecord(config)
-            print(mor)
-        if args.raw_config:
-            config = h.get_feature_report(0x04, 520)
-            base = 0
-            while base < len(config):
-                print(config[base:base + 16].hex(' '))
-                base += 16
-except hid.HIDException as err:
-    print(f'Error: {err}')
+def rgb_value(text: str) -> int:
+    """
+    argparse type of the 0xRRGGBB values.
+    """
+    value = auto_int(text)
+    if not 0 <= value <= 0xFFFFFF:
+        raise argparse.ArgumentTypeError(f'not a 0xRRGGBB value: {text!r}')
+    return value
+
+
+_BRIGHTNESS = dict(metavar='brightness', nargs='?', choices=range(1, 5), type=int, help='Led brightness (1-4)')
+_SPEED = dict(metavar='speed', nargs='?', choices=range(1, 5), type=int, help='Animation speed (1-4)')
+
+# Sub commands: name -> (help, [(argument, add_argument keywords), ...])
+# Only the parser of the selected one is built.
+_COMMANDS = {
+    'off': ('Disable led', []),
+    'glorious': ('Glorious effect', [
+        ('direction', dict(metavar='direction', nargs='?', choices=[0, 1], type=int, help='Finger to palm (0) or palm to finger (1)')),
+        ('speed', _SPEED),
+    ]),
+    'single': ('Single fix colour', [
+        ('rgb', dict(metavar='RGB', nargs='?', type=rgb_value, help='RGB value in hex')),
+        ('brightness', _BRIGHTNESS),
+    ]),
+    'breath': ('Breathing with custom colours', [
+        ('speed', _SPEED),
+        ('rgb', dict(metavar='RGB', nargs='*', type=rgb_value, help='Upto seven RGB values')),
+    ]),
+    'tail': ('Random finger to palm', [
+        ('brightness', _BRIGHTNESS),
+        ('speed', _SPEED),
+    ]),
+    'seamless': ('Seamless breathing', [
+        ('speed', _SPEED),
+    ]),
+    'six': ('Six fixed colours', [
+        ('rgb', dict(metavar='RGB', nargs='*', type=rgb_value, help='Six RGB values')),
+    ]),
+    'rave': ('Two colours rave', [
+        ('brightness', _BRIGHTNESS),
+        ('speed', _SPEED),
+        ('rgb', dict(metavar='RGB', nargs='*', type=rgb_value, help='Two RGB values to switch from')),
+    ]),
+    'random': ('Random changing colours on each led', [
+        ('speed', _SPEED),
+    ]),
+    'wave': ('Colour wave from palm to finger', [
+        ('brightness', _BRIGHTNESS),
+        ('speed', dict(metavar='speed', nargs='?', choices=range(1, 4), type=int, help='Animation speed (1-3)')),
+    ]),
+    'breath_mono': ('Single colour breathing', [
+        ('speed', _SPEED),
+        ('rgb', dict(metavar='RGB', nargs='?', type=rgb_value, help='RGB values')),
+    ]),
+}
+
+# GloriousEffect name -> (sub command, record fields of its arguments)
+_EFFECT_COMMANDS = {
+    'OFF': ('off', ()),
+    'GLORIOUS': ('glorious', ('glorious_direction', 'glorious_speed')),
+    'SINGLE_COLOUR': ('single', ('single_rgb', 'single_rgb_brightness')),
+    'BREATHING': ('breath', ('breath_speed', 'breath_rgbs')),
+    'TAIL': ('tail', ('tail_brightness', 'tail_speed')),
+    'SEAMLESS_BREATHING': ('seamless', ('seamless_speed',)),
+    'CONSTANT_RGB': ('six', ('constant_rgbs',)),
+    'RAVE': ('rave', ('rave_brightness', 'rave_speed', 'rave_rgbs')),
+    'RANDOM': ('random', ('random_speed',)),
+    'WAVE': ('wave', ('wave_brightness', 'wave_speed')),
+    'SINGLE_BREATHING': ('breath_mono', ('single_breath_speed', 'single_breath_rgb')),
+}
+
+
+def create_parser(commands=None) -> argparse.ArgumentParser:
+    """
+    Parser with the given sub commands only, all of them when None.
+    """
+    parser = argparse.ArgumentParser()
+    subparser = parser.add_subparsers(dest='cmd')
+    for name, (help_text, arguments) in _COMMANDS.items():
+        if commands is None or name in commands:
+            sub = subparser.add_parser(name, help=help_text)
+            for argument, kwargs in arguments:
+                sub.add_argument(argument, **kwargs)
+    parser.add_argument('--config', help='Prints the current configuration', action='store_true')
+    parser.add_argument('--raw_config', help='Prints the current raw configuration', action='store_true')
+    parser.add_argument('--refresh', help='Read the configuration from the mouse, not its shadow copy',
+                        action='store_true')
+    hid_timing.add_arguments(parser)
+    return parser
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    """
+    Builds only the selected sub command parser. The full parser is only
+    needed for the help and to report an unknown command.
+    """
+    argv = sys.argv[1:] if argv is None else argv
+    cmd = next((arg for arg in argv if not arg.startswith('-')), None)
+    if cmd in _COMMANDS:
+        commands = [cmd]
+    elif cmd is None and '-h' not in argv and '--help' not in argv:
+        commands = []
+    else:
+        commands = None
+    return create_parser(commands).parse_args(argv)
+
+
+def open_device():
+    """
+    Opens the Model O configuration interface, None if not present.
+    """
+    from hid_glorious import model_O_ids
+    return hid_discovery.open_device('mouse', {'model_O': model_O_ids})
+
+
+def apply_command(mor, args: argparse.Namespace) -> bool:
+    """
+    Updates the GloriousModelORecord from the sub command, False when
+    nothing changed.
+    """
+    from hid_glorious import EffectDirection, GloriousEffect
+    match args.cmd:
+        case 'off':
+            mor.effect = GloriousEffect.OFF
+        case 'glorious':
+            if args.direction is not None:
+                mor.glorious_direction = EffectDirection(args.direction)
+            if args.speed is not None:
+                mor.glorious_speed = args.speed
+            mor.effect = GloriousEffect.GLORIOUS
+        case 'single':
+            if args.rgb is not None:
+                mor.single_rgb = args.rgb
+            if args.brightness is not None:
+                mor.single_rgb_brightness = args.brightness
+            mor.effect = GloriousEffect.SINGLE_COLOUR
+        case 'breath':
+            if args.speed is not None:
+                mor.breath_speed = args.speed
+            if args.rgb:
+                mor.breath_rgbs = args.rgb[:7]
+            mor.effect = GloriousEffect.BREATHING
+        case 'tail':
+            if args.brightness is not None:
+                mor.tail_brightness = args.brightness
+            if args.speed is not None:
+                mor.tail_speed = args.speed
+            mor.effect = GloriousEffect.TAIL
+        case 'seamless':
+            if args.speed is not None:
+                mor.seamless_speed = args.speed
+            mor.effect = GloriousEffect.SEAMLESS_BREATHING
+        case 'six':
+            if args.rgb and len(args.rgb) == 6:
+                mor.constant_rgbs = args.rgb
+            mor.effect = GloriousEffect.CONSTANT_RGB
+        case 'rave':
+            if args.brightness is not None:
+                mor.rave_brightness = args.brightness
+            if args.speed is not None:
+                mor.rave_speed = args.speed
+            if args.rgb and len(args.rgb) == 2:
+                mor.rave_rgbs = args.rgb
+            mor.effect = GloriousEffect.RAVE
+        case 'random':
+            if args.speed is not None:
+                mor.random_speed = args.speed
+            mor.effect = GloriousEffect.RANDOM
+        case 'wave':
+            if args.brightness is not None:
+                mor.wave_brightness = args.brightness
+            if args.speed is not None:
+                mor.wave_speed = args.speed
+            mor.effect = GloriousEffect.WAVE
+        case 'breath_mono':
+            if args.speed is not None:
+                mor.single_breath_speed = args.speed
+            if args.rgb:
+                mor.single_breath_rgb = args.rgb
+            mor.effect = GloriousEffect.SINGLE_BREATHING
+        case _:
+            return False
+    return True
+
+
+def effect_argv(mor) -> list[str] | None:
+    """
+    Sub command line showing the effect of the GloriousModelORecord
+    again, None when it has values the sub command doesn't take.
+    """
+    from hid_glorious import GloriousEffect
+    try:
+        cmd, fields = _EFFECT_COMMANDS[GloriousEffect(mor.effect).name]
+    except ValueError:
+        return None  # Unknown effect
+    argv = [cmd]
+    for field, (argument, kwargs) in zip(fields, _COMMANDS[cmd][1]):
+        value = getattr(mor, field)
+        if isinstance(value, list):
+            argv += [f'0x{rgb:06X}' for rgb in value]
+        elif 'choices' in kwargs:
+            if int(value) not in kwargs['choices']:
+                return None
+            argv.append(str(int(value)))
+        else:
+            argv.append(f'0x{value:06X}')
+    return argv
+
+
+def read_config(h) -> bytes:
+    version_req = b'\x05\x11\x00\x00\x00\x00'
+    res = h.send_feature_report(version_req)
+    config = h.get_feature_report(0x04, 520)
+    hid_snapshot.publish_mouse(config)
+    return config
+
+
+def load_config(h, key: str | None, refresh: bool = False) -> bytes:
+    """
+    The shadow configuration for key, read from the device when missing,
+    stale or with refresh.
+    """
+    config = None if refresh else hid_shadow.load(key)
+    if config is None:
+        config = read_config(h)
+        hid_shadow.store(key, config)
+    return config
+
+
+def write_config(h, key: str | None, record: bytes, config: bytes) -> bytes:
+    """
+    Sends the record when different from config, the current one.
+    Returns the new current configuration.
+    """
+    if hid_shadow.same_config(record, config):
+        return config
+    send_config(h, key, record)
+    config = hid_shadow.normalized(record)
+    hid_shadow.store(key, config)
+    return config
+
+
+def send_config(h, key: str | None, record, settle: bool = True) -> None:
+    """
+    Sends the record and waits until applied, unless settle is False.
+    """
+    res = h.send_feature_report(record)
+    if settle:
+        with hid_timing.timed('model_O', 'settle'):
+            # Read back until applied, no more than the previous fixed 100 ms
+            start = time.perf_counter()
+            if hid_settle.poll(lambda: hid_shadow.same_config(read_config(h), record), f'model_O/{key}',
+                               WRITE_SETTLE) is None:
+                time.sleep(max(WRITE_SETTLE - (time.perf_counter() - start), 0))
+    hid_snapshot.publish_mouse(hid_shadow.normalized(record))
+
+
+def shadow_key() -> str | None:
+    """
+    Key of the mouse shadow configuration, from the discovery cache.
+    """
+    entry = hid_discovery.cached_entry('mouse')
+    if entry is None:
+        return None
+    return entry.get('serial') or entry['path']
+
+
+def _config_lines(config: bytes, args: argparse.Namespace) -> list[str]:
+    from hid_glorious import GloriousModelORecord
+    lines = []
+    if args.config:
+        lines.append(str(GloriousModelORecord(config)))
+    if args.raw_config:
+        base = 0
+        while base < len(config):
+            lines.append(config[base:base + 16].hex(' '))
+            base += 16
+    return lines
+
+
+def run_from_shadow(args: argparse.Namespace, key: str | None) -> list[str] | None:
+    """
+    Lines to print when the shadow configuration is enough to run the
+    command, without the device. None when the device is needed.
+    """
+    from hid_glorious import GloriousModelORecord
+    config = None if args.refresh else hid_shadow.load(key)
+    if config is None:
+        return None
+    mor = GloriousModelORecord(config)
+    if apply_command(mor, args) and not hid_shadow.same_config(mor.record, config):
+        return None
+    return _config_lines(config, args)
+
+
+def run_command(h, args: argparse.Namespace, key: str | None = None) -> list[str]:
+    """
+    Runs the command on an opened device, returns the lines to print.
+    The configuration is only read without a fresh shadow copy for key,
+    and only written when changed.
+    """
+    from hid_session import MouseSession
+    session = MouseSession(h, key)
+    session.load(args.refresh)
+    session.run(args)
+    return _config_lines(session.config, args)
+
+
+def run(args: argparse.Namespace) -> list[str]:
+    """
+    Runs the hid_mouse.py command of args, returns the lines to print.
+    Raises hid_transport.DeviceNotPresent without mouse, or the device
+    errors, see hid_transport.device_errors.
+    """
+    lines = run_from_shadow(args, shadow_key())
+    if lines is not None:
+        return lines
+
+    import hid_transport
+    h = open_device()
+    if h is None:
+        raise hid_transport.DeviceNotPresent()
+    with h:
+        return run_command(h, args, shadow_key())
+
+
+def _run(args: argparse.Namespace) -> list[str]:
+    import hid_transport
+    try:
+        return run(args)
+    except hid_transport.DeviceNotPresent as err:
+        return [str(err)]
+    except hid_transport.device_errors() as err:
+        return [f'Error: {err}']
+
+
+def main(argv: list[str] | None = None) -> None:
+    args = parse_args(argv)
+    for line in _run(args):
+        print(line)
+    hid_timing.report(args)
+
+
+if __name__ == '__main__':
+    main()
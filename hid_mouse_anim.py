@@ -0,0 +1,247 @@
+"""
+Host driven animations on the Glorious Model O.
+
+The mouse only has its built-in effects, but CONSTANT_RGB shows the six
+constant_rgbs colours as given. The animations here render these six
+colours from the time, and each frame is sent as a configuration where
+only them changed, through a MouseSession: the report buffer is reused
+and an unchanged frame isn't sent.
+
+The frames are paced by a scheduler learning the time the mouse takes to
+apply one. The interval between writes is the largest of the one asked
+and the one the mouse sustains. The frames whose time passed during a
+write are dropped, never queued: the next frame rendered is the one of
+the current time.
+
+    hid_mouse_anim.py pulse RGB [--period SECONDS] [--leds N ...]
+    hid_mouse_anim.py progress [RGB]    percentages read from stdin
+
+The effective frame rate and the frame latencies are printed at the end,
+--restore sets the effect and colours from before back.
+"""
+import argparse
+import math
+import sys
+import threading
+import time
+
+import hid_mouse
+import hid_settle
+import hid_shadow
+import hid_timing
+from hid_board import positive_float
+from hid_mouse import auto_int
+
+LEDS = 6
+# Interval kept above the learned frame latency, the mouse also has
+# its input reports to send
+HEADROOM = 1.25
+
+
+def scale_rgb(rgb: int, level: float) -> int:
+    """
+    rgb with each component multiplied by level, 0.0 to 1.0.
+    """
+    factor = round(max(min(level, 1.0), 0.0) * 256)
+    return (((rgb >> 16 & 0xFF) * factor >> 8) << 16 | ((rgb >> 8 & 0xFF) * factor >> 8) << 8
+            | (rgb & 0xFF) * factor >> 8)
+
+
+class Pulse:
+    """
+    The leds pulsing in rgb, a full period every period seconds, the
+    others off.
+    """
+    def __init__(self, rgb: int, period: float = 1.0, leds=range(LEDS)):
+        self.rgb = rgb
+        self.period = period
+        self.leds = set(leds)
+        self.done = False
+
+    def __call__(self, elapsed: float) -> list[int]:
+        level = (1 - math.cos(2 * math.pi * elapsed / self.period)) / 2
+        rgb = scale_rgb(self.rgb, level)
+        return [rgb if led in self.leds else 0 for led in range(LEDS)]
+
+
+class Progress:
+    """
+    Meter of the leds lit in rgb, the last one partially. The value is a
+    percentage, set from another thread. With source, the values are
+    read from its lines, done at its end.
+    """
+    def __init__(self, rgb: int, source=None):
+        self.rgb = rgb
+        self.value = 0.0
+        self.done = False
+        if source is not None:
+            threading.Thread(target=self.__read, args=(source,), name='progress', daemon=True).start()
+
+    def __read(self, source) -> None:
+        for line in source:
+            try:
+                self.value = max(min(float(line.strip().rstrip('%')), 100.0), 0.0)
+            except ValueError:
+                pass  # Not a percentage
+        self.done = True
+
+    def __call__(self, elapsed: float) -> list[int]:
+        lit = self.value * LEDS / 100
+        return [scale_rgb(self.rgb, lit - led) for led in range(LEDS)]
+
+
+class FrameStats:
+    def __init__(self):
+        self.written = 0
+        self.unchanged = 0
+        self.dropped = 0
+        self.elapsed = 0.0
+        self.latencies = []
+
+    def lines(self) -> list[str]:
+        lines = [
+            f'{self.written} frames written, {self.unchanged} unchanged, {self.dropped} dropped'
+            f' in {self.elapsed:.2f} s',
+        ]
+        if self.latencies:
+            latencies = sorted(self.latencies)
+            mean = sum(latencies) / len(latencies)
+            lines.append(f'{self.written / self.elapsed:.1f} fps effective, the mouse sustains {1 / mean:.1f} fps')
+            lines.append(
+                f'Frame latency ms: mean {mean * 1000:.2f}, p50 {latencies[len(latencies) // 2] * 1000:.2f},'
+                f' p95 {latencies[min(len(latencies) * 95 // 100, len(latencies) - 1)] * 1000:.2f},'
+                f' max {latencies[-1] * 1000:.2f}')
+        return lines
+
+
+class Animator:
+    """
+    Renders the frames of an animation on a MouseSession, at most fps
+    frames per second.
+    """
+    def __init__(self, session, fps: float = 30.0):
+        self.session = session
+        self.period = 1 / fps
+        # Learned time to apply a frame, seconds
+        self.latency = hid_settle.learned(self.__key())
+
+    def __key(self) -> str:
+        return f'model_O_frame/{self.session.key}'
+
+    @property
+    def interval(self) -> float:
+        """
+        Time between two writes, the one asked or the one the mouse
+        sustains.
+        """
+        if self.latency is None:
+            return self.period
+        return max(self.period, self.latency * HEADROOM)
+
+    def show(self, rgbs: list[int]) -> float | None:
+        """
+        Sends a frame, returns its latency, None when unchanged.
+        """
+        from hid_glorious import GloriousEffect
+        record = self.session.edit()
+        record.effect = GloriousEffect.CONSTANT_RGB
+        record.constant_rgbs = rgbs
+        start = time.perf_counter()
+        if not self.session.commit():
+            return None
+        latency = time.perf_counter() - start
+        hid_timing.observe('model_O', 'frame', latency)
+        self.latency = latency if self.latency is None else self.latency + hid_settle.ALPHA * (latency - self.latency)
+        return latency
+
+    def run(self, render, duration: float | None = None) -> FrameStats:
+        """
+        Shows render(elapsed seconds) frames until duration, the frame
+        after render.done or an interrupt.
+        """
+        stats = FrameStats()
+        start = time.perf_counter()
+        frame = -1
+        next_write = start
+        try:
+            while True:
+                # Read before rendering, the frame of the last value is shown
+                done = render.done
+                now = time.perf_counter()
+                if now < next_write:
+                    time.sleep(next_write - now)
+                    now = time.perf_counter()
+                elapsed = now - start
+                if duration is not None and elapsed >= duration:
+                    break
+                # The frames of the time spent writing are not rendered
+                current = int(elapsed / self.period)
+                stats.dropped += max(current - frame - 1, 0)
+                frame = current
+                latency = self.show(render(elapsed))
+                if latency is None:
+                    stats.unchanged += 1
+                else:
+                    stats.written += 1
+                    stats.latencies.append(latency)
+                if done:
+                    break
+                next_write = max(start + (frame + 1) * self.period, now + self.interval)
+        except KeyboardInterrupt:
+            pass
+        stats.elapsed = time.perf_counter() - start
+        if self.latency is not None:
+            hid_settle.observe(self.__key(), self.latency)
+        return stats
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--fps', help='Frames per second asked', type=positive_float, default=30.0)
+    parser.add_argument('--duration', help='Seconds, until interrupted by default', type=positive_float)
+    parser.add_argument('--restore', help='Sets the previous effect and colours back at the end', action='store_true')
+    subparser = parser.add_subparsers(dest='cmd', required=True)
+    sub = subparser.add_parser('pulse', help='Alert pulse')
+    sub.add_argument('rgb', help='RGB value, like 0xFF0000', type=auto_int)
+    sub.add_argument('--period', help='Seconds per pulse', type=positive_float, default=1.0)
+    sub.add_argument('--leds', help=f'Leds pulsing, 0-{LEDS - 1}', type=int, nargs='+', choices=range(LEDS),
+                     default=list(range(LEDS)))
+    sub = subparser.add_parser('progress', help='Progress meter of the percentages read from stdin')
+    sub.add_argument('rgb', help='RGB value, like 0x00FF00', type=auto_int, nargs='?', default=0x00FF00)
+    hid_timing.add_arguments(parser)
+    args = parser.parse_args(argv)
+
+    if args.cmd == 'pulse':
+        render = Pulse(args.rgb, args.period, args.leds)
+    else:
+        render = Progress(args.rgb, sys.stdin)
+
+    import hid_transport
+    from hid_glorious import MARKER_OFFSET, WRITE_MARKER
+    from hid_session import MouseSession
+    try:
+        h = hid_mouse.open_device()
+        if h is None:
+            print('Device not present')
+            return
+        # The shadow copy is stored once at the end, not for every frame
+        with h, MouseSession(h, hid_mouse.shadow_key(), shadow=False) as session:
+            previous = session.config
+            stats = Animator(session, args.fps).run(render, args.duration)
+            if args.restore:
+                # As is, the effect may be one the setters don't take
+                record = session.edit()
+                record.view[:] = previous
+                record.view[MARKER_OFFSET] = WRITE_MARKER
+                session.commit()
+            hid_shadow.store(session.key, session.config)
+    except hid_transport.device_errors() as err:
+        print(f'Error: {err}')
+        return
+    for line in stats.lines():
+        print(line)
+    hid_timing.report(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+"""
+Pipelined NIC commands on an opened keyboard.
+
+Instead of waiting up to 200 ms for the reply after each write, a
+dedicated thread reads the replies and matches them to the outstanding
+requests by command byte, the firmware echoing the b'NIC' header and
+the command. Up to max_in_flight commands can wait for their reply,
+results are returned as futures.
+
+Only the callers needing the reply, like get_hsv, block on the future.
+The fire-and-forget commands return as soon as the report is written.
+"""
+import collections
+import concurrent.futures
+import threading
+import time
+
+import hid_snapshot
+from hid_board import HNC_GET, HNC_OFF, HNC_ON, HNC_SAVE, HNC_SET, pad_report
+
+
+class NicPipeline:
+    def __init__(self, h, max_in_flight: int = 4, reply_timeout: float = 0.2):
+        if max_in_flight < 1:
+            raise ValueError(f'max_in_flight must be 1 or more, not {max_in_flight}')
+        self.__h = h
+        self.__reply_timeout = reply_timeout
+        self.__slots = threading.BoundedSemaphore(max_in_flight)
+        self.__write_lock = threading.Lock()
+        self.__lock = threading.Lock()
+        # Command byte -> deque of (deadline, future), oldest first
+        self.__pending = collections.defaultdict(collections.deque)
+        self.__running = True
+        self.__error = None
+        self.timeouts = 0
+        self.__reader = threading.Thread(target=self.__read_replies, daemon=True)
+        self.__reader.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self) -> None:
+        """
+        Waits for the outstanding replies, or their timeout, and stops the
+        reader. The device itself is left opened.
+        """
+        self.flush()
+        self.__running = False
+        self.__reader.join()
+
+    def flush(self) -> None:
+        with self.__lock:
+            futures = [future for queue in self.__pending.values() for _, future in queue]
+        concurrent.futures.wait(futures)
+
+    def submit(self, report: bytes) -> concurrent.futures.Future:
+        """
+        Writes a full 64 bytes report, the future gets the reply, or a
+        TimeoutError. Blocks only while max_in_flight commands are waiting.
+        """
+        if self.__error is not None:
+            raise self.__error
+        self.__slots.acquire()
+        future = concurrent.futures.Future()
+        with self.__lock:
+            self.__pending[report[3]].append((time.monotonic() + self.__reply_timeout, future))
+        try:
+            with self.__write_lock:
+                self.__h.write(report)
+        except Exception as err:
+            self.__complete(report[3], future, exception=err)
+            raise
+        # Only the get replies have the HSV values, for the others they
+        # are the ones sent
+        if report[3:4] in (HNC_ON, HNC_OFF):
+            hid_snapshot.publish_keyboard(enabled=report[3:4] == HNC_ON)
+        elif report[3:4] == HNC_SET:
+            hid_snapshot.publish_keyboard(report[4:7])
+        return future
+
+    def on(self) -> concurrent.futures.Future:
+        return self.submit(pad_report(b'NIC' + HNC_ON))
+
+    def off(self) -> concurrent.futures.Future:
+        return self.submit(pad_report(b'NIC' + HNC_OFF))
+
+    def set_hsv(self, hue: int, saturation: int, value: int) -> concurrent.futures.Future:
+        return self.submit(pad_report(b'NIC' + HNC_SET + bytes([hue, saturation, value])))
+
+    def save(self) -> concurrent.futures.Future:
+        return self.submit(pad_report(b'NIC' + HNC_SAVE))
+
+    def get_hsv(self) -> tuple[int, int, int]:
+        """
+        Blocks until the reply, raises TimeoutError without one.
+        """
+        reply = self.submit(pad_report(b'NIC' + HNC_GET)).result()
+        return reply[4], reply[5], reply[6]
+
+    def __complete(self, command: int, future, result=None, exception=None) -> None:
+        with self.__lock:
+            queue = self.__pending[command]
+            for item in queue:
+                if item[1] is future:
+                    queue.remove(item)
+                    break
+            else:
+                return  # Already completed
+        if exception is not None:
+            future.set_exception(exception)
+        else:
+            future.set_result(result)
+        self.__slots.release()
+
+    def __read_replies(self) -> None:
+        while self.__running:
+            try:
+                reply = self.__h.read(64, 20)
+            except Exception as err:
+                self.__error = err
+                self.__fail_all(err)
+                return
+            if len(reply) > 3 and reply[:3] == b'NIC':
+                with self.__lock:
+                    queue = self.__pending.get(reply[3])
+                    future = queue[0][1] if queue else None
+                if future is not None:
+                    self.__complete(reply[3], future, result=reply)
+                    if reply[3:4] == HNC_GET:
+                        hid_snapshot.publish_keyboard(reply[4:7])
+            self.__expire()
+
+    def __expire(self) -> None:
+        now = time.monotonic()
+        with self.__lock:
+            expired = [
+                (command, future)
+                for command, queue in self.__pending.items()
+                for deadline, future in queue
+                if deadline <= now
+            ]
+        for command, future in expired:
+            self.timeouts += 1
+            self.__complete(command, future, exception=TimeoutError('No reply from the keyboard'))
+
+    def __fail_all(self, err: Exception) -> None:
+        with self.__lock:
+            pending = [(command, future) for command, queue in self.__pending.items() for _, future in queue]
+        for command, future in pending:
+            self.__complete(command, future, exception=err)
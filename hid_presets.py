@@ -0,0 +1,254 @@
+"""
+Glorious Model O presets, compiled into ready to send configurations.
+
+The presets are hid_mouse.py command lines, in a JSON file:
+    {"alert": ["single", "0xFF0000", "4"], "calm": ["breath_mono", "1", "0x0000FF"]}
+
+compile applies each of them to the mouse configuration and stores the
+resulting 520 bytes feature reports in a bank file, next to the shadow
+configuration. apply maps the bank and sends the preset as is, a single
+send_feature_report, without reading the mouse first or back after.
+The shadow configuration, however old, is only checked against the
+bank, with --refresh the mouse is read for that.
+
+The bank is compiled again when it doesn't match anymore: other presets
+or another mouse, or a shadow configuration that is neither its base
+nor one of its presets. The mouse was then changed by something else,
+or flashed with a firmware having another header.
+
+Bank format, little endian:
+    Header  : b'QMKPBNK1', count (H), record size (H), digest (32s) of
+              the presets and the device key
+    Base    : the configuration the presets were compiled from
+    Presets : name (32s, NUL padded) and record, count times
+
+    hid_presets.py [--presets FILE] list|compile|apply NAME
+"""
+import argparse
+import hashlib
+import json
+import math
+import mmap
+import os
+import struct
+
+import hid_mouse
+import hid_shadow
+from hid_glorious import CONFIG_SIZE, MARKER_OFFSET, WRITE_MARKER, GloriousModelORecord
+
+PRESETS_PATH = os.path.join(
+    os.environ.get('XDG_CONFIG_HOME', os.path.join(os.path.expanduser('~'), '.config')),
+    'qmk_tools',
+    'presets.json')
+
+MAGIC = b'QMKPBNK1'
+HEADER = struct.Struct('<8sHH32s')
+NAME = struct.Struct('32s')
+
+
+def load_presets(path: str = PRESETS_PATH) -> dict[str, list[str]]:
+    """
+    Raises OSError or ValueError for a missing or invalid file.
+    """
+    with open(path) as f:
+        presets = json.load(f)
+    if not isinstance(presets, dict) or not all(
+        isinstance(argv, list) and all(isinstance(arg, str) for arg in argv) for argv in presets.values()
+    ):
+        raise ValueError(f'{path}: expecting {{"name": ["command", "arg", ...]}}')
+    for name in presets:
+        if not 0 < len(name.encode()) <= NAME.size:
+            raise ValueError(f'{path}: invalid preset name {name!r}')
+    return presets
+
+
+def bank_path(key: str | None) -> str:
+    # Like the shadow configuration, a single bank without key
+    return os.path.join(hid_shadow.SHADOW_DIR, (key or 'default').encode().hex() + '.bank')
+
+
+def presets_digest(presets: dict[str, list[str]], key: str | None) -> bytes:
+    return hashlib.sha256(json.dumps([key, presets], sort_keys=True).encode()).digest()
+
+
+def compile_presets(presets: dict[str, list[str]], base: bytes) -> dict[str, bytes]:
+    """
+    Ready to send record of each preset, applied to base.
+    """
+    records = {}
+    for name, argv in presets.items():
+        try:
+            args = hid_mouse.parse_args(argv)
+        except SystemExit:
+            raise ValueError(f'invalid preset {name}: {" ".join(argv)}') from None
+        if args.cmd is None:
+            raise ValueError(f'invalid preset {name}: no command')
+        mor = GloriousModelORecord(base)
+        hid_mouse.apply_command(mor, args)
+        mor.view[MARKER_OFFSET] = WRITE_MARKER
+        records[name] = mor.record
+    return records
+
+
+def write_bank(path: str, digest: bytes, base: bytes, records: dict[str, bytes]) -> None:
+    data = bytearray(HEADER.pack(MAGIC, len(records), len(base), digest))
+    data += hid_shadow.normalized(base)
+    for name, record in records.items():
+        data += NAME.pack(name.encode()) + record
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + '.tmp', 'wb') as f:
+        f.write(data)
+    os.replace(path + '.tmp', path)
+
+
+class PresetBank:
+    """
+    Bank file mapped in memory, see the module documentation.
+    """
+    def __init__(self, path: str):
+        """
+        Raises OSError or ValueError for a missing or invalid bank.
+        """
+        with open(path, 'rb') as f:
+            self.__map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, count, self.record_size, self.digest = HEADER.unpack_from(self.__map)
+            entry_size = NAME.size + self.record_size
+            if (
+                magic != MAGIC
+                or self.record_size != CONFIG_SIZE
+                or len(self.__map) != HEADER.size + self.record_size + count * entry_size
+            ):
+                raise ValueError(f'{path}: invalid preset bank')
+        except (struct.error, ValueError):
+            self.__map.close()
+            raise ValueError(f'{path}: invalid preset bank') from None
+        self.__view = memoryview(self.__map)
+        # Name -> record offset
+        self.offsets = {}
+        offset = HEADER.size + self.record_size
+        for _ in range(count):
+            name = NAME.unpack_from(self.__map, offset)[0].rstrip(b'\0').decode()
+            self.offsets[name] = offset + NAME.size
+            offset += entry_size
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @property
+    def base(self) -> bytes:
+        return bytes(self.__view[HEADER.size:HEADER.size + self.record_size])
+
+    def record(self, name: str) -> bytes | None:
+        offset = self.offsets.get(name)
+        if offset is None:
+            return None
+        return bytes(self.__view[offset:offset + self.record_size])
+
+    def consistent(self, config: bytes) -> bool:
+        """
+        True when config is the bank base or one of its presets.
+        """
+        return hid_shadow.same_config(config, self.base) or any(
+            hid_shadow.same_config(config, self.record(name)) for name in self.offsets)
+
+    def close(self) -> None:
+        self.__view.release()
+        self.__map.close()
+
+
+def open_bank(key: str | None, digest: bytes) -> PresetBank | None:
+    """
+    The bank of key compiled for digest, None when missing or outdated.
+    """
+    try:
+        bank = PresetBank(bank_path(key))
+    except (OSError, ValueError):
+        return None
+    if bank.digest != digest:
+        bank.close()
+        return None
+    return bank
+
+
+def compile_bank(h, key: str | None, presets: dict[str, list[str]], refresh: bool = False) -> PresetBank:
+    """
+    Compiles the presets from the shadow configuration, or the one read
+    from the mouse, and returns the new bank.
+    """
+    base = hid_mouse.load_config(h, key, refresh)
+    digest = presets_digest(presets, key)
+    write_bank(bank_path(key), digest, base, compile_presets(presets, base))
+    return PresetBank(bank_path(key))
+
+
+def apply_preset(h, key: str | None, presets: dict[str, list[str]], name: str, refresh: bool = False) -> list[str]:
+    """
+    Sends a preset from the bank, compiled again first when needed.
+    Returns the lines to print.
+    """
+    if name not in presets:
+        return [f'Error: unknown preset {name}']
+    # Only checks the bank still matches the mouse, any age will do
+    shadow = hid_mouse.load_config(h, key, True) if refresh else hid_shadow.load(key, max_age=math.inf)
+    bank = open_bank(key, presets_digest(presets, key))
+    if bank is not None and shadow is not None and not bank.consistent(shadow):
+        # Changed by something else since compiled
+        bank.close()
+        bank = None
+    if bank is None:
+        bank = compile_bank(h, key, presets)
+    with bank:
+        record = bank.record(name)
+    if shadow is None or not hid_shadow.same_config(record, shadow):
+        hid_mouse.send_config(h, key, record, settle=False)
+    hid_shadow.store(key, record)
+    return []
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--presets', help='Presets JSON file', default=PRESETS_PATH)
+    subparser = parser.add_subparsers(dest='cmd', required=True)
+    subparser.add_parser('list', help='Prints the presets')
+    sub = subparser.add_parser('compile', help='Compiles the preset bank')
+    sub.add_argument('--refresh', help='Read the configuration from the mouse first', action='store_true')
+    sub = subparser.add_parser('apply', help='Sends a preset')
+    sub.add_argument('name', help='Preset name')
+    sub.add_argument('--refresh', help='Read the configuration from the mouse first', action='store_true')
+    args = parser.parse_args(argv)
+
+    try:
+        presets = load_presets(args.presets)
+    except (OSError, ValueError) as err:
+        print(f'Error: {err}')
+        return
+    if args.cmd == 'list':
+        for name, preset_argv in presets.items():
+            print(f'{name:32} {" ".join(preset_argv)}')
+        return
+
+    import hid_transport
+    try:
+        h = hid_mouse.open_device()
+        if h is None:
+            print('Device not present')
+            return
+        with h:
+            key = hid_mouse.shadow_key()
+            if args.cmd == 'compile':
+                compile_bank(h, key, presets, args.refresh).close()
+                lines = []
+            else:
+                lines = apply_preset(h, key, presets, args.name, args.refresh)
+    except (*hid_transport.device_errors(), OSError, ValueError) as err:
+        lines = [f'Error: {err}']
+    for line in lines:
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
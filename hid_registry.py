@@ -0,0 +1,320 @@
+"""
+Hotplug driven registry of the hidraw devices, Linux only.
+
+The devices are read once from /sys/class/hidraw, then kept up to date
+from the add and remove uevents of the hidraw subsystem, received on a
+NETLINK_KOBJECT_UEVENT socket, both the kernel and the udev ones, taken
+from root only as libudev does. The index has the shape of
+hid_discovery.enumerate_index, hid.enumerate entries by (vid, pid,
+usage_page, usage), without ever enumerating.
+
+Each hidraw node is one interface:
+    device/uevent             HID_ID=0003:0000320F:00005044, HID_UNIQ=serial
+    device/report_descriptor  the usage page and usage of its top level
+                              collections
+The devices are opened through /dev/hidrawN, like hidapi does.
+
+Listeners are called from the watcher thread with ('add' or 'remove',
+entry) for every hidraw entry added or removed, to reopen the devices.
+"""
+import os
+import socket
+import struct
+import threading
+
+import hid_discovery
+
+SYSFS_HIDRAW = '/sys/class/hidraw'
+DEV_DIR = '/dev'
+
+NETLINK_KOBJECT_UEVENT = 15
+# Multicast groups: raw kernel events, and the udev ones sent once the
+# /dev node is there, with its permissions.
+KERNEL_GROUP = 1
+UDEV_GROUP = 2
+
+# libudev header after its prefix: the magic is big endian, the sizes
+# and offsets that follow in the host order.
+_UDEV_PREFIX = b'libudev\0'
+_UDEV_MAGIC = struct.Struct('>I')
+_UDEV_HEADER = struct.Struct('=III')  # header size, properties offset, length
+UDEV_MONITOR_MAGIC = 0xFEEDCAFE
+_UCRED = struct.Struct('=iII')  # pid, uid, gid
+
+
+def parse_report_descriptor(descriptor: bytes) -> list[tuple[int, int]]:
+    """
+    (usage_page, usage) of each top level collection.
+    """
+    usages = []
+    usage_page = 0
+    usage = 0
+    depth = 0
+    i = 0
+    while i < len(descriptor):
+        prefix = descriptor[i]
+        if prefix == 0xFE:
+            # Long item, size in the next byte
+            i += 3 + (descriptor[i + 1] if i + 1 < len(descriptor) else 0)
+            continue
+        size = (0, 1, 2, 4)[prefix & 0x03]
+        value = int.from_bytes(descriptor[i + 1:i + 1 + size], 'little')
+        item = prefix & 0xFC
+        if item == 0x04:  # Usage Page
+            usage_page = value
+        elif item == 0x08:  # Usage, with its page for 4 bytes
+            usage = value & 0xFFFF
+            if size == 4:
+                usage_page = value >> 16
+        elif item == 0xA0:  # Collection
+            if depth == 0:
+                usages.append((usage_page, usage))
+            depth += 1
+            usage = 0
+        elif item == 0xC0:  # End Collection
+            depth = max(depth - 1, 0)
+        elif item in (0x80, 0x90, 0xB0):  # Input, Output, Feature
+            usage = 0
+        i += 1 + size
+    return usages
+
+
+def read_node(node: str, sysfs: str = SYSFS_HIDRAW) -> list[dict]:
+    """
+    hid.enumerate like entries of a hidraw node, one per top level
+    collection. Empty when it is gone or not readable.
+    """
+    device_dir = os.path.join(sysfs, node, 'device')
+    try:
+        with open(os.path.join(device_dir, 'uevent')) as f:
+            properties = dict(line.rstrip('\n').partition('=')[::2] for line in f)
+        with open(os.path.join(device_dir, 'report_descriptor'), 'rb') as f:
+            descriptor = f.read()
+        _, vid, pid = properties['HID_ID'].split(':')
+    except (OSError, KeyError, ValueError):
+        return []
+    return [
+        {
+            'path': os.fsencode(os.path.join(DEV_DIR, node)),
+            'vendor_id': int(vid, 16),
+            'product_id': int(pid, 16),
+            'usage_page': usage_page,
+            'usage': usage,
+            'serial_number': properties.get('HID_UNIQ', ''),
+            'product_string': properties.get('HID_NAME', ''),
+        }
+        for usage_page, usage in parse_report_descriptor(descriptor) or [(0, 0)]
+    ]
+
+
+def read_nodes(sysfs: str = SYSFS_HIDRAW) -> list[dict]:
+    """
+    Entries of all the hidraw nodes, like hid.enumerate.
+    """
+    try:
+        nodes = sorted(os.listdir(sysfs))
+    except OSError:
+        return []
+    return [entry for node in nodes for entry in read_node(node, sysfs)]
+
+
+def parse_uevent(message: bytes) -> dict[str, str]:
+    """
+    Properties of a kernel or udev netlink uevent message.
+    """
+    if message.startswith(_UDEV_PREFIX):
+        if len(message) < len(_UDEV_PREFIX) + _UDEV_MAGIC.size + _UDEV_HEADER.size:
+            return {}
+        magic, = _UDEV_MAGIC.unpack_from(message, len(_UDEV_PREFIX))
+        if magic != UDEV_MONITOR_MAGIC:
+            return {}
+        _, offset, length = _UDEV_HEADER.unpack_from(message, len(_UDEV_PREFIX) + _UDEV_MAGIC.size)
+        message = message[offset:offset + length]
+    else:
+        # b'action@devpath' first
+        message = message.partition(b'\0')[2]
+    properties = {}
+    for item in message.split(b'\0'):
+        key, sep, value = item.partition(b'=')
+        if sep:
+            properties[key.decode(errors='replace')] = value.decode(errors='replace')
+    return properties
+
+
+def trusted_sender(address: tuple[int, int], ancdata: list) -> bool:
+    """
+    Whether a uevent comes from the kernel or udev, like libudev checks:
+    the credentials of root, and for the kernel group the kernel port
+    (pid 0). address is the (pid, groups) of recvmsg.
+    """
+    pid, groups = address
+    if groups == KERNEL_GROUP and pid != 0:
+        return False
+    for level, kind, data in ancdata:
+        if level == socket.SOL_SOCKET and kind == socket.SCM_CREDENTIALS and len(data) >= _UCRED.size:
+            _, uid, _ = _UCRED.unpack_from(data)
+            return uid == 0
+    return False
+
+
+class HidrawRegistry:
+    def __init__(self, sysfs: str = SYSFS_HIDRAW):
+        self.__sysfs = sysfs
+        self.__lock = threading.Lock()
+        # device_key -> entries, node -> its entries
+        self.__index = {}
+        self.__nodes = {}
+        self.__listeners = []
+        self.__socket = None
+        self.__thread = None
+        self.__running = False
+        self.scan()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def scan(self) -> None:
+        """
+        Reads all the nodes again, only needed at startup.
+        """
+        try:
+            nodes = sorted(os.listdir(self.__sysfs))
+        except OSError:
+            nodes = []
+        with self.__lock:
+            self.__index.clear()
+            self.__nodes.clear()
+        for node in nodes:
+            self.add_node(node)
+
+    def add_node(self, node: str) -> list[dict]:
+        entries = read_node(node, self.__sysfs)
+        with self.__lock:
+            self.__remove(node)
+            if entries:
+                self.__nodes[node] = entries
+                for entry in entries:
+                    key = (entry['vendor_id'], entry['product_id'], entry['usage_page'], entry['usage'])
+                    self.__index.setdefault(key, []).append(entry)
+        return entries
+
+    def remove_node(self, node: str) -> list[dict]:
+        with self.__lock:
+            return self.__remove(node)
+
+    def __remove(self, node: str) -> list[dict]:
+        entries = self.__nodes.pop(node, [])
+        for entry in entries:
+            key = (entry['vendor_id'], entry['product_id'], entry['usage_page'], entry['usage'])
+            devices = self.__index.get(key, [])
+            if entry in devices:
+                devices.remove(entry)
+            if not devices:
+                self.__index.pop(key, None)
+        return entries
+
+    def index(self) -> dict[tuple[int, int, int, int], list[dict]]:
+        """
+        Copy of the index, see hid_discovery.enumerate_index.
+        """
+        with self.__lock:
+            return {key: list(devices) for key, devices in self.__index.items()}
+
+    def lookup(self, ids) -> list[dict]:
+        """
+        Entries of a KeyboardIds/MouseIds.
+        """
+        with self.__lock:
+            return list(self.__index.get(hid_discovery.device_key(ids), []))
+
+    def add_listener(self, listener) -> None:
+        """
+        listener(action, entry), action being 'add' or 'remove'.
+        """
+        self.__listeners.append(listener)
+
+    def start(self) -> None:
+        """
+        Starts watching the uevents. The nodes are scanned again once
+        subscribed, the ones plugged in between aren't missed.
+        """
+        self.__socket = socket.socket(socket.AF_NETLINK, socket.SOCK_DGRAM, NETLINK_KOBJECT_UEVENT)
+        self.__socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 20)
+        self.__socket.setsockopt(socket.SOL_SOCKET, socket.SO_PASSCRED, 1)
+        self.__socket.bind((0, KERNEL_GROUP | UDEV_GROUP))
+        self.__socket.settimeout(0.5)
+        self.scan()
+        self.__running = True
+        self.__thread = threading.Thread(target=self.__watch, name='hid_registry', daemon=True)
+        self.__thread.start()
+
+    def stop(self) -> None:
+        self.__running = False
+        if self.__thread is not None:
+            self.__thread.join()
+            self.__thread = None
+        if self.__socket is not None:
+            self.__socket.close()
+            self.__socket = None
+
+    def handle_uevent(self, properties: dict[str, str]) -> None:
+        if properties.get('SUBSYSTEM') != 'hidraw':
+            return
+        node = os.path.basename(properties.get('DEVNAME', properties.get('DEVPATH', '')))
+        action = properties.get('ACTION')
+        if action == 'add':
+            entries = self.add_node(node)
+        elif action == 'remove':
+            entries = self.remove_node(node)
+        else:
+            return
+        for entry in entries:
+            for listener in self.__listeners:
+                try:
+                    listener(action, entry)
+                except Exception as err:
+                    print(f'Error: {err}')
+
+    def __watch(self) -> None:
+        while self.__running:
+            try:
+                message, ancdata, _, address = self.__socket.recvmsg(1 << 16, socket.CMSG_SPACE(_UCRED.size))
+            except socket.timeout:
+                continue
+            except OSError as err:
+                # ENOBUFS, events lost
+                print(f'Error: {err}')
+                self.scan()
+                continue
+            if trusted_sender(address, ancdata):
+                self.handle_uevent(parse_uevent(message))
+
+
+def start_registry() -> HidrawRegistry | None:
+    """
+    Registry watching the hotplug events, used by hid_discovery from
+    then on. None when not available, on other systems or hidapi
+    backends.
+    """
+    if not hasattr(socket, 'AF_NETLINK') or not os.path.isdir(SYSFS_HIDRAW):
+        return None
+    transport = os.environ.get('HID_TRANSPORT', 'auto')
+    if transport == 'fake':
+        return None
+    if transport != 'hidraw':
+        import hid
+        # Only with the hidraw backend of hidapi, the libusb one has other paths
+        prefix = os.fsencode(os.path.join(DEV_DIR, 'hidraw'))
+        if any(not device['path'].startswith(prefix) for device in hid.enumerate()):
+            return None
+    registry = HidrawRegistry()
+    try:
+        registry.start()
+    except OSError as err:
+        print(f'Error: {err}')
+        return None
+    hid_discovery.set_registry(registry)
+    return registry
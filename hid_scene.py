@@ -0,0 +1,169 @@
+"""
+Scenes: the state of the keyboard and the mouse in one definition,
+applied to both at once under a single deadline.
+
+A scene gives the hid_board.py and hid_mouse.py command lines to run,
+in a JSON file:
+    {"alert": {"board": ["--set", "0", "255", "255"], "mouse": ["single", "0xFF0000", "4"]}}
+
+Each device runs in its own thread, the slow mouse read-modify-write
+doesn't delay the keyboard. The report gives, for each device, whether
+it finished before the deadline, or its error, like no device present.
+The late ones are still waited for, a write isn't cut in the middle.
+The exit status is 1 when a device failed or was late.
+
+    hid_scene.py [--scenes FILE] [--deadline SECONDS] NAME
+    hid_scene.py --board="--set 0 255 255" --mouse="single 0xFF0000 4"
+"""
+import argparse
+import concurrent.futures
+import json
+import os
+import shlex
+import time
+
+import hid_board
+import hid_mouse
+
+SCENES_PATH = os.path.join(
+    os.environ.get('XDG_CONFIG_HOME', os.path.join(os.path.expanduser('~'), '.config')),
+    'qmk_tools',
+    'scenes.json')
+
+# Target -> (argv parser, run returning the lines to print)
+TARGETS = {
+    'board': (lambda argv: hid_board.create_parser().parse_args(argv), hid_board.run),
+    'mouse': (hid_mouse.parse_args, hid_mouse.run),
+}
+
+
+class DeviceResult:
+    def __init__(self, target: str):
+        self.target = target
+        self.lines = []
+        self.error = None
+        self.latency = None  # Seconds, None when late
+
+    @property
+    def in_time(self) -> bool:
+        return self.latency is not None
+
+    @property
+    def ok(self) -> bool:
+        """
+        Done before the deadline, without error.
+        """
+        return self.in_time and self.error is None
+
+
+def load_scenes(path: str = SCENES_PATH) -> dict[str, dict[str, list[str]]]:
+    """
+    Raises OSError or ValueError for a missing or invalid file.
+    """
+    with open(path) as f:
+        scenes = json.load(f)
+    if not isinstance(scenes, dict) or not all(
+        isinstance(scene, dict) and all(
+            target in TARGETS and isinstance(argv, list) and all(isinstance(arg, str) for arg in argv)
+            for target, argv in scene.items()
+        )
+        for scene in scenes.values()
+    ):
+        raise ValueError(f'{path}: expecting {{"name": {{"board": [...], "mouse": [...]}}}}')
+    return scenes
+
+
+def parse_scene(scene: dict[str, list[str]]) -> dict[str, argparse.Namespace]:
+    """
+    Parsed command line of each target, raises ValueError for an invalid
+    one, before anything is sent.
+    """
+    parsed = {}
+    for target, argv in scene.items():
+        try:
+            parsed[target] = TARGETS[target][0](argv)
+        except SystemExit:
+            raise ValueError(f'invalid {target} command: {" ".join(argv)}') from None
+        if target == 'board' and (parsed[target].stream is not None or parsed[target].session):
+            raise ValueError('--stream/--session read stdin, use hid_board.py')
+    return parsed
+
+
+def _apply_target(target: str, args: argparse.Namespace) -> list[str]:
+    return TARGETS[target][1](args)
+
+
+def apply_scene(scene: dict[str, list[str]], deadline: float) -> list[DeviceResult]:
+    """
+    Applies all the targets of a scene in parallel. The results of the
+    devices not done after deadline seconds are marked late, they are
+    complete when this returns.
+    """
+    parsed = parse_scene(scene)
+    start = time.perf_counter()
+    results = {target: DeviceResult(target) for target in parsed}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(parsed) or 1) as pool:
+        futures = {pool.submit(_apply_target, target, args): target for target, args in parsed.items()}
+        try:
+            for future in concurrent.futures.as_completed(futures, timeout=deadline):
+                results[futures[future]].latency = time.perf_counter() - start
+        except concurrent.futures.TimeoutError:
+            pass  # The remaining ones are late
+    for future, target in futures.items():
+        try:
+            results[target].lines = future.result()
+        except Exception as err:
+            results[target].error = str(err)
+    return list(results.values())
+
+
+def format_results(results: list[DeviceResult], deadline: float) -> list[str]:
+    lines = []
+    for result in results:
+        if result.error is not None:
+            status = f'Error: {result.error}'
+        elif result.in_time:
+            status = f'{result.latency * 1000:.1f} ms'
+        else:
+            status = f'late, over {deadline * 1000:g} ms'
+        lines.append(f'{result.target}: {status}')
+        lines.extend(f'\t{line}' for line in result.lines)
+    return lines
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('name', help='Scene to apply', nargs='?')
+    parser.add_argument('--scenes', help='Scenes JSON file', default=SCENES_PATH)
+    parser.add_argument('--deadline', help='Seconds for all the devices', type=float, default=1.0)
+    parser.add_argument('--list', help='Prints the scenes', action='store_true')
+    for target in TARGETS:
+        parser.add_argument(f'--{target}', help=f'hid_{target}.py arguments, instead of a scene name',
+                            metavar='ARGS')
+    args = parser.parse_args(argv)
+
+    scene = {target: shlex.split(getattr(args, target)) for target in TARGETS if getattr(args, target)}
+    try:
+        if args.list or args.name:
+            scenes = load_scenes(args.scenes)
+            if args.list:
+                for name, definition in scenes.items():
+                    print(f'{name}: {json.dumps(definition)}')
+                return
+            if args.name not in scenes:
+                raise ValueError(f'unknown scene {args.name}')
+            scene = scenes[args.name]
+        if not scene:
+            parser.error('a scene name, or --board/--mouse, is needed')
+        results = apply_scene(scene, args.deadline)
+    except (OSError, ValueError) as err:
+        print(f'Error: {err}')
+        return
+    for line in format_results(results, args.deadline):
+        print(line)
+    if not all(result.ok for result in results):
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
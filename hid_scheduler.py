@@ -0,0 +1,190 @@
+"""
+Priority notification scheduler with coalescing and rate limiting.
+
+Producers submit LED states for a device and channel, like the keyboard
+colour or the mouse effect, with a priority and an optional time to
+live. For each device and channel only the latest state of each
+priority is kept, and the highest priority one not expired is the state
+to show. When it expires, the next one, the previous state, is shown
+again.
+
+Below all of them, each channel can have a base state, the one without
+any notification, like set by a direct command. It never expires and
+is shown again when the last notification does.
+
+Each device has its own writer thread, applying the state to show when
+it changed, at most once every min_interval after the previous write
+ended. A burst of requests becomes a handful of writes.
+"""
+import threading
+import time
+
+
+class _Request:
+    __slots__ = ('state', 'expires')
+
+    def __init__(self, state: tuple, expires: float | None):
+        self.state = state
+        self.expires = expires
+
+
+class _DeviceQueue:
+    def __init__(self, device: str, apply, min_interval: float):
+        self.device = device
+        self.submitted = 0
+        self.writes = 0
+        self.__apply = apply
+        self.__min_interval = min_interval
+        # Channel -> {priority: _Request}
+        self.__channels = {}
+        # Channel -> base state
+        self.__bases = {}
+        # Channel -> state last applied
+        self.__applied = {}
+        self.__next_write = 0.0
+        self.__running = True
+        self.__condition = threading.Condition()
+        self.__thread = threading.Thread(target=self.__run, name=f'scheduler-{device}', daemon=True)
+        self.__thread.start()
+
+    def submit(self, channel: str, state: tuple, priority: int, ttl: float | None) -> None:
+        expires = None if ttl is None else time.monotonic() + ttl
+        with self.__condition:
+            self.__channels.setdefault(channel, {})[priority] = _Request(state, expires)
+            self.submitted += 1
+            self.__condition.notify()
+
+    def set_base(self, channel: str, state: tuple) -> bool:
+        """
+        True when no notification is shown on channel, state is then
+        taken as applied, by the caller.
+        """
+        with self.__condition:
+            self.__bases[channel] = state
+            if self.__channels.get(channel):
+                self.__condition.notify()
+                return False
+            self.__applied[channel] = state
+            return True
+
+    def needs_base(self, channel: str) -> bool:
+        """
+        True without base state nor notification shown on channel.
+        """
+        with self.__condition:
+            return channel not in self.__bases and not self.__channels.get(channel)
+
+    def close(self) -> None:
+        with self.__condition:
+            self.__running = False
+            self.__condition.notify()
+        self.__thread.join()
+
+    def __due(self, now: float) -> tuple[list[tuple[str, tuple]], float | None]:
+        """
+        States to apply, and the next expiry time. Drops the expired
+        requests, must be called with the condition held.
+        """
+        due = []
+        next_expiry = None
+        for channel, requests in list(self.__channels.items()):
+            for priority, request in list(requests.items()):
+                if request.expires is not None and request.expires <= now:
+                    del requests[priority]
+            if requests:
+                state = requests[max(requests)].state
+            elif channel in self.__bases:
+                state = self.__bases[channel]
+            else:
+                # Nothing to show anymore, the next state is always applied
+                del self.__channels[channel]
+                self.__applied.pop(channel, None)
+                continue
+            if self.__applied.get(channel) != state:
+                due.append((channel, state))
+            for request in requests.values():
+                if request.expires is not None and (next_expiry is None or request.expires < next_expiry):
+                    next_expiry = request.expires
+        return due, next_expiry
+
+    def __run(self) -> None:
+        while True:
+            with self.__condition:
+                if not self.__running:
+                    return
+                now = time.monotonic()
+                due, next_expiry = self.__due(now)
+                if not due or now < self.__next_write:
+                    timeout = None if next_expiry is None else next_expiry - now
+                    if due:
+                        timeout = self.__next_write - now
+                    self.__condition.wait(timeout)
+                    continue
+                channel, state = due[0]
+                self.__applied[channel] = state
+            try:
+                self.__apply(self.device, state)
+            except Exception as err:
+                print(f'Error: {self.device} {err}')
+            self.writes += 1
+            self.__next_write = time.monotonic() + self.__min_interval
+
+
+class NotificationScheduler:
+    """
+    apply(device, state) is called from the device writer thread.
+    min_intervals gives the minimum time between two writes of a
+    device, default_interval for the others.
+    """
+    def __init__(self, apply, min_intervals: dict[str, float] | None = None, default_interval: float = 0.05):
+        self.__apply = apply
+        self.__min_intervals = min_intervals or {}
+        self.__default_interval = default_interval
+        self.__queues = {}
+        self.__lock = threading.Lock()
+
+    def submit(self, device: str, channel: str, state, priority: int = 0, ttl: float | None = None) -> None:
+        """
+        state must be hashable and comparable, like a tuple of the
+        command line arguments. Without ttl, it stays until replaced by
+        a state of the same priority.
+        """
+        self.__queue(device).submit(channel, state, priority, ttl)
+
+    def set_base(self, device: str, channel: str, state) -> bool:
+        """
+        Sets the state of channel without notification, shown again when
+        they expire. Returns True when no notification is shown, the
+        caller applies state itself, right away. Otherwise it is applied
+        once they expire.
+        """
+        return self.__queue(device).set_base(channel, state)
+
+    def needs_base(self, device: str, channel: str) -> bool:
+        """
+        True when the state to show again after a first notification on
+        channel is not known yet.
+        """
+        return self.__queue(device).needs_base(channel)
+
+    def __queue(self, device: str) -> _DeviceQueue:
+        with self.__lock:
+            queue = self.__queues.get(device)
+            if queue is None:
+                queue = self.__queues[device] = _DeviceQueue(
+                    device, self.__apply, self.__min_intervals.get(device, self.__default_interval))
+            return queue
+
+    def stats(self) -> dict[str, tuple[int, int]]:
+        """
+        (submitted, writes) per device.
+        """
+        with self.__lock:
+            return {device: (queue.submitted, queue.writes) for device, queue in self.__queues.items()}
+
+    def close(self) -> None:
+        with self.__lock:
+            queues = list(self.__queues.values())
+            self.__queues.clear()
+        for queue in queues:
+            queue.close()
@@ -0,0 +1,300 @@
+"""
+In-process sessions on an opened keyboard or mouse, for the programs
+sending many commands.
+
+KeyboardSession encodes the NIC commands in a single 64 bytes report
+buffer, allocated once. MouseSession keeps the Model O configuration in
+two 520 bytes buffers, the current one and the one being changed,
+written only when different. The hidraw transport takes these buffers
+as is, hidapi gets a bytes copy, see hid_transport.report_data.
+
+    with KeyboardSession() as keyboard, MouseSession() as mouse:
+        keyboard.set_hsv(0, 255, 255)
+        mouse.set(effect=GloriousEffect.SINGLE_COLOUR, single_rgb=0xFF0000)
+
+hid_board.py and hid_mouse.py run their commands through them.
+"""
+import argparse
+
+import hid_board
+import hid_colour
+import hid_mouse
+import hid_shadow
+import hid_snapshot
+import hid_transport
+from hid_board import HNC_BATCH, HNC_GET, HNC_OFF, HNC_ON, HNC_SAVE, HNC_SET, REPORT_SIZE
+from hid_glorious import CONFIG_SIZE, MARKER_OFFSET
+
+_NIC = b'NIC'
+_COMMAND = len(_NIC)
+_ARGUMENTS = _COMMAND + 1
+_ENABLED = {HNC_ON: True, HNC_OFF: False}
+
+
+class _Session:
+    def __init__(self, h, open_device):
+        self._owned = h is None
+        if h is None:
+            h = open_device()
+            if h is None:
+                raise hid_transport.DeviceNotPresent()
+        self.h = h
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self) -> None:
+        """
+        Closes the device when opened by the session.
+        """
+        if self._owned and self.h is not None:
+            self.h.close()
+        self.h = None
+
+
+class KeyboardSession(_Session):
+    """
+    NIC protocol keyboard, the first one found or the opened h. key
+    identifies it for the capabilities and reply delays learned, the
+    cached keyboard when None.
+    """
+    def __init__(self, h=None, key: str | None = None):
+        super().__init__(h, hid_board.open_device)
+        self.key = key or hid_board._caps_key()
+        self.__report = bytearray(REPORT_SIZE)
+        self.__report[:_COMMAND] = _NIC
+        self.__view = memoryview(self.__report)
+        self.__zeros = memoryview(bytes(REPORT_SIZE))
+        # End of the bytes set by the last command, the rest is zero
+        self.__used = _ARGUMENTS
+
+    def __send(self, command: bytes, length: int, needed: bool = False) -> bytes:
+        """
+        Writes the report, its arguments already at _ARGUMENTS for
+        length bytes, and returns the reply.
+        """
+        end = _ARGUMENTS + length
+        if self.__used > end:
+            self.__view[end:self.__used] = self.__zeros[end:self.__used]
+        self.__used = end
+        self.__view[_COMMAND] = command[0]
+        self.h.write(hid_transport.report_data(self.h, self.__report))
+        reply = hid_board.read_reply(self.h, self.key, command, needed)
+        # Only the get replies have the HSV values, a set has the ones sent
+        if command == HNC_SET:
+            hid_snapshot.publish_keyboard(self.__view[_ARGUMENTS:_ARGUMENTS + 3])
+        elif command == HNC_GET:
+            hid_snapshot.publish_keyboard(self.__hsv(reply))
+        else:
+            hid_snapshot.publish_keyboard(enabled=_ENABLED.get(command))
+        return reply
+
+    def on(self) -> None:
+        self.__send(HNC_ON, 0)
+
+    def off(self) -> None:
+        self.__send(HNC_OFF, 0)
+
+    def save(self) -> None:
+        self.__send(HNC_SAVE, 0)
+
+    def set_hsv(self, hue: int, saturation: int, value: int) -> None:
+        """
+        Raises ValueError for values out of 0-255.
+        """
+        if not (0 <= hue <= 0xFF and 0 <= saturation <= 0xFF and 0 <= value <= 0xFF):
+            raise ValueError(f'HSV values must be 0-255: {hue}, {saturation}, {value}')
+        view = self.__view
+        view[_ARGUMENTS] = hue
+        view[_ARGUMENTS + 1] = saturation
+        view[_ARGUMENTS + 2] = value
+        self.__send(HNC_SET, 3)
+
+    def set_rgb(self, raw_value: int) -> None:
+        self.set_hsv(*hid_colour.rgb_to_hsv((raw_value >> 16) & 0xFF, (raw_value >> 8) & 0xFF, raw_value & 0xFF))
+
+    def get_hsv(self) -> tuple[int, int, int] | None:
+        """
+        None without reply.
+        """
+        return self.__hsv(self.__send(HNC_GET, 0, needed=True))
+
+    def batch(self, commands: list[bytes]) -> tuple[int, int, int] | None:
+        """
+        Sends the commands, like hid_board.batch_command ones, in HNC_BATCH
+        reports when the keyboard supports them, one report each
+        otherwise. Returns the HSV values of the last get, None without.
+        """
+        hsv = None
+        singles = commands
+        if hid_board.device_caps(self.h, self.key) & hid_board.CAPS_BATCH:
+            for start, count, length in self.__batches(commands):
+                sent = commands[start:start + count]
+                self.__view[_ARGUMENTS] = count
+                offset = _ARGUMENTS + 1
+                for command in sent:
+                    self.__view[offset:offset + len(command)] = command
+                    offset += len(command)
+                # Waited for in any case, a missing reply falls back to singles
+                reply = self.__send(HNC_BATCH, length, needed=True)
+                if reply[7:10] != b'BAT':
+                    # Flashed with another firmware since cached, the
+                    # commands of the previous reports are done
+                    hid_board.forget_caps(self.key)
+                    singles = commands[start:]
+                    break
+                enabled = [_ENABLED[command[:1]] for command in sent if command[:1] in _ENABLED]
+                sets = [command[1:4] for command in sent if command[:1] == HNC_SET]
+                if sent[-1][:1] == HNC_GET:
+                    hsv = self.__hsv(reply)
+                    published = hsv
+                else:
+                    published = sets[-1] if sets else None
+                hid_snapshot.publish_keyboard(published, enabled[-1] if enabled else None)
+            else:
+                singles = []
+        for command in singles:
+            self.__view[_ARGUMENTS:_ARGUMENTS + len(command) - 1] = command[1:]
+            reply = self.__send(command[:1], len(command) - 1, command[:1] == HNC_GET)
+            if command[:1] == HNC_GET:
+                hsv = self.__hsv(reply)
+        return hsv
+
+    @staticmethod
+    def __hsv(reply: bytes) -> tuple[int, int, int] | None:
+        if len(reply) < _ARGUMENTS + 3:
+            return None
+        return reply[_ARGUMENTS], reply[_ARGUMENTS + 1], reply[_ARGUMENTS + 2]
+
+    @staticmethod
+    def __batches(commands: list[bytes]):
+        """
+        (first command, count, arguments length) of each HNC_BATCH report.
+        A get ends its report, the HSV values replied are then its ones.
+        """
+        start = 0
+        count = 0
+        length = 1
+        for index, command in enumerate(commands):
+            if _ARGUMENTS + length + len(command) > REPORT_SIZE:
+                yield start, count, length
+                start = index
+                count = 0
+                length = 1
+            count += 1
+            length += len(command)
+            if command[:1] == HNC_GET:
+                yield start, count, length
+                start = index + 1
+                count = 0
+                length = 1
+        if count:
+            yield start, count, length
+
+    def run(self, args: argparse.Namespace) -> tuple[int, int, int] | None:
+        """
+        Runs the hid_board.py command of args, returns the HSV values of
+        a --get, or a --batch having one.
+        """
+        if args.batch is not None:
+            return self.batch(args.batch)
+        if args.set is not None:
+            self.set_hsv(*args.set)
+        elif args.rgb is not None:
+            self.set_rgb(args.rgb[0])
+        elif args.on:
+            self.on()
+        elif args.off:
+            self.off()
+        elif args.save:
+            self.save()
+        elif args.get:
+            return self.get_hsv()
+        return None
+
+
+class MouseSession(_Session):
+    """
+    Glorious Model O, the one found or the opened h. The configuration is
+    loaded from the shadow copy of key, or read, once. With shadow, the
+    shadow copy is also updated on each write.
+    """
+    def __init__(self, h=None, key: str | None = None, shadow: bool = True):
+        super().__init__(h, hid_mouse.open_device)
+        from hid_glorious import GloriousModelORecord
+        self.key = key if key is not None else hid_mouse.shadow_key()
+        self.__shadow = shadow
+        self.__current = bytearray(CONFIG_SIZE)
+        self.__buffer = bytearray(CONFIG_SIZE)
+        self.__current_view = memoryview(self.__current)
+        self.__view = memoryview(self.__buffer)
+        self.__loaded = False
+        self.record = GloriousModelORecord.over(self.__buffer)
+
+    def load(self, refresh: bool = False) -> None:
+        """
+        Loads the configuration, again from the mouse with refresh.
+        """
+        if self.__loaded and not refresh:
+            return
+        config = None if refresh or not self.__shadow else hid_shadow.load(self.key)
+        if config is None:
+            config = hid_mouse.read_config(self.h)
+            if self.__shadow:
+                hid_shadow.store(self.key, config)
+        self.__current[:] = config
+        self.__current[MARKER_OFFSET] = 0x00
+        self.__loaded = True
+
+    @property
+    def config(self) -> bytes:
+        """
+        The current configuration, as read from the mouse.
+        """
+        self.load()
+        return bytes(self.__current)
+
+    def edit(self):
+        """
+        The GloriousModelORecord to change before commit, starting from the
+        current configuration.
+        """
+        self.load()
+        self.__view[:] = self.__current_view
+        return self.record
+
+    def commit(self) -> bool:
+        """
+        Writes the record when changed, False when not.
+        """
+        marker = MARKER_OFFSET
+        view = self.__view
+        current = self.__current_view
+        if view[:marker] == current[:marker] and view[marker + 1:] == current[marker + 1:]:
+            return False
+        hid_mouse.send_config(self.h, self.key, hid_transport.report_data(self.h, self.__buffer))
+        current[:] = view
+        current[marker] = 0x00
+        if self.__shadow:
+            hid_shadow.store(self.key, self.__current)
+        return True
+
+    def set(self, **fields) -> bool:
+        """
+        Sets GloriousModelORecord fields, like effect=GloriousEffect.OFF,
+        and writes them when changed.
+        """
+        record = self.edit()
+        for name, value in fields.items():
+            setattr(record, name, value)
+        return self.commit()
+
+    def run(self, args: argparse.Namespace) -> bool:
+        """
+        Runs the hid_mouse.py command of args, False when nothing was
+        written.
+        """
+        return hid_mouse.apply_command(self.edit(), args) and self.commit()
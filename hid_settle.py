@@ -0,0 +1,85 @@
+"""
+Adaptive write completion detection.
+
+Instead of a fixed sleep after each write, the device is polled, with
+an exponential backoff, until the write is seen applied. The time it
+takes is learned per device, an exponentially weighted moving average
+kept in the discovery cache, and used to time the first poll and the
+reply deadlines of the following runs.
+
+A device not confirming in time keeps the previous fixed waits as the
+upper bound, nothing is lost in reliability.
+"""
+import threading
+import time
+
+import hid_discovery
+
+ALPHA = 0.2  # Weight of a new observation
+MIN_POLL = 0.001
+# Saved again when moved by more than this fraction
+SAVE_CHANGE = 0.1
+
+# Device key -> learned settle time in seconds, loaded on first use
+_learned = None
+_saved = {}
+_lock = threading.Lock()
+
+
+def _load() -> dict[str, float]:
+    global _learned
+    if _learned is None:
+        _learned = dict(hid_discovery.load_cache().get('settle', {}))
+        _saved.update(_learned)
+    return _learned
+
+
+def learned(key: str) -> float | None:
+    with _lock:
+        return _load().get(key)
+
+
+def observe(key: str, seconds: float) -> None:
+    with _lock:
+        values = _load()
+        previous = values.get(key)
+        value = seconds if previous is None else previous + ALPHA * (seconds - previous)
+        values[key] = value
+        saved = _saved.get(key)
+        if saved is not None and abs(value - saved) <= SAVE_CHANGE * saved:
+            return
+        _saved[key] = value
+        with hid_discovery.updating_cache() as cache:
+            cache.setdefault('settle', {})[key] = value
+
+
+def deadline(key: str, ceiling: float, floor: float, margin: float = 3.0) -> float:
+    """
+    Time to wait for key, margin times its learned settle time, within
+    floor and ceiling. The ceiling until learned.
+    """
+    value = learned(key)
+    if value is None:
+        return ceiling
+    return min(max(value * margin, floor), ceiling)
+
+
+def poll(check, key: str, ceiling: float) -> float | None:
+    """
+    Calls check() until it returns True, first after half the learned
+    settle time of key, then doubling the wait each time, up to ceiling
+    seconds. Returns the time it took, learned, None when not confirmed.
+    """
+    start = time.perf_counter()
+    value = learned(key)
+    wait = max(value / 2 if value is not None else MIN_POLL, MIN_POLL)
+    while True:
+        elapsed = time.perf_counter() - start
+        time.sleep(max(min(wait, ceiling - elapsed), 0))
+        if check():
+            elapsed = time.perf_counter() - start
+            observe(key, elapsed)
+            return elapsed
+        if time.perf_counter() - start >= ceiling:
+            return None
+        wait *= 2
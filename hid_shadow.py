@@ -0,0 +1,83 @@
+"""
+Shadow copies of the Glorious Model O configuration, one per device.
+
+The last 520 bytes configuration read from, or written to, the mouse is
+kept in a cache file named after the device serial. The changes are
+built from that copy instead of reading the device each time, and a
+record identical to the shadow one doesn't need to be sent at all.
+
+The shadow copy is stale MAX_AGE seconds after its last read or write,
+the mouse could have been configured by something else in the mean
+time. It is kept short: a copy saves the reads of the commands run in a
+row, a stale one would have its configuration sent back.
+"""
+import os
+import time
+
+from hid_glorious import CONFIG_SIZE, MARKER_OFFSET
+
+SHADOW_DIR = os.path.join(
+    os.environ.get('XDG_CACHE_HOME', os.path.join(os.path.expanduser('~'), '.cache')),
+    'qmk_tools',
+    'model_o')
+
+# Seconds
+MAX_AGE = 60
+
+
+def _shadow_path(key: str) -> str:
+    # The serial, or the path when the mouse has none, as a file name.
+    return os.path.join(SHADOW_DIR, key.encode().hex() + '.bin')
+
+
+def normalized(config: bytes) -> bytes:
+    """
+    The configuration as read from the device, without the write marker.
+    """
+    config = bytearray(config)
+    config[MARKER_OFFSET] = 0x00
+    return bytes(config)
+
+
+def same_config(a: bytes, b: bytes) -> bool:
+    return normalized(a) == normalized(b)
+
+
+def load(key: str | None, max_age: float | None = None) -> bytes | None:
+    """
+    Shadow configuration of a device, None if missing or older than
+    max_age, MAX_AGE by default.
+    """
+    if not key:
+        return None
+    path = _shadow_path(key)
+    try:
+        if time.time() - os.path.getmtime(path) > (MAX_AGE if max_age is None else max_age):
+            return None
+        with open(path, 'rb') as f:
+            config = f.read()
+    except OSError:
+        return None
+    return config if len(config) == CONFIG_SIZE else None
+
+
+def store(key: str | None, config: bytes) -> None:
+    if not key or len(config) != CONFIG_SIZE:
+        return
+    path = _shadow_path(key)
+    try:
+        os.makedirs(SHADOW_DIR, exist_ok=True)
+        with open(path + '.tmp', 'wb') as f:
+            f.write(normalized(config))
+        os.replace(path + '.tmp', path)
+    except OSError:
+        pass  # Only a cache
+
+
+def discard(key: str | None) -> None:
+    if not key:
+        return
+    try:
+        os.unlink(_shadow_path(key))
+    except OSError:
+        pass
@@ -0,0 +1,291 @@
+"""
+Last known LED state of the keyboard and the mouse, in a small memory
+mapped file, for the status bars and dashboards.
+
+The tools publish the state on every write, and every read they do
+anyway: the keyboard HSV values and on/off, the Model O configuration.
+Readers map the file and poll it without any USB round trip, nor
+disturbing the notifications.
+
+The file is in $XDG_RUNTIME_DIR/qmk_tools, the cache directory without
+it. Layout, little endian:
+    Header   : b'QMKSNAP1', sequence (Q)
+    Keyboard : flags (B), enabled (B), HSV (3s), update time (d)
+    Mouse    : flags (B), update time (d), configuration (520s)
+The flags tell the values known, KNOWN_HSV and KNOWN_ENABLED for the
+keyboard, KNOWN_CONFIG for the mouse.
+
+The sequence is a seqlock: odd while a writer changes the state, the
+writers taking a flock on the file between them. A reader copies the
+state between two identical even sequence values.
+
+    hid_snapshot.py [--json] [--watch SECONDS]
+"""
+import argparse
+import contextlib
+import fcntl
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+
+SNAPSHOT_PATH = os.path.join(
+    os.environ.get('XDG_RUNTIME_DIR')
+    or os.environ.get('XDG_CACHE_HOME', os.path.join(os.path.expanduser('~'), '.cache')),
+    'qmk_tools',
+    'led_state')
+
+MAGIC = b'QMKSNAP1'
+HEADER = struct.Struct('<8sQ')
+KEYBOARD = struct.Struct('<BB3sd')
+MOUSE = struct.Struct('<Bd520s')
+SEQUENCE_OFFSET = len(MAGIC)
+KEYBOARD_OFFSET = HEADER.size
+MOUSE_OFFSET = KEYBOARD_OFFSET + KEYBOARD.size
+SIZE = MOUSE_OFFSET + MOUSE.size
+
+KNOWN_HSV = 0x01
+KNOWN_ENABLED = 0x02
+KNOWN_CONFIG = 0x01
+
+# Longest wait for a writer, seconds
+READ_TIMEOUT = 0.1
+
+
+class _Writer:
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.__fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_CLOEXEC, 0o644)
+        self.__lock = threading.Lock()
+        with self.__locked():
+            if os.fstat(self.__fd).st_size < SIZE:
+                os.ftruncate(self.__fd, SIZE)
+            self.__map = mmap.mmap(self.__fd, SIZE)
+            magic, sequence = HEADER.unpack_from(self.__map)
+            if magic != MAGIC:
+                self.__map[:] = bytes(SIZE)
+                HEADER.pack_into(self.__map, 0, MAGIC, 0)
+            elif sequence & 1:
+                # A writer died in the middle, its state is as good as any
+                HEADER.pack_into(self.__map, 0, MAGIC, sequence + 1)
+
+    @contextlib.contextmanager
+    def __locked(self):
+        """
+        Excludes the other writers, threads and processes.
+        """
+        with self.__lock:
+            fcntl.flock(self.__fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self.__fd, fcntl.LOCK_UN)
+
+    def update(self, offset: int, layout: struct.Struct, change) -> None:
+        """
+        Replaces the values of layout at offset by change(values), under
+        the seqlock.
+        """
+        with self.__locked():
+            values = change(layout.unpack_from(self.__map, offset))
+            sequence = HEADER.unpack_from(self.__map)[1]
+            struct.pack_into('<Q', self.__map, SEQUENCE_OFFSET, sequence + 1)
+            layout.pack_into(self.__map, offset, *values)
+            struct.pack_into('<Q', self.__map, SEQUENCE_OFFSET, sequence + 2)
+
+
+# _Writer of the process, False once it failed
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def _get_writer() -> _Writer | None:
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            try:
+                _writer = _Writer(SNAPSHOT_PATH)
+            except OSError:
+                _writer = False  # Only a convenience, the tools work without
+        return _writer or None
+
+
+def publish_keyboard(hsv: bytes | None = None, enabled: bool | None = None) -> None:
+    """
+    Publishes the keyboard values known, the others are kept.
+    """
+    writer = _get_writer()
+    if writer is None or (hsv is None and enabled is None):
+        return
+
+    def change(values):
+        flags, current_enabled, current_hsv, _ = values
+        if hsv is not None:
+            flags |= KNOWN_HSV
+            current_hsv = bytes(hsv)
+        if enabled is not None:
+            flags |= KNOWN_ENABLED
+            current_enabled = enabled
+        return flags, current_enabled, current_hsv, time.time()
+    try:
+        writer.update(KEYBOARD_OFFSET, KEYBOARD, change)
+    except (OSError, ValueError):
+        pass
+
+
+def publish_mouse(config) -> None:
+    """
+    Publishes the Model O configuration, read or written.
+    """
+    writer = _get_writer()
+    if writer is None:
+        return
+    try:
+        writer.update(MOUSE_OFFSET, MOUSE, lambda values: (KNOWN_CONFIG, time.time(), bytes(config)))
+    except (OSError, ValueError):
+        pass
+
+
+class Snapshot:
+    def __init__(self, sequence: int, data: bytes):
+        self.sequence = sequence
+        flags, enabled, hsv, self.keyboard_updated = KEYBOARD.unpack_from(data, KEYBOARD_OFFSET)
+        self.hsv = tuple(hsv) if flags & KNOWN_HSV else None
+        self.enabled = bool(enabled) if flags & KNOWN_ENABLED else None
+        flags, self.mouse_updated, config = MOUSE.unpack_from(data, MOUSE_OFFSET)
+        self.config = config if flags & KNOWN_CONFIG else None
+
+    def mouse_fields(self) -> dict | None:
+        """
+        The GloriousModelORecord fields of the mouse configuration.
+        """
+        if self.config is None:
+            return None
+        from hid_glorious import GloriousModelORecord
+        return GloriousModelORecord(self.config).decode()
+
+    def to_dict(self) -> dict:
+        fields = self.mouse_fields()
+        return {
+            'sequence': self.sequence,
+            'keyboard': {'hsv': self.hsv, 'enabled': self.enabled, 'updated': self.keyboard_updated or None},
+            'mouse': {
+                'fields': None if fields is None else {name: _json_value(value) for name, value in fields.items()},
+                'updated': self.mouse_updated or None,
+            },
+        }
+
+
+def _json_value(value):
+    return value.name if hasattr(value, 'name') else value
+
+
+class SnapshotReader:
+    """
+    Maps the snapshot file once, for the programs polling it.
+    """
+    def __init__(self, path: str | None = None):
+        self.path = SNAPSHOT_PATH if path is None else path
+        self.__map = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __mapped(self) -> mmap.mmap | None:
+        if self.__map is None:
+            try:
+                with open(self.path, 'rb') as f:
+                    self.__map = mmap.mmap(f.fileno(), SIZE, access=mmap.ACCESS_READ)
+            except (OSError, ValueError):
+                return None  # Nothing published yet
+        return self.__map
+
+    @property
+    def sequence(self) -> int | None:
+        """
+        Changes on each publication, for the readers checking it first.
+        """
+        mapped = self.__mapped()
+        if mapped is None:
+            return None
+        return HEADER.unpack_from(mapped)[1]
+
+    def read(self) -> Snapshot | None:
+        """
+        The state, None when not published or not readable before
+        READ_TIMEOUT.
+        """
+        mapped = self.__mapped()
+        if mapped is None or HEADER.unpack_from(mapped)[0] != MAGIC:
+            return None
+        deadline = time.monotonic() + READ_TIMEOUT
+        while True:
+            sequence = HEADER.unpack_from(mapped)[1]
+            if not sequence & 1:
+                data = mapped[:SIZE]
+                if HEADER.unpack_from(mapped)[1] == sequence:
+                    return Snapshot(sequence, data)
+            if time.monotonic() > deadline:
+                return None
+            time.sleep(0)
+
+    def close(self) -> None:
+        if self.__map is not None:
+            self.__map.close()
+            self.__map = None
+
+
+def read(path: str | None = None) -> Snapshot | None:
+    with SnapshotReader(path) as reader:
+        return reader.read()
+
+
+def _lines(snapshot: Snapshot) -> list[str]:
+    hsv = 'unknown' if snapshot.hsv is None else ' '.join(f'{value:02X}' for value in snapshot.hsv)
+    enabled = {None: 'unknown', True: 'on', False: 'off'}[snapshot.enabled]
+    lines = [f'Keyboard HSV : {hsv}, {enabled}']
+    if snapshot.config is None:
+        lines.append('Mouse : unknown')
+    else:
+        from hid_glorious import GloriousModelORecord
+        lines.append(str(GloriousModelORecord(snapshot.config)))
+    return lines
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--json', help='Prints the state as JSON', action='store_true')
+    parser.add_argument('--watch', help='Prints the state again when changed, checking every SECONDS',
+                        type=float, metavar='SECONDS')
+    parser.add_argument('--path', help='Snapshot file', default=SNAPSHOT_PATH)
+    args = parser.parse_args(argv)
+
+    with SnapshotReader(args.path) as reader:
+        sequence = -1
+        while True:
+            if reader.sequence != sequence:
+                snapshot = reader.read()
+                if snapshot is None:
+                    if args.watch is None:
+                        print('Error: nothing published')
+                else:
+                    sequence = snapshot.sequence
+                    if args.json:
+                        print(json.dumps(snapshot.to_dict()), flush=True)
+                    else:
+                        print('\n'.join(_lines(snapshot)), flush=True)
+            if args.watch is None:
+                return
+            try:
+                time.sleep(args.watch)
+            except KeyboardInterrupt:
+                return
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+"""
+Streaming of HSV/RGB frames to a keyboard, for animations like build
+progress bars, over one opened device.
+
+Frames are read, one per line, by a reader thread into a single slot.
+The sender takes the slot content at the configured frame rate, so when
+the device falls behind the stale frames are dropped and the newest one
+is always sent.
+
+Line format, values in any int() base 0 notation:
+    H S V       three values, sent as is
+    0xRRGGBB    one value, converted to HSV
+"""
+import sys
+import threading
+import time
+
+import hid_snapshot
+from hid_board import HNC_SET, pad_report, rgb_to_hsv
+
+
+def parse_frame(line: str) -> bytes | None:
+    """
+    3 HSV bytes from a frame line, None for an invalid line.
+    """
+    try:
+        values = [int(value, 0) for value in line.replace(',', ' ').split()]
+    except ValueError:
+        return None
+    if len(values) == 3 and all(0 <= value <= 0xFF for value in values):
+        return bytes(values)
+    if len(values) == 1 and 0 <= values[0] <= 0xFFFFFF:
+        return rgb_to_hsv(values[0])
+    return None
+
+
+class FrameSlot:
+    """
+    Latest frame read, a new frame replaces the pending one.
+    """
+    def __init__(self):
+        self.received = 0
+        self.dropped = 0
+        self.finished = False
+        self.__frame = None
+        self.__condition = threading.Condition()
+
+    def put(self, frame: bytes) -> None:
+        with self.__condition:
+            if self.__frame is not None:
+                self.dropped += 1
+            self.__frame = frame
+            self.received += 1
+            self.__condition.notify()
+
+    def finish(self) -> None:
+        with self.__condition:
+            self.finished = True
+            self.__condition.notify()
+
+    def take(self, timeout: float | None = None) -> bytes | None:
+        """
+        Pending frame, waiting for one up to timeout. None when there is
+        none, see finished.
+        """
+        with self.__condition:
+            if self.__frame is None and not self.finished:
+                self.__condition.wait(timeout)
+            frame = self.__frame
+            self.__frame = None
+            return frame
+
+
+def _read_frames(lines, slot: FrameSlot) -> None:
+    try:
+        for line in lines:
+            frame = parse_frame(line)
+            if frame is not None:
+                slot.put(frame)
+    finally:
+        slot.finish()
+
+
+def stream(h, lines, fps: float) -> tuple[int, int, int, float]:
+    """
+    Sends the frames from lines until exhausted.
+    Returns (received, sent, dropped, elapsed seconds).
+    """
+    slot = FrameSlot()
+    reader = threading.Thread(target=_read_frames, args=(lines, slot), daemon=True)
+    reader.start()
+
+    period = 1.0 / fps
+    report = bytearray(pad_report(b'NIC' + HNC_SET + b'\x00\x00\x00'))
+    sent = 0
+    start = time.perf_counter()
+    next_time = start
+    while True:
+        frame = slot.take(timeout=0.5)
+        if frame is None:
+            if slot.finished:
+                break
+            continue
+        report[4:7] = frame
+        h.write(bytes(report))
+        hid_snapshot.publish_keyboard(frame)
+        # The replies are not needed, only avoid letting them pile up.
+        h.read(64, 0)
+        sent += 1
+        next_time += period
+        delay = next_time - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        else:
+            next_time = time.perf_counter()  # Late, don't try to catch up
+    return slot.received, sent, slot.dropped, time.perf_counter() - start
+
+
+def run_stream(h, source: str, fps: float) -> list[str]:
+    """
+    Streams from a file/pipe path, '-' for stdin, returns the lines to print.
+    """
+    if source == '-':
+        received, sent, dropped, elapsed = stream(h, sys.stdin, fps)
+    else:
+        with open(source) as lines:
+            received, sent, dropped, elapsed = stream(h, lines, fps)
+    achieved = sent / elapsed if elapsed > 0 else 0.0
+    return [f'Frames: {received} received, {sent} sent, {dropped} dropped, {achieved:.1f} fps']
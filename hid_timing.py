@@ -0,0 +1,209 @@
+"""
+Latency histograms of the HID operations, per device model.
+
+The stages timed are the enumerate, device open, write, read and
+feature reports, plus the write settle waits. Each (model, operation) gets a
+histogram with fixed buckets, like Prometheus ones.
+
+--timings on the tools prints the breakdown of the run.
+--timings-export PATH accumulates the histograms in PATH when it ends
+with .json, otherwise in PATH.json and writes PATH in the Prometheus
+text format, for node_exporter's textfile collector.
+"""
+import contextlib
+import json
+import os
+import threading
+import time
+
+# Upper bounds in seconds, the last bucket is +Inf
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+
+class Histogram:
+    __slots__ = ('counts', 'total', 'count')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, seconds: float) -> None:
+        index = 0
+        for bound in BUCKETS:
+            if seconds <= bound:
+                break
+            index += 1
+        self.counts[index] += 1
+        self.total += seconds
+        self.count += 1
+
+    def merge(self, other: 'Histogram') -> None:
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.total += other.total
+        self.count += other.count
+
+    def to_dict(self) -> dict:
+        return {'counts': self.counts, 'sum': self.total, 'count': self.count}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'Histogram':
+        histogram = cls()
+        if len(data['counts']) == len(histogram.counts):
+            histogram.counts = list(data['counts'])
+            histogram.total = data['sum']
+            histogram.count = data['count']
+        return histogram
+
+
+# (model, operation) -> Histogram, in the order first seen
+_histograms = {}
+_lock = threading.Lock()
+
+
+def observe(model: str, operation: str, seconds: float) -> None:
+    with _lock:
+        histogram = _histograms.get((model, operation))
+        if histogram is None:
+            histogram = _histograms[(model, operation)] = Histogram()
+        histogram.observe(seconds)
+
+
+@contextlib.contextmanager
+def timed(model: str, operation: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(model, operation, time.perf_counter() - start)
+
+
+class TimedDevice:
+    """
+    hid.Device wrapper timing the reports.
+    """
+    def __init__(self, device, model: str):
+        self.__device = device
+        self.__model = model
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __getattr__(self, name):
+        return getattr(self.__device, name)
+
+    def write(self, data):
+        with timed(self.__model, 'write'):
+            return self.__device.write(data)
+
+    def read(self, size, timeout=None):
+        with timed(self.__model, 'read'):
+            return self.__device.read(size, timeout)
+
+    def send_feature_report(self, data):
+        with timed(self.__model, 'send_feature_report'):
+            return self.__device.send_feature_report(data)
+
+    def get_feature_report(self, report_id, size):
+        with timed(self.__model, 'get_feature_report'):
+            return self.__device.get_feature_report(report_id, size)
+
+    def close(self):
+        self.__device.close()
+
+
+def snapshot() -> dict[tuple[str, str], Histogram]:
+    with _lock:
+        return dict(_histograms)
+
+
+def breakdown() -> list[str]:
+    """
+    Per stage lines of the timings collected by this process.
+    """
+    lines = [f'{"model":12} {"operation":22} {"count":>6} {"total ms":>10} {"mean ms":>9}']
+    for (model, operation), histogram in snapshot().items():
+        lines.append(
+            f'{model:12} {operation:22} {histogram.count:6} {histogram.total * 1000:10.3f} '
+            f'{histogram.total * 1000 / histogram.count:9.3f}')
+    return lines
+
+
+def load(path: str) -> dict[tuple[str, str], Histogram]:
+    try:
+        with open(path) as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return {
+        (entry['model'], entry['operation']): Histogram.from_dict(entry)
+        for entry in data.get('histograms', [])
+    }
+
+
+def prometheus_text(histograms: dict[tuple[str, str], Histogram]) -> str:
+    lines = [
+        '# HELP qmk_tools_hid_operation_seconds Latency of the HID operations.',
+        '# TYPE qmk_tools_hid_operation_seconds histogram',
+    ]
+    for (model, operation), histogram in histograms.items():
+        labels = f'model="{model}",operation="{operation}"'
+        cumulative = 0
+        for bound, count in zip(BUCKETS + ('+Inf',), histogram.counts):
+            cumulative += count
+            lines.append(f'qmk_tools_hid_operation_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'qmk_tools_hid_operation_seconds_sum{{{labels}}} {histogram.total}')
+        lines.append(f'qmk_tools_hid_operation_seconds_count{{{labels}}} {histogram.count}')
+    return '\n'.join(lines) + '\n'
+
+
+def _write_atomic(path: str, text: str) -> None:
+    with open(path + '.tmp', 'w') as f:
+        f.write(text)
+    os.replace(path + '.tmp', path)
+
+
+def export(path: str) -> None:
+    """
+    Adds the timings collected since the last export to the histograms
+    stored for path, see the module documentation.
+    """
+    with _lock:
+        collected = dict(_histograms)
+        _histograms.clear()
+    state_path = path if path.endswith('.json') else path + '.json'
+    histograms = load(state_path)
+    for key, histogram in collected.items():
+        histograms.setdefault(key, Histogram()).merge(histogram)
+    _write_atomic(state_path, json.dumps({
+        'buckets': BUCKETS,
+        'histograms': [
+            dict(model=model, operation=operation, **histogram.to_dict())
+            for (model, operation), histogram in histograms.items()
+        ],
+    }))
+    if state_path != path:
+        _write_atomic(path, prometheus_text(histograms))
+
+
+def add_arguments(parser) -> None:
+    parser.add_argument('--timings', help='Prints the time spent in each HID operation', action='store_true')
+    parser.add_argument('--timings-export', help='Accumulates the timings in a JSON or Prometheus (.prom) file',
+                        metavar='PATH')
+
+
+def report(args) -> None:
+    """
+    Handles the add_arguments options at the end of a run.
+    """
+    if args.timings:
+        for line in breakdown():
+            print(line)
+    if args.timings_export:
+        try:
+            export(args.timings_export)
+        except OSError as err:
+            print(f'Error: {err}')
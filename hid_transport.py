@@ -0,0 +1,188 @@
+"""
+HID transports: hidapi, or Linux hidraw directly.
+
+HidrawDevice talks to /dev/hidrawN with the plain system calls, without
+the hid ctypes bindings and hidapi in between. The reports are written
+with os.write, the feature reports go through the HIDIOCSFEATURE and
+HIDIOCGFEATURE ioctls on buffers allocated once per device and size.
+It has the hid.Device methods used by the tools, raising DeviceError,
+hid is never imported for it.
+
+device_errors gives the exceptions to catch around the device calls,
+without importing hid for the fake and hidraw devices.
+
+The transport is selected with HID_TRANSPORT:
+    auto      hidraw for the /dev/hidraw paths, hidapi otherwise (default)
+    hidapi    always hidapi
+    hidraw    always hidraw, Linux hidapi paths only
+    fake      the in-process emulated devices of hid_fake, enumerated
+              instead of the real ones
+
+    bench_transport.py compares both on the devices present.
+"""
+import fcntl
+import os
+import select
+
+TRANSPORTS = ('auto', 'hidapi', 'hidraw', 'fake')
+
+HIDRAW_PREFIX = b'/dev/hidraw'
+
+# linux/ioctl.h and linux/hidraw.h
+_IOC_WRITE = 1
+_IOC_READ = 2
+
+
+class DeviceError(Exception):
+    """
+    Error of the devices not going through hid, like the fake ones.
+    """
+
+
+class DeviceNotPresent(DeviceError):
+    """
+    No device found to open.
+    """
+    def __init__(self, message: str = 'Device not present'):
+        super().__init__(message)
+
+
+def device_error() -> type[Exception]:
+    """
+    Exception raised by the devices of the HID_TRANSPORT selected. With
+    auto, hid.HIDException when hid is installed, the hidraw devices
+    raising DeviceError.
+    """
+    if os.environ.get('HID_TRANSPORT', 'auto') in ('fake', 'hidraw'):
+        return DeviceError
+    try:
+        import hid
+    except ImportError:
+        return DeviceError  # Only hidraw then
+    return hid.HIDException
+
+
+def device_errors() -> tuple[type[Exception], ...]:
+    """
+    Exceptions to catch around the device calls.
+    """
+    error = device_error()
+    return (DeviceError,) if error is DeviceError else (error, DeviceError)
+
+
+def _ioc(direction: int, kind: str, number: int, size: int) -> int:
+    return direction << 30 | size << 16 | ord(kind) << 8 | number
+
+
+def hidiocsfeature(size: int) -> int:
+    return _ioc(_IOC_WRITE | _IOC_READ, 'H', 0x06, size)
+
+
+def hidiocgfeature(size: int) -> int:
+    return _ioc(_IOC_WRITE | _IOC_READ, 'H', 0x07, size)
+
+
+class HidrawDevice:
+    # The reports can be given as bytearray/memoryview, without a copy
+    accepts_buffers = True
+
+    def __init__(self, path: bytes):
+        self.path = path
+        try:
+            self.__fd = os.open(path, os.O_RDWR | os.O_CLOEXEC)
+        except OSError as err:
+            raise DeviceError(f'Unable to open {os.fsdecode(path)}: {err.strerror}') from err
+        self.__poll = select.poll()
+        self.__poll.register(self.__fd, select.POLLIN)
+        # Feature report size -> (ioctl buffer, its memoryview)
+        self.__buffers = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __buffer(self, size: int) -> tuple[bytearray, memoryview]:
+        buffer = self.__buffers.get(size)
+        if buffer is None:
+            data = bytearray(size)
+            buffer = self.__buffers[size] = (data, memoryview(data))
+        return buffer
+
+    def write(self, data) -> int:
+        try:
+            return os.write(self.__fd, data)
+        except OSError as err:
+            raise DeviceError(err.strerror) from err
+
+    def read(self, size: int, timeout: int | None = None) -> bytes:
+        """
+        Next input report, b'' after timeout milliseconds without one,
+        None waits forever.
+        """
+        try:
+            if not self.__poll.poll(timeout):
+                return b''
+            return os.read(self.__fd, size)
+        except OSError as err:
+            raise DeviceError(err.strerror) from err
+
+    def send_feature_report(self, data) -> int:
+        buffer, view = self.__buffer(len(data))
+        view[:] = data
+        try:
+            return fcntl.ioctl(self.__fd, hidiocsfeature(len(buffer)), buffer, True)
+        except OSError as err:
+            raise DeviceError(err.strerror) from err
+
+    def get_feature_report(self, report_id: int, size: int) -> bytes:
+        """
+        The report, starting with its id, like hidapi.
+        """
+        buffer, view = self.__buffer(size)
+        buffer[0] = report_id
+        try:
+            length = fcntl.ioctl(self.__fd, hidiocgfeature(size), buffer, True)
+        except OSError as err:
+            raise DeviceError(err.strerror) from err
+        return bytes(view[:length])
+
+    def close(self) -> None:
+        if self.__fd >= 0:
+            self.__poll.unregister(self.__fd)
+            os.close(self.__fd)
+            self.__fd = -1
+
+
+def report_data(h, buffer: bytearray):
+    """
+    buffer as given to h: as is when the transport takes buffers, a bytes
+    copy for hidapi, its ctypes binding needing bytes.
+    """
+    return buffer if getattr(h, 'accepts_buffers', False) else bytes(buffer)
+
+
+def transport_for(path: bytes, transport: str | None = None) -> str:
+    """
+    'hidapi', 'hidraw' or 'fake', for path with HID_TRANSPORT or transport.
+    """
+    transport = transport or os.environ.get('HID_TRANSPORT', 'auto')
+    if transport == 'auto':
+        return 'hidraw' if path and path.startswith(HIDRAW_PREFIX) else 'hidapi'
+    return transport
+
+
+def open_path(path: bytes, transport: str | None = None):
+    """
+    Opens a device path with the transport selected, see the module
+    documentation.
+    """
+    transport = transport_for(path, transport)
+    if transport == 'hidraw':
+        return HidrawDevice(path)
+    if transport == 'fake':
+        import hid_fake
+        return hid_fake.open_path(path)
+    import hid
+    return hid.Device(path=path)
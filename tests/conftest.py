@@ -0,0 +1,26 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(autouse=True)
+def isolated(tmp_path, monkeypatch):
+    """
+    Cache, shadow copies and LED state snapshot in tmp_path, nothing
+    learned from a previous test.
+    """
+    import hid_discovery
+    import hid_settle
+    import hid_shadow
+    import hid_snapshot
+    monkeypatch.setattr(hid_discovery, 'CACHE_PATH', str(tmp_path / 'devices.json'))
+    monkeypatch.setattr(hid_shadow, 'SHADOW_DIR', str(tmp_path / 'shadow'))
+    monkeypatch.setattr(hid_snapshot, 'SNAPSHOT_PATH', str(tmp_path / 'led_state'))
+    monkeypatch.setattr(hid_snapshot, '_writer', None)
+    monkeypatch.setattr(hid_settle, '_learned', None)
+    monkeypatch.setattr(hid_settle, '_saved', {})
+    monkeypatch.setenv('HID_TRANSPORT', 'fake')
+    return tmp_path
@@ -0,0 +1,69 @@
+import pytest
+
+import hid_board
+
+
+@pytest.mark.parametrize('fps', ['0', '-1', 'nan', 'inf', 'fast'])
+def test_fps_must_be_positive(fps, capsys):
+    with pytest.raises(SystemExit):
+        hid_board.create_parser().parse_args(['--stream', '--fps', fps])
+    assert '--fps' in capsys.readouterr().err
+
+
+def test_fps():
+    assert hid_board.create_parser().parse_args(['--stream', '--fps', '0.5']).fps == 0.5
+
+
+@pytest.mark.parametrize('value', ['256', '-1', '0x100', 'red'])
+def test_set_takes_bytes(value, capsys):
+    with pytest.raises(SystemExit):
+        hid_board.create_parser().parse_args(['--set', '0', value, '0'])
+    assert '--set' in capsys.readouterr().err
+
+
+def test_set():
+    assert hid_board.create_parser().parse_args(['--set', '0xFF', '0', '255']).set == [255, 0, 255]
+
+
+@pytest.mark.parametrize('in_flight', ['0', '-2', 'many'])
+def test_in_flight_must_be_one_or_more(in_flight, capsys):
+    with pytest.raises(SystemExit):
+        hid_board.create_parser().parse_args(['--session', '--in-flight', in_flight])
+    assert '--in-flight' in capsys.readouterr().err
+
+
+def test_in_flight():
+    assert hid_board.create_parser().parse_args(['--session', '--in-flight', '1']).in_flight == 1
+
+
+@pytest.mark.parametrize('argv', [['--all', '--stream'], ['--stream', 'frames.txt', '--all'], ['--all', '--session']])
+def test_all_does_not_stream(argv, capsys):
+    with pytest.raises(SystemExit):
+        hid_board.create_parser().parse_args(argv)
+    assert 'argument --all: not allowed' in capsys.readouterr().err
+
+
+def test_all():
+    assert hid_board.create_parser().parse_args(['--all', '--get']).all
+
+
+def test_pipeline_needs_one_command_in_flight():
+    import hid_fake
+    import hid_pipeline
+    with pytest.raises(ValueError):
+        hid_pipeline.NicPipeline(hid_fake.FakeNicBoard(), max_in_flight=0)
+
+
+@pytest.mark.parametrize('argv', [
+    ['--fps', '0', 'pulse', '0xFF0000'],
+    ['--fps', '-5', 'progress'],
+    ['pulse', '0xFF0000', '--period', '0'],
+    ['pulse', '0xFF0000', '--period', '-1'],
+    ['--duration', '0', 'progress'],
+    ['--duration', '-1', 'progress'],
+    ['--duration', 'nan', 'progress'],
+])
+def test_animation_rates_must_be_positive(argv):
+    import hid_mouse_anim
+    with pytest.raises(SystemExit):
+        hid_mouse_anim.main(argv)
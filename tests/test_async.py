@@ -0,0 +1,64 @@
+import asyncio
+
+import pytest
+
+import hid_fake
+import hid_session
+import hid_transport
+from hid_async import AsyncKeyboard, AsyncMouse
+from hid_glorious import GloriousEffect
+
+
+@pytest.fixture(autouse=True)
+def fake_devices():
+    hid_fake.reset()
+    yield
+    hid_fake.reset()
+
+
+@pytest.fixture
+def sessions(monkeypatch):
+    created = []
+
+    class CountedSession(hid_session.KeyboardSession):
+        def __init__(self, h=None, key=None):
+            super().__init__(h, key)
+            created.append(self)
+    monkeypatch.setattr(hid_session, 'KeyboardSession', CountedSession)
+    return created
+
+
+def test_keyboard_keeps_its_session(sessions):
+    async def run():
+        async with AsyncKeyboard() as keyboard:
+            await keyboard.set_hsv(1, 2, 3)
+            await keyboard.off()
+            return await keyboard.get_hsv(), await keyboard.batch('on', 'get')
+    assert asyncio.run(run()) == ((1, 2, 3), (1, 2, 3))
+    assert len(sessions) == 1
+
+
+def test_keyboard_session_is_made_again_after_an_error(sessions):
+    board = hid_fake.open_path(hid_fake.KEYBOARD_PATH)
+    failures = [hid_transport.DeviceError('unplugged')]
+    write = board.write
+
+    def failing_write(data):
+        if failures:
+            raise failures.pop()
+        return write(data)
+    board.write = failing_write
+
+    async def run():
+        async with AsyncKeyboard() as keyboard:
+            await keyboard.on()
+    asyncio.run(run())
+    assert len(sessions) == 2
+
+
+def test_mouse_modify():
+    async def run():
+        async with AsyncMouse() as mouse:
+            await mouse.modify(lambda record: setattr(record, 'effect', GloriousEffect.OFF))
+            return await mouse.read_record(refresh=True)
+    assert asyncio.run(run()).effect == GloriousEffect.OFF
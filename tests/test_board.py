@@ -0,0 +1,53 @@
+import os
+import threading
+
+import pytest
+
+import hid_board
+import hid_discovery
+import hid_fake
+import hid_transport
+
+
+@pytest.fixture(autouse=True)
+def fake_devices():
+    hid_fake.reset()
+    yield
+    hid_fake.reset()
+
+
+class CountingLock:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entered = 0
+
+    def __enter__(self):
+        self.lock.acquire()
+        self.entered += 1
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.lock.release()
+
+
+def test_broadcast_uses_the_opened_handle(monkeypatch):
+    def open_path(path, name=None):
+        raise hid_transport.DeviceError('opened twice')
+    monkeypatch.setattr(hid_discovery, 'open_path', open_path)
+    board = hid_fake.FakeNicBoard()
+    lock = CountingLock()
+    args = hid_board.create_parser().parse_args(['--all', '--set', '1', '2', '3'])
+
+    results = hid_board.broadcast(args, opened={os.fsdecode(hid_fake.KEYBOARD_PATH): (board, lock)})
+
+    assert [result.error for result in results] == [None]
+    assert lock.entered == 1
+    assert bytes(board.hsv) == b'\x01\x02\x03'
+
+
+def test_broadcast_opens_the_others():
+    args = hid_board.create_parser().parse_args(['--all', '--off'])
+
+    results = hid_board.broadcast(args)
+
+    assert [result.error for result in results] == [None]
+    assert not hid_fake.open_path(hid_fake.KEYBOARD_PATH).enabled
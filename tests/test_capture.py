@@ -0,0 +1,138 @@
+import os
+import struct
+
+import pytest
+
+import hid_board
+import hid_capture
+import hid_discovery
+import hid_fake
+import hid_glorious
+import hid_mouse
+import hid_transport
+
+
+@pytest.fixture(autouse=True)
+def fresh_logs(monkeypatch):
+    hid_fake.reset()
+    monkeypatch.setattr(hid_capture, '_logs', {})
+    monkeypatch.setattr(hid_capture, '_replayed', set())
+    yield
+    for log in hid_capture._logs.values():
+        log.close()
+    hid_fake.reset()
+
+
+def record(log, device, model, writes=(b'NIC\x04',)):
+    recording = hid_capture.RecordingDevice(device, str(log), device.path, model)
+    for data in writes:
+        recording.write(data)
+        recording.read(64, 10)
+    recording.close()
+
+
+def test_records_round_trip(tmp_path):
+    log = tmp_path / 'traffic.cap'
+    record(log, hid_fake.FakeNicBoard(), 'gmmk_pro')
+    records = list(hid_capture.read_log(str(log)))
+    assert [op for op, *_ in records] == [hid_capture.OPEN, hid_capture.WRITE, hid_capture.READ, hid_capture.CLOSE]
+    assert hid_capture.parse_open(records[0][5]) == (hid_fake.KEYBOARD_PATH, 'gmmk_pro')
+    assert records[1][5] == b'NIC\x04'
+    assert records[2][4] == 10 and records[2][5][:4] == b'NIC\x04'
+
+
+def test_sessions_do_not_wrap(tmp_path):
+    log = tmp_path / 'traffic.cap'
+    board = hid_fake.FakeNicBoard()
+    for _ in range(300):
+        record(log, board, 'gmmk_pro', writes=())
+    opens = [session for op, session, *_ in hid_capture.read_log(str(log)) if op == hid_capture.OPEN]
+    assert len(set(opens)) == 300
+
+
+def test_processes_capture_to_the_same_log(tmp_path):
+    log = tmp_path / 'traffic.cap'
+    writes = [b'NIC\x04' + bytes([index]) * 2000 for index in range(20)]
+
+    def capture():
+        record(log, hid_fake.FakeNicBoard(), 'gmmk_pro', writes)
+        os._exit(0)
+    children = []
+    for _ in range(4):
+        pid = os.fork()
+        if pid == 0:
+            capture()
+        children.append(pid)
+    for pid in children:
+        assert os.waitpid(pid, 0)[1] == 0
+
+    by_session = {}
+    for op, session, _, _, _, payload in hid_capture.read_log(str(log)):
+        by_session.setdefault(session, []).append((op, payload))
+    assert len(by_session) == 4
+    for records in by_session.values():
+        assert [payload for op, payload in records if op == hid_capture.WRITE] == writes
+        assert records[-1][0] == hid_capture.CLOSE
+
+
+def test_error_is_recorded_and_replayed(tmp_path):
+    log = tmp_path / 'traffic.cap'
+
+    class Failing(hid_fake.FakeNicBoard):
+        def write(self, data):
+            raise hid_transport.DeviceError('unplugged')
+    recording = hid_capture.RecordingDevice(Failing(), str(log), hid_fake.KEYBOARD_PATH, 'gmmk_pro')
+    with pytest.raises(hid_transport.DeviceError):
+        recording.write(b'NIC\x01')
+    recording.close()
+    replay = hid_capture.ReplayDevice(str(log), speed=0)
+    with pytest.raises(hid_transport.DeviceError, match='unplugged'):
+        replay.write(b'NIC\x01')
+
+
+def test_replay_takes_the_session_of_the_group(tmp_path, monkeypatch):
+    log = tmp_path / 'traffic.cap'
+    monkeypatch.setenv('HID_CAPTURE', str(log))
+    keyboard = hid_board.open_device()
+    hid_board.run_batch(keyboard, [hid_board.HNC_GET], 'fake-keyboard')
+    keyboard.close()
+    with hid_mouse.open_device() as mouse:
+        config = hid_mouse.read_config(mouse)
+    monkeypatch.delenv('HID_CAPTURE')
+    monkeypatch.setenv('HID_REPLAY', str(log))
+    monkeypatch.setenv('HID_REPLAY_SPEED', '0')
+
+    with hid_discovery.open_device('mouse', {'model_O': hid_glorious.model_O_ids}) as mouse:
+        assert hid_mouse.read_config(mouse) == config
+    assert [entry['name'] for entry in hid_discovery.find_all_devices(hid_board.keyboards_hid_ids)] == [
+        next(iter(hid_board.keyboards_hid_ids))]
+
+
+def test_version_1_logs_are_read(tmp_path):
+    log = tmp_path / 'old.cap'
+    v1 = struct.Struct('<BBddiI')
+    log.write_bytes(b'QMKHIDC1' + v1.pack(hid_capture.OPEN, 7, 1.0, 0.0, -1, 5) + b'/dev0'
+                    + v1.pack(hid_capture.WRITE, 7, 1.0, 0.0, -1, 2) + b'\x01\x02')
+    assert hid_capture.sessions(str(log), {'model_O': None}) == [(b'/dev0', None)]
+    replay = hid_capture.ReplayDevice(str(log), speed=0, models={'model_O'})
+    assert replay.write(b'\x01\x02') == 2 and replay.mismatches == 0
+    with pytest.raises(ValueError):
+        record(log, hid_fake.FakeNicBoard(), 'gmmk_pro')
+
+
+def test_version_2_logs_are_read(tmp_path):
+    log = tmp_path / 'v2.cap'
+    v2 = struct.Struct('<BIddiI')
+    payload = hid_capture.open_payload(b'/dev0', 'model_O')
+    log.write_bytes(b'QMKHIDC2' + v2.pack(hid_capture.OPEN, 70000, 1.0, 0.0, -1, len(payload)) + payload
+                    + v2.pack(hid_capture.WRITE, 70000, 1.0, 0.0, -1, 2) + b'\x01\x02')
+    assert hid_capture.sessions(str(log), {'model_O'}) == [(b'/dev0', 'model_O')]
+    replay = hid_capture.ReplayDevice(str(log), speed=0, models={'model_O'})
+    assert replay.write(b'\x01\x02') == 2 and replay.mismatches == 0
+
+
+def test_other_files_are_rejected(tmp_path):
+    log = tmp_path / 'other.cap'
+    log.write_bytes(b'not a log')
+    with pytest.raises(ValueError):
+        list(hid_capture.read_log(str(log)))
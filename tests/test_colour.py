@@ -0,0 +1,61 @@
+import itertools
+import math
+from fractions import Fraction
+
+import pytest
+
+import hid_board
+import hid_colour
+
+
+def reference_hsv(red: int, green: int, blue: int) -> tuple[int, int, int]:
+    """
+    The exact values, rounded half up.
+    """
+    high = max(red, green, blue)
+    delta = high - min(red, green, blue)
+    if delta == 0:
+        return 0, 0, high
+    saturation = math.floor(Fraction(255 * delta, high) + Fraction(1, 2))
+    if high == red:
+        hue = Fraction(43 * (green - blue), delta)
+    elif high == green:
+        hue = 85 + Fraction(43 * (blue - red), delta)
+    else:
+        hue = 171 + Fraction(43 * (red - green), delta)
+    return math.floor(hue + Fraction(1, 2)) & 0xFF, saturation, high
+
+
+@pytest.mark.parametrize('rgb, hsv', [
+    ((0, 0, 0), (0, 0, 0)),
+    ((255, 255, 255), (0, 0, 255)),
+    ((255, 0, 0), (0, 255, 255)),
+    ((0, 255, 0), (85, 255, 255)),
+    ((0, 0, 255), (171, 255, 255)),
+    ((255, 0, 1), (0, 255, 255)),
+    ((255, 0, 10), (254, 255, 255)),
+])
+def test_known_colours(rgb, hsv):
+    assert hid_colour.rgb_to_hsv(*rgb) == hsv
+
+
+def test_matches_the_exact_rounding():
+    values = range(0, 256, 15)
+    for rgb in itertools.product(values, repeat=3):
+        assert hid_colour.rgb_to_hsv(*rgb) == reference_hsv(*rgb), rgb
+
+
+def test_batch_api_matches_the_single_conversion():
+    rgbs = [0xFF0000, 0x123456, 0xFF0000, 0x00FF80]
+    frames = hid_colour.hsv_frames(rgbs)
+    assert frames == b''.join(hid_colour.hsv_bytes(rgb) for rgb in rgbs)
+    reports = hid_colour.set_reports(rgbs)
+    assert len(reports) == len(rgbs) * hid_colour.REPORT_SIZE
+    for index, rgb in enumerate(rgbs):
+        report = bytes(reports[index * hid_colour.REPORT_SIZE:(index + 1) * hid_colour.REPORT_SIZE])
+        assert report == hid_board.pad_report(b'NIC' + hid_board.HNC_SET + hid_board.rgb_to_hsv(rgb))
+
+
+def test_empty_batch():
+    assert hid_colour.hsv_frames([]) == b''
+    assert hid_colour.set_reports([]) == bytearray()
@@ -0,0 +1,94 @@
+import json
+import socket
+import tempfile
+import threading
+import time
+
+import pytest
+
+import hid_client
+import hid_daemon
+import hid_fake
+from hid_glorious import GloriousEffect, GloriousModelORecord
+
+
+@pytest.fixture
+def daemon():
+    hid_fake.reset()
+    # Short, the Unix socket paths are limited to 108 bytes
+    with tempfile.TemporaryDirectory() as directory:
+        server = hid_daemon.LedDaemon(f'{directory}/qmk_tools.sock')
+        thread = threading.Thread(target=server.serve_forever, args=(0.01,), daemon=True)
+        thread.start()
+        yield server
+        server.shutdown()
+        server.server_close()
+        thread.join()
+    hid_fake.reset()
+
+
+def send(server, target: str, argv: list[str], **options) -> list[str]:
+    return hid_client.send(target, argv, server.server_address, **options)
+
+
+def wait_for(condition, timeout: float = 2.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.005)
+    return False
+
+
+def test_board_round_trip(daemon):
+    assert send(daemon, 'board', ['--set', '1', '2', '3']) == []
+    assert send(daemon, 'board', ['--get']) == ['HSV : 01 02 03']
+    assert bytes(hid_fake.open_path(hid_fake.KEYBOARD_PATH).hsv) == b'\x01\x02\x03'
+
+
+def test_mouse_round_trip(daemon):
+    assert send(daemon, 'mouse', ['single', '0xFF0000', '4']) == []
+    record = GloriousModelORecord(bytes(hid_fake.open_path(hid_fake.MOUSE_PATH).config))
+    assert (record.effect, record.single_rgb) == (GloriousEffect.SINGLE_COLOUR, 0xFF0000)
+
+
+def test_keeps_the_device_open(daemon):
+    send(daemon, 'board', ['--on'])
+    board = daemon.handles['board'].open()
+    send(daemon, 'board', ['--off'])
+    assert daemon.handles['board'].open() is board and not board.enabled
+
+
+def test_invalid_arguments_get_the_usage(daemon):
+    lines = send(daemon, 'board', ['--set', '1'])
+    assert lines and lines[0].startswith('usage: hid_client.py board')
+
+
+def test_bad_request(daemon):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+        s.connect(daemon.server_address)
+        s.sendall(b'{"target": "lamp", "argv": []}\n')
+        with s.makefile('rb') as reply:
+            output = json.loads(reply.readline())['output']
+    assert output[0].startswith('Error: bad request')
+
+
+def test_notification_expires_to_the_base_state(daemon):
+    board = hid_fake.open_path(hid_fake.KEYBOARD_PATH)
+    assert send(daemon, 'board', ['--set', '1', '2', '3']) == []
+    assert send(daemon, 'board', ['--set', '0', '255', '255'], priority=5, ttl=0.2) == []
+    assert wait_for(lambda: bytes(board.hsv) == b'\x00\xff\xff')
+    assert wait_for(lambda: bytes(board.hsv) == b'\x01\x02\x03')
+
+
+def test_client_main(daemon, monkeypatch, capsys):
+    monkeypatch.setenv('QMK_TOOLS_SOCKET', daemon.server_address)
+    hid_client.main(['board', '--set', '4', '5', '6'])
+    hid_client.main(['board', '--get'])
+    assert capsys.readouterr().out == 'HSV : 04 05 06\n'
+
+
+def test_client_without_daemon(tmp_path, monkeypatch, capsys):
+    monkeypatch.setenv('QMK_TOOLS_SOCKET', str(tmp_path / 'none.sock'))
+    hid_client.main(['board', '--on'])
+    assert capsys.readouterr().out.startswith('Error: daemon not reachable')
@@ -0,0 +1,70 @@
+import os
+import sys
+
+import pytest
+
+import hid_board
+import hid_discovery
+import hid_fake
+import hid_registry
+from hid_glorious import model_O_ids
+
+KEYBOARD_NAME = next(iter(hid_board.keyboards_hid_ids))
+KEYBOARD_IDS = hid_board.keyboards_hid_ids[KEYBOARD_NAME]
+
+
+@pytest.fixture(autouse=True)
+def fake_devices():
+    hid_fake.reset()
+    yield
+    hid_fake.reset()
+
+
+def cache_keyboard(path: bytes, serial: str | None = None) -> None:
+    with hid_discovery.updating_cache() as cache:
+        cache['keyboard'] = {'name': KEYBOARD_NAME, 'path': os.fsdecode(path), 'serial': serial}
+
+
+def test_cached_path_of_another_device_is_enumerated_again():
+    # The keyboard path now has the mouse
+    cache_keyboard(hid_fake.MOUSE_PATH)
+    with hid_discovery.open_device('keyboard', hid_board.keyboards_hid_ids):
+        pass
+    assert hid_discovery.cached_entry('keyboard')['path'] == os.fsdecode(hid_fake.KEYBOARD_PATH)
+
+
+def test_cached_path_with_another_serial_does_not_match():
+    assert hid_discovery.cached_path_matches(
+        {'path': os.fsdecode(hid_fake.KEYBOARD_PATH), 'serial': 'fake-keyboard'}, KEYBOARD_IDS)
+    assert not hid_discovery.cached_path_matches(
+        {'path': os.fsdecode(hid_fake.KEYBOARD_PATH), 'serial': 'another'}, KEYBOARD_IDS)
+    assert not hid_discovery.cached_path_matches({'path': 'fake:gone', 'serial': None}, KEYBOARD_IDS)
+
+
+def write_node(sysfs, node: str, hid_id: str, serial: str) -> None:
+    device = sysfs / node / 'device'
+    device.mkdir(parents=True)
+    (device / 'uevent').write_text(f'HID_ID={hid_id}\nHID_NAME=test\nHID_UNIQ={serial}\n')
+    # Usage Page 0xFF00, Usage 1, Collection, End Collection
+    (device / 'report_descriptor').write_bytes(bytes.fromhex('06 00 ff 09 01 a1 01 c0'))
+
+
+def test_hidraw_identity_from_sysfs(tmp_path, monkeypatch):
+    monkeypatch.delenv('HID_TRANSPORT')
+    monkeypatch.setattr(hid_registry, 'SYSFS_HIDRAW', str(tmp_path))
+    write_node(tmp_path, 'hidraw3', f'0003:{model_O_ids.vid:08X}:{model_O_ids.pid:08X}', 'abc')
+    write_node(tmp_path, 'hidraw4', '0003:00001234:00005678', 'abc')
+    assert hid_discovery.cached_path_matches({'path': '/dev/hidraw3', 'serial': 'abc'}, model_O_ids)
+    assert not hid_discovery.cached_path_matches({'path': '/dev/hidraw3', 'serial': 'def'}, model_O_ids)
+    assert not hid_discovery.cached_path_matches({'path': '/dev/hidraw4', 'serial': 'abc'}, model_O_ids)
+    assert not hid_discovery.cached_path_matches({'path': '/dev/hidraw5', 'serial': None}, model_O_ids)
+    # Not checkable, the open tells
+    assert hid_discovery.cached_path_matches({'path': 'IOService:/some/path', 'serial': None}, model_O_ids)
+
+
+def test_hidraw_transport_enumerates_sysfs(tmp_path, monkeypatch):
+    monkeypatch.setitem(sys.modules, 'hid', None)
+    monkeypatch.setenv('HID_TRANSPORT', 'hidraw')
+    monkeypatch.setattr(hid_registry, 'SYSFS_HIDRAW', str(tmp_path))
+    write_node(tmp_path, 'hidraw3', f'0003:{model_O_ids.vid:08X}:{model_O_ids.pid:08X}', 'abc')
+    assert hid_discovery.find_device('mouse', {'model_O': model_O_ids})['path'] == '/dev/hidraw3'
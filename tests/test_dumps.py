@@ -0,0 +1,73 @@
+import io
+
+import hid_dumps
+import hid_fake
+import hid_snapshot
+from hid_glorious import EffectDirection, GloriousModelORecord
+
+
+def dump_lines(config: bytes) -> list[str]:
+    return [config[index:index + 16].hex(' ') + '\n' for index in range(0, len(config), 16)]
+
+
+def with_direction(value: int) -> bytes:
+    config = bytearray(hid_fake.MODEL_O_CONFIG)
+    config[GloriousModelORecord.glorious_direction.offset] = value
+    return bytes(config)
+
+
+def test_reader_splits_the_dumps():
+    lines = dump_lines(hid_fake.MODEL_O_CONFIG) + ['\n'] + dump_lines(hid_fake.MODEL_O_CONFIG)[:3] + ['junk\n']
+    reader = hid_dumps.DumpReader()
+    dumps = [(source, line, bytes(dump)) for source, line, dump in reader.read('test', lines)]
+    assert dumps == [('test', 1, hid_fake.MODEL_O_CONFIG)]
+    assert reader.truncated == 1
+    assert reader.invalid_lines == 1
+
+
+def test_reader_takes_a_dump_on_one_line():
+    reader = hid_dumps.DumpReader()
+    dumps = list(reader.read('test', [hid_fake.MODEL_O_CONFIG.hex()]))
+    assert len(dumps) == 1 and reader.truncated == 0
+
+
+def test_decode_row():
+    row = hid_dumps.decode_row(memoryview(hid_fake.MODEL_O_CONFIG))
+    assert row['effect'] == 'GLORIOUS'
+    assert row['glorious_direction'] == 'FINGERS_TO_PALM'
+    assert row['header'] == hid_fake.MODEL_O_CONFIG[:hid_dumps.HEADER_SIZE].hex(' ')
+
+
+def test_out_of_range_enum_is_kept_as_a_number():
+    record = GloriousModelORecord(with_direction(0x37))
+    assert record.glorious_direction == 0x37
+    assert 'Glorious(0x37,' in str(record)
+    assert hid_dumps.decode_row(memoryview(record.view))['glorious_direction'] == 0x37
+    assert GloriousModelORecord(with_direction(1)).glorious_direction is EffectDirection.PALM_TO_FINGERS
+
+
+def test_summary_counts_the_out_of_range_values():
+    lines = dump_lines(with_direction(0x37)) + dump_lines(hid_fake.MODEL_O_CONFIG)
+    reader = hid_dumps.DumpReader()
+    summary = hid_dumps.Summary()
+    for _, _, dump in reader.read('test', lines):
+        summary.add(dump)
+    assert summary.dumps == 2
+    assert summary.anomalies == {'glorious_direction 37': 1}
+
+
+def test_main_prints_the_anomalies(monkeypatch, capsys):
+    config = bytearray(with_direction(0x37))
+    config[GloriousModelORecord.effect.offset] = 0x42
+    monkeypatch.setattr('sys.stdin', io.StringIO(''.join(dump_lines(bytes(config)))))
+    hid_dumps.main(['--format', 'jsonl'])
+    out, err = capsys.readouterr()
+    assert '"effect": 66' in out
+    assert 'effect 42' in err and 'glorious_direction 37' in err
+
+
+def test_snapshot_of_an_out_of_range_direction():
+    hid_snapshot.publish_mouse(with_direction(0x37))
+    snapshot = hid_snapshot.read(hid_snapshot.SNAPSHOT_PATH)
+    assert snapshot.mouse_fields()['glorious_direction'] == 0x37
+    assert snapshot.to_dict()['mouse']['fields']['glorious_direction'] == 0x37
@@ -0,0 +1,62 @@
+import os
+
+import pytest
+
+import bench_suite
+import hid_board
+import hid_discovery
+import hid_fake
+import hid_glorious
+import hid_transport
+from hid_session import KeyboardSession, MouseSession
+
+
+@pytest.fixture(autouse=True)
+def fake_devices():
+    hid_fake.reset()
+    yield
+    hid_fake.reset()
+
+
+def test_unknown_path_raises_a_device_error():
+    with pytest.raises(hid_transport.DeviceError):
+        hid_fake.open_path(b'fake:nothing')
+    assert hid_transport.device_error() is hid_transport.DeviceError
+
+
+def test_stale_cached_path_falls_back_to_enumerate():
+    name = next(iter(hid_board.keyboards_hid_ids))
+    with hid_discovery.updating_cache() as cache:
+        cache['keyboard'] = {'name': name, 'path': 'fake:unplugged'}
+    h = hid_discovery.open_device('keyboard', hid_board.keyboards_hid_ids)
+    assert h is not None
+    h.close()
+    assert hid_discovery.cached_entry('keyboard')['path'] == os.fsdecode(hid_fake.KEYBOARD_PATH)
+
+
+def test_keyboard_session_on_the_fake_board():
+    board = hid_fake.FakeNicBoard()
+    with KeyboardSession(board, 'fake') as session:
+        session.set_hsv(1, 2, 3)
+        assert session.get_hsv() == (1, 2, 3)
+        session.off()
+    assert not board.enabled
+
+
+def test_mouse_session_on_the_fake_model_o():
+    mouse = hid_fake.FakeModelO()
+    with MouseSession(mouse, 'fake') as session:
+        assert session.set(effect=hid_glorious.GloriousEffect.CONSTANT_RGB)
+        assert not session.set(effect=hid_glorious.GloriousEffect.CONSTANT_RGB)
+    assert mouse.writes == 1
+    assert hid_glorious.GloriousModelORecord(bytes(mouse.config)).effect == hid_glorious.GloriousEffect.CONSTANT_RGB
+
+
+def test_fake_environment_is_restored(tmp_path, monkeypatch):
+    monkeypatch.delenv('HID_FAKE_LATENCY', raising=False)
+    monkeypatch.setenv('XDG_CACHE_HOME', '/somewhere')
+    with bench_suite.fake_environment(str(tmp_path), 2.0):
+        assert os.environ['HID_FAKE_LATENCY'] == '2.0'
+        assert os.environ['XDG_CACHE_HOME'] == os.path.join(str(tmp_path), 'cache')
+    assert 'HID_FAKE_LATENCY' not in os.environ
+    assert os.environ['XDG_CACHE_HOME'] == '/somewhere'
@@ -0,0 +1,109 @@
+import pytest
+
+import hid_fake
+import hid_mouse
+from hid_glorious import (
+    MARKER_OFFSET, WRITE_MARKER, EffectDirection, GloriousEffect, GloriousModelORecord, rbg_to_rgbs, rgbs_to_rbg,
+)
+
+
+@pytest.fixture
+def record():
+    return GloriousModelORecord(hid_fake.MODEL_O_CONFIG)
+
+
+def test_decode(record):
+    fields = record.decode()
+    assert fields['effect'] == GloriousEffect.GLORIOUS
+    assert fields['glorious_direction'] is EffectDirection.FINGERS_TO_PALM
+    assert fields == {name: getattr(record, name) for name in GloriousModelORecord.fields()}
+
+
+def test_set_marks_the_record_written(record):
+    record.single_rgb = 0x123456
+    record.single_rgb_brightness = 3
+    assert record.single_rgb == 0x123456
+    assert record.single_rgb_brightness == 3
+    assert record.view[MARKER_OFFSET] == WRITE_MARKER
+
+
+def test_over_writes_in_place():
+    buffer = bytearray(hid_fake.MODEL_O_CONFIG)
+    GloriousModelORecord.over(buffer).effect = GloriousEffect.OFF
+    assert buffer[GloriousModelORecord.effect.offset] == GloriousEffect.OFF
+
+
+def test_brightness_keeps_the_speed_nibble(record):
+    record.tail_speed = 2
+    record.tail_brightness = 4
+    assert (record.tail_brightness, record.tail_speed) == (4, 2)
+
+
+def test_breath_rgbs_count(record):
+    record.breath_rgbs = [0x010203, 0x040506]
+    assert record.breath_rgbs == [0x010203, 0x040506]
+    assert record.view[0x3D] == 2
+
+
+@pytest.mark.parametrize('name, value', [
+    ('effect', 11),
+    ('effect', -1),
+    ('glorious_direction', 2),
+    ('glorious_speed', 0),
+    ('glorious_speed', 5),
+    ('rave_speed', 4),
+    ('tail_brightness', 5),
+    ('single_rgb', 0x1000000),
+    ('single_rgb', -1),
+    ('constant_rgbs', [0] * 5),
+    ('constant_rgbs', [0] * 5 + [0x1000000]),
+    ('breath_rgbs', []),
+    ('breath_rgbs', [0] * 8),
+])
+def test_out_of_range_values_raise(record, name, value):
+    before = bytes(record.view)
+    with pytest.raises(ValueError):
+        setattr(record, name, value)
+    assert bytes(record.view) == before
+
+
+def test_rgb_argument_out_of_range():
+    with pytest.raises(SystemExit):
+        hid_mouse.parse_args(['single', '0x1000000'])
+
+
+def test_rbg_codec_round_trip():
+    rgbs = [0x000000, 0xFFFFFF, 0x123456, 0xFF0080]
+    packed = rgbs_to_rbg(rgbs)
+    assert bytes(packed[6:9]) == bytes([0x12, 0x56, 0x34])
+    assert rbg_to_rgbs(packed) == rgbs
+    target = bytearray(16)
+    assert rgbs_to_rbg(rgbs[:2], target, 4) is target
+    assert rbg_to_rgbs(target, 4, 2) == rgbs[:2]
+
+
+def test_rbg_codec_sizes():
+    with pytest.raises(ValueError):
+        rgbs_to_rbg([1, 2], bytearray(5))
+    with pytest.raises(ValueError):
+        rbg_to_rgbs(bytes(5), 0, 2)
+
+
+def test_rbg_codec_matches_the_single_triplets():
+    rgbs = [(index * 0x010305) & 0xFFFFFF for index in range(100)]
+    packed = rgbs_to_rbg(rgbs)
+    for index, rgb in enumerate(rgbs):
+        assert list(packed[3 * index:3 * index + 3]) == [rgb >> 16, rgb & 0xFF, rgb >> 8 & 0xFF]
+
+
+def test_animation_restores_an_unknown_effect(monkeypatch):
+    import hid_mouse_anim
+    config = bytearray(hid_fake.MODEL_O_CONFIG)
+    config[GloriousModelORecord.effect.offset] = 0x42
+    hid_fake.reset()
+    mouse = hid_fake.open_path(hid_fake.MOUSE_PATH)
+    mouse.config[:] = config
+    hid_mouse_anim.main(['--duration', '0.05', '--restore', 'pulse', '0xFF0000'])
+    assert mouse.writes > 1
+    assert bytes(mouse.config) == bytes(config)
+    hid_fake.reset()
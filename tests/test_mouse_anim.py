@@ -0,0 +1,48 @@
+import io
+
+import pytest
+
+import hid_fake
+import hid_mouse_anim
+from hid_glorious import GloriousEffect, GloriousModelORecord
+
+
+@pytest.fixture
+def mouse():
+    hid_fake.reset()
+    yield hid_fake.open_path(hid_fake.MOUSE_PATH)
+    hid_fake.reset()
+
+
+def test_progress_shows_the_last_value(mouse, monkeypatch, capsys):
+    monkeypatch.setattr('sys.stdin', io.StringIO('10\n50\n100\n'))
+    hid_mouse_anim.main(['--duration', '1', 'progress'])
+    record = GloriousModelORecord(bytes(mouse.config))
+    assert record.effect == GloriousEffect.CONSTANT_RGB
+    assert list(record.constant_rgbs) == [0x00FF00] * hid_mouse_anim.LEDS
+    assert not capsys.readouterr().out.startswith('0 frames written')
+
+
+class Countdown:
+    """
+    done once frames frames were rendered.
+    """
+    def __init__(self, frames: int):
+        self.frames = frames
+        self.rendered = []
+        self.done = False
+
+    def __call__(self, elapsed: float) -> list[int]:
+        self.rendered.append(elapsed)
+        self.done = len(self.rendered) >= self.frames
+        return [len(self.rendered)] * hid_mouse_anim.LEDS
+
+
+def test_animator_renders_once_more_after_done(mouse):
+    from hid_session import MouseSession
+    with MouseSession(mouse, 'fake') as session:
+        render = Countdown(3)
+        stats = hid_mouse_anim.Animator(session, fps=200).run(render, duration=5)
+        assert len(render.rendered) == 4
+        assert stats.written == 4
+        assert list(GloriousModelORecord(session.config).constant_rgbs) == [4] * hid_mouse_anim.LEDS
@@ -0,0 +1,91 @@
+import threading
+import time
+
+import pytest
+
+import hid_fake
+import hid_pipeline
+import hid_transport
+from hid_board import HNC_GET, HNC_OFF, HNC_SET, pad_report
+
+
+class HeldBoard(hid_fake.FakeNicBoard):
+    """
+    Keeps its replies until released, counting the writes.
+    """
+    def __init__(self):
+        super().__init__()
+        self.released = threading.Event()
+        self.written = 0
+
+    def write(self, data) -> int:
+        self.written += 1
+        return super().write(data)
+
+    def read(self, size: int, timeout: int | None = None) -> bytes:
+        if not self.released.is_set():
+            time.sleep(timeout / 1000)
+            return b''
+        return super().read(size, timeout)
+
+
+def test_replies_complete_their_commands_in_order():
+    board = hid_fake.FakeNicBoard()
+    with hid_pipeline.NicPipeline(board) as pipeline:
+        futures = [pipeline.off(), pipeline.set_hsv(1, 2, 3), pipeline.submit(pad_report(b'NIC' + HNC_GET))]
+        replies = [future.result(1) for future in futures]
+        assert [reply[3:4] for reply in replies] == [HNC_OFF, HNC_SET, HNC_GET]
+        assert pipeline.get_hsv() == (1, 2, 3)
+    assert not board.enabled
+
+
+def test_in_flight_limit_blocks_the_writes():
+    board = HeldBoard()
+    with hid_pipeline.NicPipeline(board, max_in_flight=2, reply_timeout=5) as pipeline:
+        pipeline.on()
+        pipeline.off()
+        third = threading.Thread(target=pipeline.on)
+        third.start()
+        time.sleep(0.1)
+        assert board.written == 2 and third.is_alive()
+        board.released.set()
+        third.join(1)
+        assert not third.is_alive() and board.written == 3
+
+
+def test_missing_reply_times_out():
+    board = HeldBoard()
+    with hid_pipeline.NicPipeline(board, reply_timeout=0.05) as pipeline:
+        future = pipeline.on()
+        with pytest.raises(TimeoutError):
+            future.result(1)
+        assert pipeline.timeouts == 1
+
+
+def test_read_error_fails_the_pending_and_next_commands():
+    class Unplugged(HeldBoard):
+        def read(self, size, timeout=None):
+            if self.released.is_set():
+                raise hid_transport.DeviceError('unplugged')
+            return super().read(size, timeout)
+
+    board = Unplugged()
+    pipeline = hid_pipeline.NicPipeline(board, reply_timeout=5)
+    future = pipeline.on()
+    board.released.set()
+    with pytest.raises(hid_transport.DeviceError, match='unplugged'):
+        future.result(1)
+    with pytest.raises(hid_transport.DeviceError, match='unplugged'):
+        pipeline.off()
+    pipeline.close()
+
+
+def test_write_error_releases_its_slot():
+    class ReadOnly(hid_fake.FakeNicBoard):
+        def write(self, data):
+            raise hid_transport.DeviceError('read only')
+
+    with hid_pipeline.NicPipeline(ReadOnly(), max_in_flight=1) as pipeline:
+        for _ in range(2):
+            with pytest.raises(hid_transport.DeviceError):
+                pipeline.on()
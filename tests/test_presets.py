@@ -0,0 +1,80 @@
+import os
+import time
+
+import hid_fake
+import hid_presets
+import hid_shadow
+from hid_glorious import GloriousEffect, GloriousModelORecord
+
+KEY = 'fake-model_O'
+PRESETS = {'alert': ['single', '0xFF0000', '4'], 'off': ['off']}
+
+
+def test_apply_sends_the_preset():
+    mouse = hid_fake.FakeModelO()
+    assert hid_presets.apply_preset(mouse, KEY, PRESETS, 'alert') == []
+    record = GloriousModelORecord(bytes(mouse.config))
+    assert (record.effect, record.single_rgb, record.single_rgb_brightness) == (GloriousEffect.SINGLE_COLOUR,
+                                                                                0xFF0000, 4)
+    assert hid_presets.apply_preset(mouse, KEY, PRESETS, 'nothing') == ['Error: unknown preset nothing']
+
+
+def counting_reads(mouse) -> list[int]:
+    reads = []
+    get_feature_report = mouse.get_feature_report
+    mouse.get_feature_report = lambda report_id, size: reads.append(report_id) or get_feature_report(report_id,
+                                                                                                      size)
+    return reads
+
+
+def change_mouse(mouse) -> bytes:
+    """
+    Changed by something else, returns the new configuration.
+    """
+    mouse.config[0x68] ^= 0xFF
+    return bytes(mouse.config)
+
+
+def test_apply_with_an_old_shadow_checks_the_bank():
+    mouse = hid_fake.FakeModelO()
+    hid_presets.compile_bank(mouse, KEY, PRESETS).close()
+    changed = change_mouse(mouse)
+    hid_shadow.store(KEY, changed)
+    old = time.time() - 2 * hid_shadow.MAX_AGE
+    os.utime(hid_shadow._shadow_path(KEY), (old, old))
+
+    hid_presets.apply_preset(mouse, KEY, PRESETS, 'off')
+
+    assert mouse.config[0x68] == changed[0x68]
+    assert GloriousModelORecord(bytes(mouse.config)).effect == GloriousEffect.OFF
+    assert hid_shadow.same_config(hid_shadow.load(KEY), mouse.config)
+
+
+def test_apply_with_refresh_reads_the_mouse():
+    mouse = hid_fake.FakeModelO()
+    hid_presets.compile_bank(mouse, KEY, PRESETS).close()
+    hid_shadow.discard(KEY)
+    changed = change_mouse(mouse)
+
+    hid_presets.apply_preset(mouse, KEY, PRESETS, 'off', refresh=True)
+
+    assert mouse.config[0x68] == changed[0x68]
+
+
+def test_apply_with_shadow_does_not_read():
+    mouse = hid_fake.FakeModelO()
+    hid_presets.compile_bank(mouse, KEY, PRESETS).close()
+    reads = counting_reads(mouse)
+    hid_presets.apply_preset(mouse, KEY, PRESETS, 'off')
+    assert mouse.writes == 1 and reads == []
+    assert GloriousModelORecord(bytes(mouse.config)).effect == GloriousEffect.OFF
+
+
+def test_apply_without_shadow_sends_the_bank_as_is():
+    mouse = hid_fake.FakeModelO()
+    hid_presets.compile_bank(mouse, KEY, PRESETS).close()
+    hid_shadow.discard(KEY)
+    reads = counting_reads(mouse)
+    hid_presets.apply_preset(mouse, KEY, PRESETS, 'alert')
+    assert mouse.writes == 1 and reads == []
+    assert hid_shadow.same_config(hid_shadow.load(KEY), mouse.config)
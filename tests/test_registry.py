@@ -0,0 +1,60 @@
+import socket
+import struct
+
+import pytest
+
+import hid_registry
+
+PROPERTIES = b'ACTION=add\0DEVPATH=/devices/hidraw/hidraw3\0SUBSYSTEM=hidraw\0DEVNAME=/dev/hidraw3\0'
+EXPECTED = {'ACTION': 'add', 'DEVPATH': '/devices/hidraw/hidraw3', 'SUBSYSTEM': 'hidraw', 'DEVNAME': '/dev/hidraw3'}
+
+
+def udev_message(properties: bytes, magic: int = hid_registry.UDEV_MONITOR_MAGIC) -> bytes:
+    # struct udev_monitor_netlink_header, the filter hashes zeroed
+    header_size = 40
+    header = b'libudev\0' + struct.pack('>I', magic) + struct.pack(
+        '=IIIIIII', header_size, header_size, len(properties), 0, 0, 0, 0)
+    return header + properties
+
+
+def test_kernel_uevent():
+    assert hid_registry.parse_uevent(b'add@/devices/hidraw/hidraw3\0' + PROPERTIES) == EXPECTED
+
+
+def test_udev_uevent():
+    assert hid_registry.parse_uevent(udev_message(PROPERTIES)) == EXPECTED
+
+
+def test_udev_uevent_with_another_magic_is_ignored():
+    assert hid_registry.parse_uevent(udev_message(PROPERTIES, magic=0x12345678)) == {}
+    assert hid_registry.parse_uevent(b'libudev\0\xfe\xed') == {}
+
+
+def credentials(pid: int, uid: int) -> list:
+    return [(socket.SOL_SOCKET, socket.SCM_CREDENTIALS, struct.pack('=iII', pid, uid, uid))]
+
+
+@pytest.mark.parametrize('address, ancdata, trusted', [
+    ((0, hid_registry.KERNEL_GROUP), credentials(0, 0), True),
+    ((412, hid_registry.UDEV_GROUP), credentials(412, 0), True),
+    ((412, hid_registry.KERNEL_GROUP), credentials(412, 0), False),
+    ((412, hid_registry.UDEV_GROUP), credentials(412, 1000), False),
+    ((0, hid_registry.KERNEL_GROUP), [], False),
+])
+def test_trusted_sender(address, ancdata, trusted):
+    assert hid_registry.trusted_sender(address, ancdata) is trusted
+
+
+def test_report_descriptor_top_level_collections():
+    descriptor = bytes.fromhex(
+        '05 01 09 06 a1 01'  # Generic Desktop, Keyboard, Collection
+        ' 05 07 a1 00 81 02 c0'  # nested collection, Input, End Collection
+        ' c0'
+        ' 06 60 ff 09 61 a1 01 c0'  # Usage Page 0xFF60, Usage 0x61 (QMK raw HID)
+        ' 0b 02 00 0c 00 a1 01 c0')  # 4 bytes Usage with its page: Consumer Control
+    assert hid_registry.parse_report_descriptor(descriptor) == [(0x01, 0x06), (0xFF60, 0x61), (0x0C, 0x02)]
+
+
+def test_report_descriptor_skips_long_items():
+    descriptor = bytes.fromhex('fe 02 10 aa bb 06 00 ff 09 01 a1 01 c0')
+    assert hid_registry.parse_report_descriptor(descriptor) == [(0xFF00, 0x01)]
@@ -0,0 +1,22 @@
+import hid_fake
+import hid_scene
+
+
+def test_scene_applies_both_devices():
+    hid_fake.reset()
+    results = hid_scene.apply_scene({'board': ['--set', '1', '2', '3'], 'mouse': ['single', '0xFF0000']}, 5.0)
+    assert [(result.target, result.ok) for result in results] == [('board', True), ('mouse', True)]
+    assert bytes(hid_fake.open_path(hid_fake.KEYBOARD_PATH).hsv) == b'\x01\x02\x03'
+
+
+def test_missing_device_is_a_failure(monkeypatch, capsys):
+    monkeypatch.setattr(hid_scene.hid_board, 'open_device', lambda: None)
+    results = hid_scene.apply_scene({'board': ['--on']}, 5.0)
+    assert results[0].in_time and not results[0].ok
+    assert results[0].error == 'Device not present'
+    assert hid_scene.format_results(results, 5.0) == ['board: Error: Device not present']
+
+
+def test_tools_print_the_missing_device(monkeypatch):
+    monkeypatch.setattr(hid_scene.hid_board, 'open_device', lambda: None)
+    assert hid_scene.hid_board._run(hid_scene.hid_board.create_parser().parse_args(['--on'])) == ['Device not present']
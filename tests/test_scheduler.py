@@ -0,0 +1,118 @@
+import threading
+import time
+
+import pytest
+
+import hid_daemon
+import hid_scheduler
+
+
+class Recorder:
+    def __init__(self):
+        self.applied = []
+        self.event = threading.Event()
+
+    def __call__(self, device, state):
+        self.applied.append((device, state))
+        self.event.set()
+
+    def wait_for(self, state, timeout=2.0):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.applied and self.applied[-1][1] == state:
+                return True
+            time.sleep(0.005)
+        return False
+
+
+@pytest.fixture
+def scheduler():
+    recorder = Recorder()
+    scheduler = hid_scheduler.NotificationScheduler(recorder, default_interval=0.0)
+    scheduler.recorder = recorder
+    yield scheduler
+    scheduler.close()
+
+
+def test_expired_notification_restores_the_base(scheduler):
+    assert scheduler.set_base('board', 'colour', ('--set', '1', '2', '3'))
+    scheduler.submit('board', 'colour', ('--set', '9', '9', '9'), priority=5, ttl=0.05)
+    assert scheduler.recorder.wait_for(('--set', '9', '9', '9'))
+    assert scheduler.recorder.wait_for(('--set', '1', '2', '3'))
+
+
+def test_base_set_during_a_notification_is_deferred(scheduler):
+    scheduler.set_base('board', 'colour', ('--set', '1', '2', '3'))
+    scheduler.submit('board', 'colour', ('--set', '9', '9', '9'), priority=5, ttl=0.1)
+    assert scheduler.recorder.wait_for(('--set', '9', '9', '9'))
+    assert not scheduler.set_base('board', 'colour', ('--set', '4', '4', '4'))
+    assert scheduler.recorder.wait_for(('--set', '4', '4', '4'))
+    assert ('board', ('--set', '1', '2', '3')) not in scheduler.recorder.applied
+
+
+def test_base_without_notification_is_applied_by_the_caller(scheduler):
+    assert scheduler.needs_base('board', 'colour')
+    assert scheduler.set_base('board', 'colour', ('--off',))
+    assert not scheduler.needs_base('board', 'colour')
+    time.sleep(0.05)
+    assert scheduler.recorder.applied == []
+
+
+def test_highest_priority_wins(scheduler):
+    scheduler.submit('mouse', 'effect', ('single', '0xFF0000'), priority=9, ttl=0.2)
+    scheduler.submit('mouse', 'effect', ('single', '0x00FF00'), priority=1)
+    assert scheduler.recorder.wait_for(('single', '0xFF0000'))
+    assert scheduler.recorder.wait_for(('single', '0x00FF00'))
+
+
+@pytest.mark.parametrize('request_fields', [
+    {'priority': 'high'},
+    {'priority': 1.5},
+    {'priority': True},
+    {'ttl': 0},
+    {'ttl': -1},
+    {'ttl': 'soon'},
+    {'ttl': float('nan')},
+])
+def test_daemon_rejects_invalid_scheduling(request_fields):
+    with pytest.raises(ValueError):
+        hid_daemon.scheduling({'target': 'board', 'argv': ['--on'], **request_fields})
+
+
+def test_daemon_scheduling_defaults():
+    assert hid_daemon.scheduling({'priority': 3, 'ttl': 2}) == (3, 2)
+    assert hid_daemon.scheduling({}) == (None, None)
+
+
+def test_burst_is_coalesced_into_a_few_writes():
+    recorder = Recorder()
+    scheduler = hid_scheduler.NotificationScheduler(recorder, default_interval=0.05)
+    try:
+        for index in range(500):
+            scheduler.submit('board', 'colour', ('--set', str(index), '255', '255'), priority=1)
+        assert recorder.wait_for(('--set', '499', '255', '255'))
+        submitted, writes = scheduler.stats()['board']
+        assert submitted == 500
+        assert writes <= 3 and len(recorder.applied) == writes
+    finally:
+        scheduler.close()
+
+
+def test_priorities_order_the_states_shown():
+    recorder = Recorder()
+    scheduler = hid_scheduler.NotificationScheduler(recorder, default_interval=0.1)
+    try:
+        # The next write is then at least 100 ms away, the three are seen together
+        scheduler.submit('mouse', 'effect', ('start',), priority=0)
+        assert recorder.wait_for(('start',))
+        scheduler.submit('mouse', 'effect', ('low', 'first'), priority=1)
+        scheduler.submit('mouse', 'effect', ('high',), priority=9, ttl=0.3)
+        scheduler.submit('mouse', 'effect', ('low', 'second'), priority=1)
+        assert recorder.wait_for(('high',))
+        time.sleep(0.1)
+        # The lower priority ones aren't shown over it
+        assert recorder.applied[-1] == ('mouse', ('high',))
+        assert recorder.wait_for(('low', 'second'))
+        assert [state for _, state in recorder.applied] == [('start',), ('high',), ('low', 'second')]
+    finally:
+        scheduler.close()
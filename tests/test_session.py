@@ -0,0 +1,102 @@
+import pytest
+
+import hid_board
+import hid_discovery
+import hid_fake
+from hid_board import HNC_BATCH, HNC_GET, HNC_OFF, HNC_SET
+from hid_session import KeyboardSession
+
+KEY = 'fake-keyboard'
+
+
+class RecordingBoard(hid_fake.FakeNicBoard):
+    """
+    Records the commands of the reports written. After batches reports,
+    replies to HNC_BATCH like a firmware without it: echoing the command
+    only.
+    """
+    def __init__(self, batches=None):
+        super().__init__()
+        self.reports = []
+        self.batches = batches
+
+    def write(self, data) -> int:
+        report = bytes(data)
+        self.reports.append(report)
+        if report[3:4] == HNC_BATCH and self.batches is not None:
+            if self.batches == 0:
+                reply = bytearray(hid_board.REPORT_SIZE)
+                reply[:4] = report[:4]
+                self.replies.append(bytes(reply))
+                return len(data)
+            self.batches -= 1
+        return super().write(data)
+
+    def commands(self, command: bytes) -> list[bytes]:
+        return [report for report in self.reports if report[3:4] == command]
+
+
+def sets(count: int) -> list[bytes]:
+    return [HNC_SET + bytes([index, 1, 1]) for index in range(count)]
+
+
+def test_batches_fill_the_reports():
+    board = RecordingBoard()
+    KeyboardSession(board, KEY).batch(sets(20))
+    batches = board.commands(HNC_BATCH)
+    per_report = (hid_board.REPORT_SIZE - 5) // 4
+    assert [report[4] for report in batches] == [per_report, 20 - per_report]
+    assert bytes(board.hsv) == bytes([19, 1, 1])
+
+
+def test_batch_returns_the_hsv_of_the_get():
+    board = RecordingBoard()
+    hsv = KeyboardSession(board, KEY).batch([HNC_GET, HNC_SET + b'\x01\x02\x03', HNC_OFF])
+    assert hsv == (0x00, 0xFF, 0xFF)
+    assert [report[4] for report in board.commands(HNC_BATCH)] == [1, 2]
+    assert not board.enabled
+
+
+def test_batch_without_get_returns_none():
+    assert KeyboardSession(RecordingBoard(), KEY).batch(sets(3)) is None
+
+
+def test_other_reply_resends_the_remaining_commands_only():
+    board = RecordingBoard(batches=1)
+    KeyboardSession(board, KEY).batch(sets(20))
+    per_report = (hid_board.REPORT_SIZE - 5) // 4
+    assert len(board.commands(HNC_BATCH)) == 2
+    assert [report[4] for report in board.commands(HNC_SET)] == list(range(per_report, 20))
+    assert KEY not in hid_discovery.load_cache().get('nic_caps', {})
+
+
+def test_fake_board_runs_the_commands_of_a_batch():
+    board = hid_fake.FakeNicBoard()
+    with KeyboardSession(board, KEY) as session:
+        assert session.batch([HNC_SET + b'\x10\x20\x30', HNC_GET]) == (0x10, 0x20, 0x30)
+
+
+@pytest.mark.parametrize('text, command', [
+    ('on', hid_board.HNC_ON),
+    ('get', HNC_GET),
+    ('set=1,2,3', HNC_SET + b'\x01\x02\x03'),
+])
+def test_batch_command(text, command):
+    assert hid_board.batch_command(text) == command
+
+
+def test_missing_reply_falls_back_to_singles():
+    board = hid_fake.FakeNicBoard()
+    KeyboardSession(board, KEY).batch([HNC_OFF])
+    assert KEY in hid_discovery.load_cache()['nic_caps']
+    board.batch = False  # No reply to HNC_BATCH
+    hsv = KeyboardSession(board, KEY).batch([HNC_SET + b'\x01\x02\x03', HNC_GET])
+    assert hsv == (1, 2, 3)
+    assert KEY not in hid_discovery.load_cache()['nic_caps']
+
+
+def test_set_hsv_out_of_range():
+    board = RecordingBoard()
+    with pytest.raises(ValueError, match='0-255'):
+        KeyboardSession(board, KEY).set_hsv(300, 0, 0)
+    assert board.reports == []
@@ -0,0 +1,110 @@
+import time
+
+import pytest
+
+import hid_board
+import hid_discovery
+import hid_fake
+import hid_mouse
+import hid_settle
+from hid_glorious import MARKER_OFFSET, WRITE_MARKER
+
+KEY = 'model_O/test'
+
+
+class Check:
+    """
+    True from the calls-th call on.
+    """
+    def __init__(self, calls: int):
+        self.calls = calls
+        self.times = []
+
+    def __call__(self) -> bool:
+        self.times.append(time.perf_counter())
+        return len(self.times) >= self.calls
+
+
+def test_poll_backs_off_until_confirmed():
+    check = Check(4)
+    start = time.perf_counter()
+    elapsed = hid_settle.poll(check, KEY, 1.0)
+    assert elapsed is not None and len(check.times) == 4
+    # 1, 2, 4 and 8 ms waits
+    waits = [b - a for a, b in zip([start] + check.times, check.times)]
+    assert all(wait >= hid_settle.MIN_POLL * 2 ** index * 0.9 for index, wait in enumerate(waits))
+    assert hid_settle.learned(KEY) == elapsed
+    assert hid_discovery.load_cache()['settle'][KEY] == elapsed
+
+
+def test_poll_gives_up_at_the_ceiling():
+    start = time.perf_counter()
+    assert hid_settle.poll(lambda: False, KEY, 0.05) is None
+    assert 0.05 <= time.perf_counter() - start < 0.5
+    assert hid_settle.learned(KEY) is None
+
+
+def test_poll_starts_at_half_the_learned_time():
+    hid_settle.observe(KEY, 0.04)
+    check = Check(1)
+    start = time.perf_counter()
+    hid_settle.poll(check, KEY, 1.0)
+    assert check.times[0] - start >= 0.02 * 0.9
+
+
+def test_learned_average_is_saved_when_it_moves():
+    hid_settle.observe(KEY, 0.010)
+    hid_settle.observe(KEY, 0.011)
+    assert hid_settle.learned(KEY) == pytest.approx(0.0102)
+    # Within 10 % of the saved value
+    assert hid_discovery.load_cache()['settle'][KEY] == 0.010
+    for _ in range(5):
+        hid_settle.observe(KEY, 0.030)
+    saved = hid_discovery.load_cache()['settle'][KEY]
+    assert saved > 0.02 and hid_settle.learned(KEY) == pytest.approx(saved, rel=hid_settle.SAVE_CHANGE)
+
+
+def test_deadline():
+    assert hid_settle.deadline(KEY, 0.2, 0.01) == 0.2
+    hid_settle.observe(KEY, 0.001)
+    assert hid_settle.deadline(KEY, 0.2, 0.01) == 0.01
+    hid_settle.observe(KEY, 1.0)
+    assert hid_settle.deadline(KEY, 0.2, 0.01) == 0.2
+
+
+def test_reply_wait_uses_the_learned_deadline():
+    board = hid_fake.FakeNicBoard()
+    board.write(hid_board.pad_report(b'NIC' + hid_board.HNC_ON))
+    assert hid_board.read_reply(board, 'fake', hid_board.HNC_ON)[3:4] == hid_board.HNC_ON
+    assert hid_settle.learned('keyboard/fake') is not None
+    # No reply: the learned deadline, the REPLY_FLOOR here, instead of REPLY_TIMEOUT
+    start = time.perf_counter()
+    assert hid_board.read_reply(board, 'fake', hid_board.HNC_OFF) == b''
+    assert time.perf_counter() - start < hid_board.REPLY_TIMEOUT / 1000 / 2
+    # Unless needed
+    start = time.perf_counter()
+    assert hid_board.read_reply(board, 'fake', hid_board.HNC_GET, needed=True) == b''
+    assert time.perf_counter() - start >= hid_board.REPLY_TIMEOUT / 1000
+
+
+def test_mouse_write_settles_on_the_read_back():
+    mouse = hid_fake.FakeModelO()
+    record = bytearray(hid_mouse.read_config(mouse))
+    record[0x68] ^= 0xFF
+    record[MARKER_OFFSET] = WRITE_MARKER
+    start = time.perf_counter()
+    hid_mouse.send_config(mouse, 'test', bytes(record))
+    assert time.perf_counter() - start < hid_mouse.WRITE_SETTLE
+    assert hid_settle.learned(KEY) is not None
+
+
+def test_mouse_write_not_confirmed_waits_the_fixed_settle(monkeypatch):
+    mouse = hid_fake.FakeModelO()
+    record = bytearray(hid_mouse.read_config(mouse))
+    record[0x68] ^= 0xFF
+    record[MARKER_OFFSET] = WRITE_MARKER
+    monkeypatch.setattr(mouse, 'send_feature_report', lambda data: len(data))  # Never applied
+    start = time.perf_counter()
+    hid_mouse.send_config(mouse, 'test', bytes(record))
+    assert time.perf_counter() - start >= hid_mouse.WRITE_SETTLE
+    assert hid_settle.learned(KEY) is None
@@ -0,0 +1,40 @@
+import os
+import time
+
+import hid_fake
+import hid_mouse
+import hid_shadow
+from hid_glorious import CONFIG_SIZE, MARKER_OFFSET, WRITE_MARKER
+
+KEY = 'fake-model_O'
+
+
+def age(seconds: float) -> None:
+    path = hid_shadow._shadow_path(KEY)
+    mtime = time.time() - seconds
+    os.utime(path, (mtime, mtime))
+
+
+def test_shadow_is_stale_after_max_age():
+    hid_shadow.store(KEY, hid_fake.MODEL_O_CONFIG)
+    assert hid_shadow.load(KEY) == hid_fake.MODEL_O_CONFIG
+    age(hid_shadow.MAX_AGE + 1)
+    assert hid_shadow.load(KEY) is None
+    assert hid_shadow.load(KEY, max_age=hid_shadow.MAX_AGE + 10) == hid_fake.MODEL_O_CONFIG
+
+
+def test_shadow_is_stored_normalized():
+    config = bytearray(hid_fake.MODEL_O_CONFIG)
+    config[MARKER_OFFSET] = WRITE_MARKER
+    hid_shadow.store(KEY, config)
+    assert hid_shadow.load(KEY) == hid_fake.MODEL_O_CONFIG
+    hid_shadow.store(KEY, b'short')
+    assert hid_shadow.load(KEY) == hid_fake.MODEL_O_CONFIG
+
+
+def test_stale_shadow_is_read_again():
+    mouse = hid_fake.FakeModelO()
+    hid_shadow.store(KEY, bytes(CONFIG_SIZE))
+    assert hid_mouse.load_config(mouse, KEY) == bytes(CONFIG_SIZE)
+    age(hid_shadow.MAX_AGE + 1)
+    assert hid_mouse.load_config(mouse, KEY) == hid_fake.MODEL_O_CONFIG
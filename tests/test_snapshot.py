@@ -0,0 +1,121 @@
+import struct
+import threading
+import time
+
+import hid_fake
+import hid_pipeline
+import hid_snapshot
+from hid_board import HNC_GET, HNC_ON, HNC_SET
+from hid_session import KeyboardSession
+
+
+def test_nothing_published():
+    assert hid_snapshot.read() is None
+
+
+def test_keyboard_values_are_kept_between_publications():
+    hid_snapshot.publish_keyboard(hsv=b'\x01\x02\x03')
+    hid_snapshot.publish_keyboard(enabled=False)
+    snapshot = hid_snapshot.read()
+    assert (snapshot.hsv, snapshot.enabled, snapshot.config) == ((1, 2, 3), False, None)
+    assert snapshot.sequence == 4
+
+
+def test_mouse_configuration():
+    hid_snapshot.publish_mouse(hid_fake.MODEL_O_CONFIG)
+    snapshot = hid_snapshot.read()
+    assert snapshot.config == hid_fake.MODEL_O_CONFIG
+    assert snapshot.to_dict()['mouse']['fields']['glorious_direction'] == 'FINGERS_TO_PALM'
+
+
+def set_sequence(sequence: int) -> None:
+    with open(hid_snapshot.SNAPSHOT_PATH, 'r+b') as f:
+        f.seek(hid_snapshot.SEQUENCE_OFFSET)
+        f.write(struct.pack('<Q', sequence))
+
+
+def test_reader_gives_up_on_a_write_in_progress(monkeypatch):
+    hid_snapshot.publish_keyboard(hsv=b'\x01\x02\x03')
+    set_sequence(3)
+    monkeypatch.setattr(hid_snapshot, 'READ_TIMEOUT', 0.01)
+    assert hid_snapshot.read() is None
+
+
+def test_writer_recovers_from_a_dead_writer(monkeypatch):
+    hid_snapshot.publish_keyboard(hsv=b'\x01\x02\x03')
+    set_sequence(3)
+    monkeypatch.setattr(hid_snapshot, '_writer', None)
+    hid_snapshot.publish_keyboard(enabled=True)
+    snapshot = hid_snapshot.read()
+    assert snapshot.sequence == 6
+    assert (snapshot.hsv, snapshot.enabled) == ((1, 2, 3), True)
+
+
+def test_readers_never_see_a_torn_state():
+    configs = [bytes([value]) * len(hid_fake.MODEL_O_CONFIG) for value in range(1, 5)]
+    hid_snapshot.publish_mouse(configs[0])
+    done = threading.Event()
+
+    def write(config):
+        while not done.is_set():
+            hid_snapshot.publish_mouse(config)
+    writers = [threading.Thread(target=write, args=(config,)) for config in configs]
+    for writer in writers:
+        writer.start()
+    try:
+        seen = set()
+        with hid_snapshot.SnapshotReader() as reader:
+            deadline = time.monotonic() + 0.3
+            while time.monotonic() < deadline:
+                snapshot = reader.read()
+                if snapshot is not None:
+                    assert len(set(snapshot.config)) == 1
+                    assert snapshot.sequence % 2 == 0
+                    seen.add(snapshot.config[0])
+    finally:
+        done.set()
+        for writer in writers:
+            writer.join()
+    assert seen
+
+
+class GarbledBoard(hid_fake.FakeNicBoard):
+    """
+    Replies with other bytes than the HSV values to all but get, like
+    firmwares not filling the reply of the other commands.
+    """
+    def write(self, data) -> int:
+        written = super().write(data)
+        if bytes(data)[3:4] != HNC_GET and self.replies:
+            reply = bytearray(self.replies[-1])
+            reply[4:7] = b'\xee\xee\xee'
+            self.replies[-1] = bytes(reply)
+        return written
+
+
+def test_session_publishes_the_hsv_set_and_got_only():
+    board = GarbledBoard()
+    session = KeyboardSession(board, 'fake')
+    session.set_hsv(1, 2, 3)
+    session.off()
+    snapshot = hid_snapshot.read()
+    assert (snapshot.hsv, snapshot.enabled) == ((1, 2, 3), False)
+    session.batch([HNC_SET + b'\x04\x05\x06', HNC_ON])
+    snapshot = hid_snapshot.read()
+    assert (snapshot.hsv, snapshot.enabled) == ((4, 5, 6), True)
+    board.hsv[:] = b'\x07\x08\x09'
+    session.save()
+    assert hid_snapshot.read().hsv == (4, 5, 6)
+    assert session.get_hsv() == (7, 8, 9)
+    assert hid_snapshot.read().hsv == (7, 8, 9)
+
+
+def test_pipeline_publishes_the_hsv_set_and_got_only():
+    board = GarbledBoard()
+    with hid_pipeline.NicPipeline(board) as pipeline:
+        pipeline.set_hsv(1, 2, 3)
+        pipeline.off().result()
+        assert hid_snapshot.read().hsv == (1, 2, 3)
+        board.hsv[:] = b'\x07\x08\x09'
+        assert pipeline.get_hsv() == (7, 8, 9)
+    assert hid_snapshot.read().hsv == (7, 8, 9)
@@ -0,0 +1,69 @@
+import time
+
+import pytest
+
+import hid_fake
+import hid_stream
+from hid_board import rgb_to_hsv
+
+
+class TimedBoard(hid_fake.FakeNicBoard):
+    def __init__(self):
+        super().__init__()
+        self.times = []
+
+    def write(self, data) -> int:
+        self.times.append(time.perf_counter())
+        return super().write(data)
+
+
+def paced_lines(count: int, interval: float):
+    for index in range(count):
+        yield f'{index} 255 255\n'
+        time.sleep(interval)
+
+
+@pytest.mark.parametrize('line, frame', [
+    ('1 2 3', b'\x01\x02\x03'),
+    ('0x10, 0x20, 0x30', b'\x10\x20\x30'),
+    ('0xFF0000', rgb_to_hsv(0xFF0000)),
+    ('1 2 256', None),
+    ('0x1000000', None),
+    ('1 2', None),
+    ('red', None),
+])
+def test_parse_frame(line, frame):
+    assert hid_stream.parse_frame(line) == frame
+
+
+def test_slot_keeps_the_newest_frame():
+    slot = hid_stream.FrameSlot()
+    slot.put(b'\x01\x01\x01')
+    slot.put(b'\x02\x02\x02')
+    assert slot.take(0) == b'\x02\x02\x02'
+    assert (slot.received, slot.dropped) == (2, 1)
+    slot.finish()
+    assert slot.take(1) is None and slot.finished
+
+
+def test_frames_are_paced():
+    board = TimedBoard()
+    fps = 50
+    received, sent, dropped, elapsed = hid_stream.stream(board, paced_lines(20, 0.002), fps)
+    intervals = [b - a for a, b in zip(board.times, board.times[1:])]
+    assert received == 20 and sent + dropped == received
+    assert intervals and min(intervals) >= 0.9 / fps
+
+
+def test_late_frames_are_dropped_for_the_newest():
+    board = hid_fake.FakeNicBoard()
+    received, sent, dropped, _ = hid_stream.stream(board, paced_lines(30, 0.002), 20)
+    assert sent < received and dropped == received - sent
+    # The last frame is never dropped
+    assert bytes(board.hsv) == b'\x1d\xff\xff'
+
+
+def test_invalid_lines_are_skipped():
+    board = hid_fake.FakeNicBoard()
+    assert hid_stream.stream(board, ['1 2 3\n', 'nope\n'], 1000)[:3] == (1, 1, 0)
+    assert bytes(board.hsv) == b'\x01\x02\x03'
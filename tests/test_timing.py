@@ -0,0 +1,69 @@
+import json
+
+import pytest
+
+import hid_board
+import hid_fake
+import hid_timing
+
+
+@pytest.fixture(autouse=True)
+def no_timings(monkeypatch):
+    monkeypatch.setattr(hid_timing, '_histograms', {})
+
+
+def test_histogram_buckets():
+    histogram = hid_timing.Histogram()
+    for seconds in (0.0001, 0.0005, 0.003, 2.0):
+        histogram.observe(seconds)
+    assert histogram.counts[0] == 2
+    assert histogram.counts[hid_timing.BUCKETS.index(0.005)] == 1
+    assert histogram.counts[-1] == 1
+    assert histogram.count == 4 and histogram.total == pytest.approx(2.0036)
+
+
+def test_timed_device_times_each_operation():
+    device = hid_timing.TimedDevice(hid_fake.FakeNicBoard(), 'gmmk_pro')
+    device.write(hid_board.pad_report(b'NIC' + hid_board.HNC_GET))
+    device.read(64, 10)
+    device.read(64, 10)
+    histograms = hid_timing.snapshot()
+    assert histograms[('gmmk_pro', 'write')].count == 1
+    assert histograms[('gmmk_pro', 'read')].count == 2
+    # The second read waited its 10 ms timeout
+    assert histograms[('gmmk_pro', 'read')].total >= 0.01
+
+
+def test_breakdown():
+    hid_timing.observe('model_O', 'get_feature_report', 0.002)
+    hid_timing.observe('model_O', 'get_feature_report', 0.004)
+    lines = hid_timing.breakdown()
+    assert lines[1].split() == ['model_O', 'get_feature_report', '2', '6.000', '3.000']
+
+
+def test_export_accumulates_the_runs(tmp_path):
+    path = str(tmp_path / 'timings.prom')
+    for _ in range(2):
+        hid_timing.observe('gmmk_pro', 'write', 0.003)
+        hid_timing.export(path)
+    with open(path + '.json') as f:
+        state = json.load(f)
+    assert state['histograms'][0]['count'] == 2
+    with open(path) as f:
+        text = f.read()
+    labels = 'model="gmmk_pro",operation="write"'
+    assert f'qmk_tools_hid_operation_seconds_bucket{{{labels},le="0.0025"}} 0' in text
+    assert f'qmk_tools_hid_operation_seconds_bucket{{{labels},le="0.005"}} 2' in text
+    assert f'qmk_tools_hid_operation_seconds_bucket{{{labels},le="+Inf"}} 2' in text
+    assert f'qmk_tools_hid_operation_seconds_count{{{labels}}} 2' in text
+    # Exported once
+    assert hid_timing.snapshot() == {}
+
+
+def test_timings_of_a_run(capsys):
+    hid_fake.reset()
+    hid_board.main(['--get', '--timings'])
+    out = capsys.readouterr().out
+    hid_fake.reset()
+    operations = {line.split()[1] for line in out.splitlines()[2:]}
+    assert {'enumerate', 'open', 'write', 'read'} <= operations
@@ -0,0 +1,56 @@
+import errno
+import os
+import sys
+
+import pytest
+
+import hid_transport
+from hid_transport import DeviceError, HidrawDevice
+
+
+@pytest.fixture
+def fifo(tmp_path, monkeypatch):
+    # Not even importable, the hidraw transport must not need it
+    monkeypatch.setitem(sys.modules, 'hid', None)
+    monkeypatch.setenv('HID_TRANSPORT', 'hidraw')
+    path = tmp_path / 'hidraw0'
+    os.mkfifo(path)
+    with HidrawDevice(os.fsencode(path)) as h:
+        yield h
+
+
+def test_ioctl_request_numbers():
+    # linux/hidraw.h, HIDIOCSFEATURE(65) and HIDIOCGFEATURE(65)
+    assert hid_transport.hidiocsfeature(65) == 0xC0414806
+    assert hid_transport.hidiocgfeature(65) == 0xC0414807
+    assert hid_transport.hidiocgfeature(521) == 0xC2094807
+
+
+def test_write_read_round_trip(fifo):
+    assert fifo.write(memoryview(bytearray(b'\x00NIC\x04'))) == 5
+    assert fifo.read(64, 100) == b'\x00NIC\x04'
+    assert fifo.read(64, 0) == b''
+
+
+def test_feature_report_round_trip(fifo, monkeypatch):
+    requests = []
+
+    def ioctl(fd, request, buffer, mutate):
+        requests.append(request)
+        if request == hid_transport.hidiocgfeature(len(buffer)):
+            buffer[1:] = bytes(range(1, len(buffer)))
+        return len(buffer)
+    monkeypatch.setattr(hid_transport.fcntl, 'ioctl', ioctl)
+
+    assert fifo.send_feature_report(b'\x04\x11\x00') == 3
+    assert fifo.get_feature_report(4, 6) == b'\x04\x01\x02\x03\x04\x05'
+    assert requests == [hid_transport.hidiocsfeature(3), hid_transport.hidiocgfeature(6)]
+
+
+def test_errors_are_device_errors(fifo, tmp_path):
+    assert hid_transport.device_errors() == (DeviceError,)
+    # A FIFO has no feature reports
+    with pytest.raises(DeviceError, match=os.strerror(errno.ENOTTY)):
+        fifo.get_feature_report(4, 6)
+    with pytest.raises(DeviceError, match='Unable to open'):
+        HidrawDevice(os.fsencode(tmp_path / 'hidraw9'))